@@ -0,0 +1,26 @@
+# backfill_stats.py
+import asyncio
+import repository
+
+## One-off migration: computes the running habit aggregates (yes_count, total, streaks, per-month counters)
+## and the compact day-by-day history read by /stats and /streaks on every tracker document from the
+## existing entry history. Safe to re-run; it always rebuilds from scratch.
+## Usage: python backfill_stats.py
+async def backfill_habit_stats(concurrency: int = 16):
+    repository.use_bulk_pool()
+    user_ids = await repository.list_user_ids()
+    print(f"Backfilling habit stats for {len(user_ids)} users...")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    habits_done = 0
+
+    async def backfill(user_id: str):
+        nonlocal habits_done
+        async with semaphore:
+            habits_done += await repository.rebuild_habit_stats(user_id)
+
+    await asyncio.gather(*(backfill(user_id) for user_id in user_ids))
+    print(f"✅ Rebuilt stats for {habits_done} habits.")
+
+if __name__ == "__main__":
+    asyncio.run(backfill_habit_stats())
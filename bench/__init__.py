@@ -0,0 +1,6 @@
+## Shared helpers for the benchmarks.
+
+
+## The p-quantile (0..1) of already sorted samples, by nearest rank; 0.0 for no samples.
+def percentile(samples: list, p: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * p))] if samples else 0.0
@@ -0,0 +1,93 @@
+# bench/analytics.py
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from bench import percentile
+from habit_analytics import analyze
+from habit_stats import compute_stats
+
+## Times /stats and /streaks analytics for one user: habit_analytics.analyze over the compact history on
+## the trackers, against the same figures computed day by day in Python from {date: response} entries
+## (what analyzing the entries layout costs, before even reading the entries from storage).
+##
+##   python -m bench.analytics --habits 10 --days 730 --runs 50
+
+
+def make_entries(habits: int, days: int, today: date, seed: int) -> dict:
+    rng = random.Random(seed)
+    entries = {}
+    for h in range(habits):
+        rate = rng.uniform(0.3, 0.9)
+        entries[f"habit {h}"] = {(today - timedelta(days=i)).isoformat(): "yes" if rng.random() < rate else "no"
+                                 for i in range(days) if rng.random() < 0.9}
+    return entries
+
+
+## The same figures as analyze(), one habit and one day at a time.
+def analyze_entries(entries: dict, today: date) -> dict:
+    figures = {}
+    for habit, responses in entries.items():
+        day = date.fromisoformat(min(responses)) if responses else today
+        run = longest = 0
+        weekdays = [[0, 0] for _ in range(7)]
+        while day <= today:
+            response = responses.get(day.isoformat())
+            run = run + 1 if response == "yes" else 0
+            longest = max(longest, run)
+            if response:
+                weekdays[day.weekday()][0] += response == "yes"
+                weekdays[day.weekday()][1] += 1
+            day += timedelta(days=1)
+
+        def rate(window: int, end: date = today):
+            answers = [responses.get((end - timedelta(days=i)).isoformat()) for i in range(window)]
+            answered = [answer for answer in answers if answer]
+            return sum(answer == "yes" for answer in answered) / len(answered) if answered else None
+
+        day = today if responses.get(today.isoformat()) else today - timedelta(days=1)
+        current = 0
+        while responses.get(day.isoformat()) == "yes":
+            current += 1
+            day -= timedelta(days=1)
+        figures[habit] = {"current_streak": current, "longest_streak": longest, "rate_7": rate(7),
+                          "rate_30": rate(30), "week_ago": rate(7, today - timedelta(days=7)),
+                          "weekdays": [yes / total if total else None for yes, total in weekdays]}
+    return figures
+
+
+def _time(fn, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main(args):
+    today = date.today()
+    entries = make_entries(args.habits, args.days, today, args.seed)
+    stats = {habit: compute_stats(responses) for habit, responses in entries.items()}
+    vectorized, loop = analyze(stats, today)["habits"], analyze_entries(entries, today)
+    assert all(vectorized[h]["current_streak"] == loop[h]["current_streak"]
+               and vectorized[h]["longest_streak"] == loop[h]["longest_streak"] for h in entries)
+
+    print(f"Analytics benchmark: {args.habits} habits × {args.days} days, {args.runs} runs")
+    for name, fn in (("history arrays (analyze)", lambda: analyze(stats, today)),
+                     ("entries, per day in Python", lambda: analyze_entries(entries, today))):
+        samples = sorted(_time(fn, args.runs))
+        print(f"  {name:<28} median {statistics.median(samples) * 1000:8.2f} ms   "
+              f"p95 {percentile(samples, 0.95) * 1000:8.2f} ms")
+    history_bytes = sum(len(month) for s in stats.values() for month in s["history"].values())
+    print(f"  history stored: {history_bytes / 1024:.1f} KiB for {sum(map(len, entries.values()))} entries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the habit analytics behind /stats and /streaks.")
+    parser.add_argument("--habits", type=int, default=10)
+    parser.add_argument("--days", type=int, default=730, help="days of history per habit")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,102 @@
+# bench/fake_telegram.py
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from telegram.request import BaseRequest
+
+## In-process stand-in for the Telegram Bot API, plugged in as a bot's request object
+## (ExtBot(token, request=FakeTelegramRequest()) or ApplicationBuilder().request(...)). Every call is
+## answered after `latency` seconds with a plausible result, and messages are recorded in `sent`; the
+## last message of each chat (with its inline keyboard) is kept in `messages`, for clients that read it.
+## Messages are held to Telegram-like flood limits, `global_rate` per second overall and `chat_rate`
+## per chat with bursts of `chat_burst`; beyond them the call gets a 429 with retry_after, as from
+## Telegram.
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+_LIMITED = ("send", "edit", "copy", "forward")
+
+
+class _Bucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    ## Takes a token, or returns the seconds until one would be available.
+    def take(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeTelegramRequest(BaseRequest):
+    def __init__(self, latency: float = 0.02, global_rate: float = 30, chat_rate: float = 1.0,
+                 chat_burst: float = 3, limits: bool = True):
+        self.latency = latency
+        self.limits = limits
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global = _Bucket(global_rate, global_rate)
+        self._chats = {}
+        self._message_ids = itertools.count(1)
+        self.calls = Counter()
+        self.sent = []          # (chat_id, method, text or caption), in order of arrival
+        self.rejected = 0       # calls answered with 429
+        self.messages = {}      # chat_id -> last message sent or edited there (as returned to the bot)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+        await asyncio.sleep(self.latency)
+        self.calls[api_method] += 1
+
+        chat_id = params.get("chat_id")
+        if chat_id is not None and api_method.startswith(_LIMITED) and self.limits:
+            chat = self._chats.setdefault(chat_id, _Bucket(self.chat_rate, self.chat_burst))
+            wait = chat.take() or self._global.take()
+            if wait:
+                self.rejected += 1
+                retry_after = max(1, round(wait))
+                return 429, json.dumps({"ok": False, "error_code": 429,
+                                        "description": f"Too Many Requests: retry after {retry_after}",
+                                        "parameters": {"retry_after": retry_after}}).encode()
+
+        if api_method == "getMe":
+            result = BOT_USER
+        elif api_method == "getUpdates":
+            result = []
+        elif api_method.startswith(("send", "edit")) and chat_id is not None:
+            text = params.get("text", params.get("caption", ""))
+            self.sent.append((chat_id, api_method, text))
+            # Edits keep the message's id (and its text, when only the keyboard changes); a keyboard sent
+            # along is returned as Telegram does.
+            message_id = params.get("message_id") if api_method.startswith("edit") else None
+            previous = self.messages.get(int(chat_id)) or {}
+            if api_method == "editMessageReplyMarkup" and previous.get("message_id") == message_id:
+                text = previous["text"]
+            result = {"message_id": message_id or next(self._message_ids), "date": int(time.time()), "text": text,
+                      "chat": {"id": int(chat_id), "type": "private" if int(chat_id) > 0 else "group"}}
+            if params.get("reply_markup") is not None:
+                result["reply_markup"] = params["reply_markup"]
+            self.messages[int(chat_id)] = result
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
@@ -0,0 +1,260 @@
+# bench/load.py
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from telegram import Update
+from telegram.ext import TypeHandler
+import metrics
+import outbox
+import repository
+from bench import percentile
+from bench.fake_telegram import BOT_USER, FakeTelegramRequest
+from bench.storage import seed
+from cache import UserCache
+from main import build_application
+from storage_memory import MemoryStorage
+from storage_sqlite import SQLiteStorage
+
+## Load test of the whole bot: the real Application from main.build_application (handlers, text router,
+## metrics, outbox) talks to a fake Bot API (bench/fake_telegram.py) and a seeded memory or SQLite store,
+## while thousands of simulated users send it synthetic Updates. They go through the application's update
+## queue and its update processor (update_processor.py), as polled updates do. Each flow is one user's
+## whole exchange:
+##   addgoal          /addgoal <text>
+##   markcompleted    /markcompleted, then the number of the first goal listed
+##   monthlytrackers  /monthlytrackers, a Yes or No tap per habit on the checklist, then Done
+##   summary          /summary
+## Users read the bot's replies (goal list, checklist buttons) from the fake API, as a client would, and
+## a user never has two flows in flight. Reported: throughput, p50/p95/p99 per handler (from the update
+## being queued until its handler returned, queueing and Bot API calls included), and the storage reads and writes
+## per invocation, counted as for bot_command_storage_calls (on Firestore, the ops a command costs).
+##
+##   python -m bench.load --users 5000 --flows 20000 --concurrency 200
+##   python -m bench.load --backend sqlite --max-p95-ms 50 --min-throughput 500 --json load.json
+##
+## Runs offline. With --max-p95-ms / --min-throughput it exits 1 when a gate fails (or a handler raised),
+## so it can guard against performance regressions in CI.
+
+_TOKEN = "123456:load"
+FLOWS = ("addgoal", "markcompleted", "monthlytrackers", "summary")
+_LAST_GROUP = 100  # handler group after the bot's own (group 0), marking an update as handled
+HANDLERS = ("/addgoal", "/markcompleted", "reply:complete", "/monthlytrackers", "button:tracker", "/summary")
+
+
+# === Synthetic Traffic ===
+class LoadClient:
+    def __init__(self, app, fake: FakeTelegramRequest):
+        self.app = app
+        self.fake = fake
+        self._update_ids = itertools.count(1)
+        self.latencies = {}     # handler -> [seconds]
+        self.updates = 0
+        self.errors = Counter()
+        self._pending = {}      # update id -> future resolved once the update went through every handler group
+        app.add_error_handler(self._on_error)
+        app.add_handler(TypeHandler(Update, self._finished), group=_LAST_GROUP)
+
+    async def _on_error(self, update, context):
+        if not self.errors:
+            print(f"[❌] First handler error: {context.error!r}")
+        self.errors[type(context.error).__name__] += 1
+
+    async def _finished(self, update, context):
+        self._pending.pop(update.update_id).set_result(None)
+
+    @staticmethod
+    def _user(user_id: str) -> dict:
+        return {"id": int(user_id), "is_bot": False, "first_name": "Load"}
+
+    ## A text message from the user; a leading /command gets its bot_command entity, as Telegram sends it.
+    def message(self, user_id: str, text: str) -> dict:
+        update_id = next(self._update_ids)
+        message = {"message_id": update_id, "date": int(time.time()), "text": text,
+                   "chat": {"id": int(user_id), "type": "private"}, "from": self._user(user_id)}
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": update_id, "message": message}
+
+    ## A tap on an inline button of `message` (a message the bot sent, as returned by the fake API).
+    def tap(self, user_id: str, message: dict, data: str) -> dict:
+        update_id = next(self._update_ids)
+        return {"update_id": update_id, "callback_query": {"id": str(update_id), "from": self._user(user_id),
+                                                           "chat_instance": user_id, "data": data,
+                                                           "message": {**message, "from": BOT_USER}}}
+
+    ## The bot's last message to the user (None before the first one).
+    def last_message(self, user_id: str):
+        return self.fake.messages.get(int(user_id))
+
+    ## Queues the update as the updater would and waits until the application has handled it.
+    async def send(self, handler: str, data: dict):
+        update = Update.de_json(data, self.app.bot)
+        done = self._pending[update.update_id] = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        await self.app.update_queue.put(update)
+        await done
+        self.latencies.setdefault(handler, []).append(time.perf_counter() - started)
+        self.updates += 1
+
+
+async def run_flow(client: LoadClient, user_id: str, flow: str, rng: random.Random):
+    if flow == "addgoal":
+        await client.send("/addgoal", client.message(user_id, f"/addgoal load goal {rng.randrange(1000)}"))
+    elif flow == "markcompleted":
+        await client.send("/markcompleted", client.message(user_id, "/markcompleted"))
+        if client.last_message(user_id)["text"].startswith("Select the goal"):
+            await client.send("reply:complete", client.message(user_id, "1"))
+    elif flow == "monthlytrackers":
+        await client.send("/monthlytrackers", client.message(user_id, "/monthlytrackers"))
+        rows = client.last_message(user_id).get("reply_markup", {}).get("inline_keyboard", [])
+        if rows:
+            # One row per habit ([habit] [Yes] [No]), then [Done]; every tap goes to the edited checklist.
+            for row in rows[:-1]:
+                data = rng.choice(row[1:])["callback_data"]
+                await client.send("button:tracker", client.tap(user_id, client.last_message(user_id), data))
+            await client.send("button:tracker", client.tap(user_id, client.last_message(user_id), "tracker:done"))
+    else:
+        await client.send("/summary", client.message(user_id, "/summary"))
+
+
+## Parses "addgoal=2,summary=1" into {flow: weight}; flows left out are not run.
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        flow, _, weight = part.partition("=")
+        if flow.strip() not in FLOWS:
+            raise SystemExit(f"Unknown flow {flow.strip()!r} in --mix (expected {', '.join(FLOWS)})")
+        weights[flow.strip()] = float(weight or 1)
+    return weights
+
+
+async def run_load(client: LoadClient, user_ids: list, flows: int, concurrency: int, mix: dict,
+                   rng: random.Random) -> float:
+    pending = iter(rng.choices(list(mix), list(mix.values()), k=flows))
+    sessions = min(concurrency, len(user_ids))
+
+    # Each session owns a slice of the users, so a user's updates arrive in order, as from one chat.
+    async def session(users: list):
+        for flow in pending:
+            await run_flow(client, rng.choice(users), flow, rng)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(user_ids[i::sessions]) for i in range(sessions)))
+    return time.perf_counter() - started
+
+
+# === Report ===
+def summarize(client: LoadClient, elapsed: float) -> dict:
+    handlers = {}
+    for handler in HANDLERS:
+        samples = sorted(client.latencies.get(handler, []))
+        if not samples:
+            continue
+        reads, calls = metrics.command_storage_calls.totals(command=handler, kind="read")
+        writes, _ = metrics.command_storage_calls.totals(command=handler, kind="write")
+        handlers[handler] = {"calls": len(samples), "p50_ms": percentile(samples, 0.5) * 1000,
+                             "p95_ms": percentile(samples, 0.95) * 1000, "p99_ms": percentile(samples, 0.99) * 1000,
+                             "reads": reads / calls if calls else 0.0, "writes": writes / calls if calls else 0.0}
+    return {"updates": client.updates, "elapsed": elapsed, "updates_per_s": client.updates / elapsed,
+            "errors": dict(client.errors), "bot_api_calls": dict(client.fake.calls), "bot_api_429s": client.fake.rejected,
+            "handlers": handlers}
+
+
+def print_report(result: dict):
+    print(f"  {result['updates']} updates in {result['elapsed']:.2f}s ({result['updates_per_s']:,.0f} updates/s)")
+    print(f"  {'handler':<18}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'reads':>8}{'writes':>8}")
+    for handler, row in result["handlers"].items():
+        print(f"  {handler:<18}{row['calls']:>7}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+              f"{row['reads']:>8.2f}{row['writes']:>8.2f}")
+    print("  Bot API: " + ", ".join(f"{method} {n}" for method, n in sorted(result["bot_api_calls"].items()))
+          + f" ({result['bot_api_429s']} answered 429)")
+
+
+## Returns the failed gates (an empty list when everything passed).
+def check_gates(result: dict, max_p95_ms: float = None, min_throughput: float = None) -> list:
+    failures = [f"{n} handler errors ({error})" for error, n in result["errors"].items()]
+    if max_p95_ms is not None:
+        failures += [f"{handler} p95 {row['p95_ms']:.2f} ms > {max_p95_ms:g} ms"
+                     for handler, row in result["handlers"].items() if row["p95_ms"] > max_p95_ms]
+    if min_throughput is not None and result["updates_per_s"] < min_throughput:
+        failures.append(f"{result['updates_per_s']:,.0f} updates/s < {min_throughput:g}")
+    return failures
+
+
+async def main(args):
+    if args.backend == "memory":
+        storage = MemoryStorage()
+    elif args.backend == "sqlite":
+        path = os.path.join(tempfile.mkdtemp(prefix="bench-load-"), "load.sqlite3")
+        storage = SQLiteStorage(path)
+    else:
+        raise SystemExit(f"Unknown backend {args.backend!r} (expected 'memory' or 'sqlite')")
+    mix = parse_mix(args.mix)
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    user_ids = await asyncio.to_thread(seed, storage, args.users, args.habits, args.days, args.goals, rng)
+    print(f"[{args.backend}] seeded {args.users} users × {args.habits} habits × {args.days} days "
+          f"in {time.perf_counter() - started:.1f}s")
+    repository.set_storage(storage)
+    if args.no_cache:
+        repository.user_cache = UserCache(ttl=0)
+
+    # Telegram's flood limits (and the outbox pacing to them) only apply with --telegram-limits; otherwise
+    # the outbox still queues every message but never waits.
+    fake = FakeTelegramRequest(latency=args.latency_ms / 1000, limits=args.telegram_limits)
+    limiter = outbox.Outbox() if args.telegram_limits else outbox.Outbox(
+        global_rate=float("inf"), chat_rate=float("inf"), group_rate=float("inf"), chat_burst=float("inf"))
+    # The polling application, started without its updater: the harness stands in for getUpdates.
+    app = build_application(_TOKEN, request=fake, rate_limiter=limiter)
+    client = LoadClient(app, fake)
+    await app.initialize()
+    await app.start()
+    try:
+        elapsed = await run_load(client, user_ids, args.flows, args.concurrency, mix, rng)
+    finally:
+        await app.stop()
+        await app.shutdown()
+
+    result = {"backend": args.backend, "users": args.users, "flows": args.flows, "concurrency": args.concurrency,
+              **summarize(client, elapsed)}
+    print(f"  {args.flows} flows, concurrency {args.concurrency}, mix {args.mix}")
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    failures = check_gates(result, args.max_p95_ms, args.min_throughput)
+    for failure in failures:
+        print(f"  [❌] {failure}")
+    if failures:
+        raise SystemExit(1)
+    if args.max_p95_ms is not None or args.min_throughput is not None:
+        print("  [✅] All gates passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the bot's Application with synthetic users.")
+    parser.add_argument("--backend", default="memory", help="memory or sqlite")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--habits", type=int, default=5)
+    parser.add_argument("--days", type=int, default=30, help="days of entry and goal history per user")
+    parser.add_argument("--goals", type=int, default=3, help="goals per user and day")
+    parser.add_argument("--flows", type=int, default=10000, help="user flows to run (each one or more updates)")
+    parser.add_argument("--concurrency", type=int, default=100, help="users with a flow in flight at once")
+    parser.add_argument("--mix", default="addgoal=1,markcompleted=1,monthlytrackers=1,summary=1",
+                        help="relative weight of each flow")
+    parser.add_argument("--latency-ms", type=float, default=0, help="fake Bot API latency per call")
+    parser.add_argument("--telegram-limits", action="store_true", help="enforce Telegram's flood limits")
+    parser.add_argument("--no-cache", action="store_true", help="disable the per-user cache")
+    parser.add_argument("--max-p95-ms", type=float, help="fail if any handler's p95 exceeds this")
+    parser.add_argument("--min-throughput", type=float, help="fail below this many updates/s")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
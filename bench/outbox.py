@@ -0,0 +1,113 @@
+# bench/outbox.py
+import argparse
+import asyncio
+import random
+import time
+from telegram.error import TelegramError
+from telegram.ext import ExtBot
+import metrics
+import outbox
+from bench import percentile
+from bench.fake_telegram import FakeTelegramRequest
+
+## Sends a nightly-style burst of bulk summaries while users keep sending commands, against a fake
+## Bot API that enforces Telegram's flood limits (bench/fake_telegram.py), and reports throughput,
+## latency per priority, 429s, coalesced messages and drops.
+##
+##   python -m bench.outbox --users 600 --active 40 --interactive-rate 10
+##
+## --mode outbox sends through the outbox (the bot's rate limiter); --mode direct sends everything
+## straight away, as the bot did before, where a 429 simply fails the message. --mode both runs both.
+
+_TOKEN = "123456:bench"
+
+
+async def run(mode: str, args) -> dict:
+    fake = FakeTelegramRequest(latency=args.latency_ms / 1000)
+    limiter = outbox.Outbox() if mode == "outbox" else None
+    bot = ExtBot(_TOKEN, request=fake, get_updates_request=FakeTelegramRequest(), rate_limiter=limiter)
+    await bot.initialize()
+    rng = random.Random(args.seed)
+    latencies = {"interactive": [], "bulk": []}
+    failures = {}
+
+    async def send(kind: str, chat_id: int, text: str):
+        started = time.perf_counter()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+        except TelegramError as e:
+            failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+        else:
+            latencies[kind].append(time.perf_counter() - started)
+
+    async def bulk():
+        outbox.use_bulk_priority()
+        semaphore = asyncio.Semaphore(64)
+
+        async def one(chat_id: int):
+            async with semaphore:
+                await send("bulk", chat_id, f"📅 Summary for {chat_id}")
+        await asyncio.gather(*(one(chat_id) for chat_id in range(1, args.users + 1)))
+
+    # Active users send commands at random for --duration seconds; some fire a few in a row.
+    async def interactive():
+        tasks = []
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            chat_id = rng.randint(1, args.active)
+            for i in range(rng.choice((1, 1, 1, args.burst))):
+                tasks.append(asyncio.create_task(send("interactive", chat_id, f"✅ Reply {i} to {chat_id}")))
+            await asyncio.sleep(rng.expovariate(args.interactive_rate))
+        await asyncio.gather(*tasks)
+
+    coalesced_before = {kind: metrics.outbox_messages.value(priority=kind, outcome="coalesced")
+                   for kind in ("interactive", "bulk")}
+    started = time.perf_counter()
+    await asyncio.gather(bulk(), interactive())
+    elapsed = time.perf_counter() - started
+    await bot.shutdown()
+
+    return {
+        "elapsed": elapsed,
+        "latencies": latencies,
+        "failures": failures,
+        "requests": sum(count for method, count in fake.calls.items() if method == "sendMessage"),
+        "delivered": len(fake.sent),
+        "rejected": fake.rejected,
+        "coalesced": sum(metrics.outbox_messages.value(priority=kind, outcome="coalesced") - coalesced_before[kind]
+                         for kind in coalesced_before),
+    }
+
+
+def report(mode: str, result: dict):
+    messages = sum(len(samples) for samples in result["latencies"].values()) + sum(result["failures"].values())
+    print(f"\n{mode}: {messages} messages in {result['elapsed']:.1f}s "
+          f"({result['delivered'] / result['elapsed']:.1f} delivered/s)")
+    print(f"  sendMessage requests {result['requests']}, delivered {result['delivered']}, "
+          f"429s from Telegram {result['rejected']}, coalesced {result['coalesced']:.0f}")
+    print(f"  failed: {result['failures'] or 'none'}")
+    print(f"  {'latency':<14}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for kind, samples in result["latencies"].items():
+        samples.sort()
+        print(f"  {kind:<14}{len(samples):>7}{percentile(samples, 0.5) * 1000:>9.0f}"
+              f"{percentile(samples, 0.95) * 1000:>9.0f}{percentile(samples, 0.99) * 1000:>9.0f}")
+
+
+async def main(args):
+    print(f"Outbox benchmark: {args.users} bulk messages, {args.active} active users sending "
+          f"~{args.interactive_rate}/s (bursts of {args.burst}), fake Bot API at 30 msg/s, 1/s per chat")
+    for mode in (("outbox", "direct") if args.mode == "both" else (args.mode,)):
+        report(mode, await run(mode, args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the outbound message queue against a fake Bot API.")
+    parser.add_argument("--mode", choices=("outbox", "direct", "both"), default="both")
+    parser.add_argument("--users", type=int, default=600, help="bulk messages (one per chat)")
+    parser.add_argument("--active", type=int, default=40, help="chats sending commands meanwhile")
+    parser.add_argument("--interactive-rate", type=float, default=10, help="commands per second")
+    parser.add_argument("--burst", type=int, default=4, help="replies sent back to back by a busy user")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of interactive traffic")
+    parser.add_argument("--latency-ms", type=float, default=20, help="simulated Bot API latency")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
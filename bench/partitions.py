@@ -0,0 +1,106 @@
+# bench/partitions.py
+import argparse
+import asyncio
+import time
+from collections import Counter
+import job_ledger
+import repository
+from partitions import InMemoryLeaseBackend, run_partitioned
+from storage_memory import MemoryStorage
+
+## Simulates several replicas running the partitioned nightly job against the in-memory lease
+## backend, with per-user progress in the job ledger (in-memory storage) as the nightly job keeps it. Each
+## batch skips users the ledger has as sent, then sends to the rest, --concurrency at a time, recording each
+## one right after its send. One replica "crashes" part-way through a batch with --concurrency sends in
+## flight (delivered, not yet recorded), and the others must take over its partitions once the lease
+## expires. Reports per-replica work, skipped users and duplicate deliveries, and exits 1 if a user was
+## skipped or more users were sent twice than there were sends in flight at the crash.
+## Usage: python -m bench.partitions --users 20000 --workers 4 --crash-after 5
+
+
+class _Crash(Exception):
+    pass
+
+
+async def simulate(users: int, workers: int, partitions: int, batch_size: int, lease: float,
+                   send_ms: float, concurrency: int, crash_after: int) -> bool:
+    user_ids = [str(100000 + i) for i in range(users)]
+    backend = InMemoryLeaseBackend()
+    repository.set_storage(MemoryStorage())
+    delivered = Counter()
+    per_worker = Counter()
+    crashes = 0
+
+    async def worker(name: str, crash_after_batches: int = None):
+        nonlocal crashes
+        ledger = job_ledger.JobLedger("sim")  # one per replica, like separate processes sharing storage
+        semaphore = asyncio.Semaphore(concurrency)
+        batches = 0
+
+        async def send(user_id: str, state: dict):
+            async with semaphore:
+                await asyncio.sleep(send_ms / 1000)
+                delivered[user_id] += 1
+                per_worker[name] += 1
+                await ledger.record(user_id, job_ledger.sent(state))
+
+        async def process_batch(batch):
+            nonlocal batches, crashes
+            states = await ledger.load(batch)
+            todo = [user_id for user_id in batch if job_ledger.should_run(states[user_id])]
+            if crash_after_batches is not None and batches >= crash_after_batches:
+                # Dies half-way through a batch: the sends in flight reach their users, but neither their
+                # states nor the partition checkpoint are written, and the lease is not released.
+                done = len(todo) // 2
+                await asyncio.gather(*(send(user_id, states[user_id]) for user_id in todo[:done]))
+                for user_id in todo[done:done + concurrency]:
+                    delivered[user_id] += 1
+                crashes += 1
+                raise _Crash(name)
+            await asyncio.gather(*(send(user_id, states[user_id]) for user_id in todo))
+            await ledger.flush()
+            batches += 1
+
+        try:
+            return await run_partitioned("sim", user_ids, process_batch, backend, worker_id=name,
+                                         partitions=partitions, batch_size=batch_size, lease_seconds=lease,
+                                         timeout=60)
+        except _Crash:
+            print(f"  💥 {name} crashed after {batches} batches")
+            return 0
+
+    started = time.perf_counter()
+    finished = await asyncio.gather(*(
+        worker(f"worker-{i}", crash_after if i == 0 and crash_after >= 0 else None) for i in range(workers)
+    ))
+    elapsed = time.perf_counter() - started
+
+    skipped = [u for u in user_ids if delivered[u] == 0]
+    duplicates = sum(1 for u in user_ids if delivered[u] > 1)
+    most = max(delivered.values(), default=0)
+    print(f"{users} users, {partitions} partitions, {workers} workers — {elapsed:.2f}s")
+    for i in range(workers):
+        name = f"worker-{i}"
+        print(f"  {name}: {finished[i]} partitions, {per_worker[name]} users")
+    print(f"  skipped: {len(skipped)}, delivered more than once: {duplicates} "
+          f"(allowed: {concurrency} in-flight sends × {crashes} crashes), most deliveries to one user: {most}")
+    ok = not skipped and duplicates <= concurrency * crashes and most <= 2
+    print(f"  [{'✅' if ok else '❌'}] " + ("Every user delivered; repeats limited to the sends in flight" if ok
+                                          else "Users were skipped or delivered more than the in-flight sends allow"))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate partitioned nightly runs with crashing replicas.")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--lease", type=float, default=1.0, help="lease seconds")
+    parser.add_argument("--send-ms", type=float, default=0.2, help="simulated time per send")
+    parser.add_argument("--concurrency", type=int, default=8, help="sends in flight per replica")
+    parser.add_argument("--crash-after", type=int, default=5, help="batches before worker-0 crashes (-1: never)")
+    args = parser.parse_args()
+    if not asyncio.run(simulate(args.users, args.workers, args.partitions, args.batch_size, args.lease,
+                                args.send_ms, args.concurrency, args.crash_after)):
+        raise SystemExit(1)
@@ -0,0 +1,100 @@
+# bench/polling.py
+import argparse
+import asyncio
+import time
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+import outbox
+from bench.fake_telegram import FakeTelegramRequest
+from main import build_application
+from update_processor import ChatOrderedUpdateProcessor
+
+## Checks how the polling-mode application (main.build_application) processes updates, through PTB's
+## update queue as polled updates are:
+##   isolation – one chat's slow handler (--slow-ms per update) must not delay another chat's update
+##   order     – each chat's updates must be handled in the order they arrived
+##   spread    – --chats chats with one --handler-ms update each, reported as updates/sec
+## A handler in front of the bot's own ones simulates the work (and stops the update there), so no
+## storage is needed. Exits 1 if isolation or order fails.
+##
+##   python -m bench.polling --chats 500 --handler-ms 50
+
+
+def _message(update_id: int, chat_id: int) -> dict:
+    return {"update_id": update_id, "message": {"message_id": update_id, "date": int(time.time()), "text": "hi",
+                                                "chat": {"id": chat_id, "type": "private"},
+                                                "from": {"id": chat_id, "is_bot": False, "first_name": "Poll"}}}
+
+
+async def main(args):
+    limiter = outbox.Outbox(global_rate=float("inf"), chat_rate=float("inf"), group_rate=float("inf"),
+                            chat_burst=float("inf"))
+    app = build_application("123456:polling", request=FakeTelegramRequest(latency=0, limits=False),
+                            rate_limiter=limiter)
+    if not isinstance(app.update_processor, ChatOrderedUpdateProcessor):
+        raise SystemExit(f"[❌] Polling app uses {type(app.update_processor).__name__}, not ChatOrderedUpdateProcessor")
+
+    delays = {}     # chat id -> seconds per update
+    handled = []    # (chat id, update id), in order of completion
+    finished = {}   # update id -> seconds since the update was queued
+    queued_at = {}
+
+    async def simulate(update: Update, context):
+        await asyncio.sleep(delays[update.effective_chat.id])
+        handled.append((update.effective_chat.id, update.update_id))
+        finished[update.update_id] = time.perf_counter() - queued_at[update.update_id]
+        raise ApplicationHandlerStop
+
+    app.add_handler(TypeHandler(Update, simulate), group=-1)
+    await app.initialize()
+    await app.start()
+    update_ids = iter(range(1, 1_000_000))
+
+    async def queue(chat_id: int) -> int:
+        update_id = next(update_ids)
+        queued_at[update_id] = time.perf_counter()
+        await app.update_queue.put(Update.de_json(_message(update_id, chat_id), app.bot))
+        return update_id
+
+    failures = []
+    try:
+        # Isolation and order: a slow chat sends three updates, then a fast chat sends one.
+        delays.update({1: args.slow_ms / 1000, 2: 0})
+        slow = [await queue(1) for _ in range(3)]
+        fast = await queue(2)
+        await app.update_queue.join()
+        print(f"  slow chat: 3 updates done after {finished[slow[-1]] * 1000:.0f} ms; "
+              f"other chat: done after {finished[fast] * 1000:.1f} ms")
+        if finished[fast] >= args.slow_ms / 1000:
+            failures.append("the other chat waited for the slow chat")
+        if [u for c, u in handled if c == 1] != slow:
+            failures.append(f"slow chat's updates ran out of order: {[u for c, u in handled if c == 1]}")
+
+        # Spread: many chats at once.
+        chats = range(1000, 1000 + args.chats)
+        delays.update({chat_id: args.handler_ms / 1000 for chat_id in chats})
+        started = time.perf_counter()
+        for chat_id in chats:
+            await queue(chat_id)
+        await app.update_queue.join()
+        elapsed = time.perf_counter() - started
+        print(f"  {args.chats} chats × {args.handler_ms:g} ms handler: {elapsed:.2f}s "
+              f"({args.chats / elapsed:,.0f} updates/s, {app.update_processor.concurrency} at once; "
+              f"one at a time would take {args.chats * args.handler_ms / 1000:.1f}s)")
+    finally:
+        await app.stop()
+        await app.shutdown()
+
+    for failure in failures:
+        print(f"  [❌] {failure}")
+    if failures:
+        raise SystemExit(1)
+    print("  [✅] Chats are isolated and each chat's updates stay in order")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check concurrent, per-chat ordered processing of polled updates.")
+    parser.add_argument("--slow-ms", type=float, default=500, help="handler time of the slow chat's updates")
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--handler-ms", type=float, default=50)
+    asyncio.run(main(parser.parse_args()))
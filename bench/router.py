@@ -0,0 +1,69 @@
+# bench/router.py
+import argparse
+import asyncio
+import random
+import time
+from telegram import Update
+from conversation_state import InMemoryConversationStore
+from router import TextRouter
+
+## Feeds synthetic text updates through TextRouter and reports the per-message dispatch cost.
+## Handlers are no-ops, so the numbers isolate routing (state lookup + handler selection).
+## Usage: python -m bench.router --users 10000 --messages 200000 --active 0.2
+
+ACTIONS = ["remove", "complete", "remove_habit"]
+
+
+def make_update(update_id: int, user_id: int, text: str) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": text,
+        },
+    }, None)
+
+
+async def run(users: int, messages: int, active: float, seed: int):
+    rng = random.Random(seed)
+    store = InMemoryConversationStore()
+    for user_id in range(1, users + 1):
+        if rng.random() < active:
+            store.set(str(user_id), {"action": rng.choice(ACTIONS)})
+
+    handled = {action: 0 for action in ACTIONS}
+
+    def make_handler(action):
+        async def handler(update, context, state):
+            handled[action] += 1
+        return handler
+
+    text_router = TextRouter(store)
+    for action in ACTIONS:
+        text_router.route(action, make_handler(action))
+
+    updates = [make_update(i, rng.randint(1, users), rng.choice(["1", "2", "hello"])) for i in range(messages)]
+
+    started = time.perf_counter()
+    for update in updates:
+        await text_router.dispatch(update, None)
+    elapsed = time.perf_counter() - started
+
+    print(f"Dispatched {messages} messages from {users} users ({active:.0%} with an active state)")
+    print(f"  routed:  {text_router.dispatched}  {handled}")
+    print(f"  ignored: {text_router.ignored} (no storage access)")
+    print(f"  total:   {elapsed * 1000:.1f} ms — {elapsed / messages * 1e6:.2f} µs/message, "
+          f"{messages / elapsed:,.0f} messages/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure TextRouter dispatch cost with synthetic updates.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--active", type=float, default=0.2, help="share of users with an active conversation state")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.messages, args.active, args.seed))
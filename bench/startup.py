@@ -0,0 +1,178 @@
+# bench/startup.py
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from bench import percentile
+from http_server import HTTPServer, Response
+
+## Measures how fast a replica comes up:
+##   import – wall time of `import main` in a fresh interpreter (minus a bare interpreter start), and
+##            the slowest modules main imports (from -X importtime)
+##   ready  – spawns `python main.py` against a fake Telegram Bot API (TELEGRAM_API_URL) and times it
+##            until GET /ready answers 200, then until the process exits after SIGTERM. With --mode webhook
+##            the bot runs in webhook mode and /ready is probed on the webhook port.
+##
+##   python -m bench.startup --runs 10 --backend memory --max-ready-ms 1000
+##
+## Exits 1 when the p95 spawn → /ready time is above --max-ready-ms (1000 ms by default; 0 turns it off).
+## Runs offline for the memory and sqlite backends; with --backend firestore the time includes
+## connecting to Firestore with the configured credentials.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TOKEN = "123456:bench"
+_BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+# === Fake Bot API ===
+## Answers the calls the bot makes while starting and stopping; getUpdates long-polls briefly.
+async def start_fake_api() -> HTTPServer:
+    def ok(result):
+        async def handle(request):
+            return Response(200, json.dumps({"ok": True, "result": result}), content_type="application/json")
+        return handle
+
+    async def get_updates(request):
+        await asyncio.sleep(0.2)
+        return Response(200, json.dumps({"ok": True, "result": []}), content_type="application/json")
+
+    server = HTTPServer("127.0.0.1", 0)
+    for method, handler in (("getMe", ok(_BOT_USER)), ("deleteWebhook", ok(True)), ("setWebhook", ok(True)),
+                            ("getUpdates", get_updates)):
+        server.route("POST", f"/bot{_TOKEN}/{method}", handler)
+    await server.start()
+    return server
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# === Import ===
+def _time_command(code: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+    return time.perf_counter() - started
+
+
+## Cumulative import time (seconds) of each module imported directly by main, slowest first.
+def slowest_imports(limit: int = 8) -> list:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            rows.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative) / 1e6))
+    main_at = max(i for i, (indent, name, _) in enumerate(rows) if name == "main" and indent == 1)
+    children = []
+    for indent, name, seconds in reversed(rows[:main_at]):
+        if indent == 1:
+            break
+        if indent == 3:
+            children.append((name, seconds))
+    return sorted(children, key=lambda item: -item[1])[:limit]
+
+
+# === Ready ===
+async def _get_status(url: str):
+    def get():
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+        except OSError:
+            return None
+    return await asyncio.to_thread(get)
+
+
+## One start/stop cycle of the bot; returns (seconds until /ready is 200, seconds to exit after SIGTERM).
+async def measure_ready(api_port: int, backend: str, timeout: float, mode: str = "polling"):
+    metrics_port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "TELEGRAM_BOT_TOKEN": _TOKEN, "TELEGRAM_API_URL": f"http://127.0.0.1:{api_port}/bot",
+               "BOT_MODE": mode, "STORAGE_BACKEND": backend,
+               "STORAGE_PATH": os.path.join(tmp, "bench.sqlite3"), "METRICS_PORT": str(metrics_port)}
+        probe_port = metrics_port
+        if mode == "webhook":
+            probe_port = _free_port()
+            env.update({"WEBHOOK_URL": "https://bench.invalid", "WEBHOOK_LISTEN": "127.0.0.1",
+                        "WEBHOOK_PORT": str(probe_port), "WEBHOOK_SECRET": "bench"})
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(sys.executable, "main.py", cwd=ROOT, env=env,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.STDOUT)
+        ready_after = None
+        while time.perf_counter() - started < timeout and process.returncode is None:
+            if await _get_status(f"http://127.0.0.1:{probe_port}/ready") == 200:
+                ready_after = time.perf_counter() - started
+                break
+            await asyncio.sleep(0.01)
+
+        stopping = time.perf_counter()
+        if process.returncode is None:
+            process.send_signal(signal.SIGTERM)
+        output, _ = await process.communicate()
+        stopped_after = time.perf_counter() - stopping
+    if ready_after is None:
+        print(output.decode(errors="replace")[-2000:])
+        raise SystemExit(f"Bot did not become ready within {timeout}s")
+    return ready_after, stopped_after
+
+
+def _summary(samples: list) -> str:
+    samples = sorted(samples)
+    return (f"median {statistics.median(samples) * 1000:7.1f} ms   min {samples[0] * 1000:7.1f} ms   "
+            f"p95 {percentile(samples, 0.95) * 1000:7.1f} ms")
+
+
+async def main(args):
+    print(f"Startup benchmark: {args.runs} runs, {args.backend} backend, {args.mode} mode")
+
+    baseline = [_time_command("pass") for _ in range(args.runs)]
+    imports = [_time_command("import main") for _ in range(args.runs)]
+    base = statistics.median(baseline)
+    print(f"  interpreter start  {_summary(baseline)}")
+    print(f"  import main        {_summary([t - base for t in imports])}   (interpreter start subtracted)")
+    for name, seconds in slowest_imports():
+        print(f"      {name:<24}{seconds * 1000:7.1f} ms")
+
+    api = await start_fake_api()
+    try:
+        results = [await measure_ready(api.port, args.backend, args.timeout, args.mode) for _ in range(args.runs)]
+    finally:
+        await api.stop()
+    print(f"  spawn → /ready     {_summary([ready for ready, _ in results])}")
+    print(f"  SIGTERM → exit     {_summary([stopped for _, stopped in results])}")
+
+    if args.max_ready_ms:
+        p95 = percentile(sorted(ready for ready, _ in results), 0.95) * 1000
+        if p95 > args.max_ready_ms:
+            print(f"  [❌] p95 spawn → /ready {p95:.0f} ms > {args.max_ready_ms:g} ms")
+            raise SystemExit(1)
+        print(f"  [✅] p95 spawn → /ready {p95:.0f} ms <= {args.max_ready_ms:g} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time and time-to-ready of the bot process.")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--backend", default="memory", help="STORAGE_BACKEND of the spawned bot")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling", help="BOT_MODE of the spawned bot")
+    parser.add_argument("--timeout", type=float, default=30.0, help="max seconds to wait for /ready")
+    parser.add_argument("--max-ready-ms", type=float, default=1000.0,
+                        help="fail if the p95 spawn → /ready time exceeds this (0 disables)")
+    asyncio.run(main(parser.parse_args()))
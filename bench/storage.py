@@ -0,0 +1,209 @@
+# bench/storage.py
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from pytz import utc
+import goal_manager
+import repository
+import scheduler
+from bench import percentile
+from cache import UserCache
+from conversation_state import conversation_store
+from partitions import InMemoryLeaseBackend
+from storage_memory import MemoryStorage
+from storage_sqlite import SQLiteStorage
+from user_time import DEFAULT_TIMEZONE, delivery_bucket, get_zone, local_now
+
+## Seeds N users × M habits × D days of history into each storage backend, then drives the real
+## goal_manager handlers with fake updates and reports per-handler latency, followed by one nightly
+## summary run (auto-fill + summaries to a no-op bot) and its throughput. Firestore is left out on
+## purpose: the suite must run offline and must never write into a real project.
+## Usage: python -m bench.storage --backends memory,sqlite --users 2000 --habits 5 --days 90
+##
+## The per-user cache is off by default so the numbers reflect the backend; --cache turns it on.
+
+# The nightly run targets the default zone's bucket: local 23:59 in Asia/Kolkata is 18:29 UTC.
+NIGHTLY_TICK = utc.localize(datetime(2025, 6, 30, 18, 29))
+
+
+class _Message:
+    def __init__(self, text: str):
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        return SimpleNamespace(message_id=1)
+
+
+class _CallbackQuery:
+    def __init__(self, user_id: str, data: str):
+        self.from_user = SimpleNamespace(id=int(user_id))
+        self.message = SimpleNamespace(message_id=1)
+        self.data = data
+
+    async def answer(self, text=None, **kwargs):
+        pass
+
+    async def edit_message_text(self, text, **kwargs):
+        pass
+
+    async def edit_message_reply_markup(self, reply_markup=None, **kwargs):
+        pass
+
+
+def _update(user_id: str, text: str = ""):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=int(user_id)),
+                           effective_chat=SimpleNamespace(id=int(user_id)), message=_Message(text))
+
+
+def _callback(user_id: str, data: str):
+    return SimpleNamespace(effective_user=SimpleNamespace(id=int(user_id)), callback_query=_CallbackQuery(user_id, data))
+
+
+def _context(args=()):
+    return SimpleNamespace(args=list(args), user_data={})
+
+
+class _NullBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+
+def seed(storage, users: int, habits: int, days: int, goals: int, rng: random.Random) -> list:
+    today = NIGHTLY_TICK.astimezone(get_zone(DEFAULT_TIMEZONE)).date()
+    history_days = [(today - timedelta(days=d)).isoformat() for d in range(1, days + 1)]
+    user_ids = [str(100000 + i) for i in range(users)]
+    now = local_now(DEFAULT_TIMEZONE)
+    storage.update_users({user_id: {"timezone": DEFAULT_TIMEZONE,
+                                    "delivery_bucket": delivery_bucket(DEFAULT_TIMEZONE, NIGHTLY_TICK)}
+                          for user_id in user_ids})
+    for user_id in user_ids:
+        for h in range(habits):
+            # Roughly one day in ten is left unanswered, as real users skip days.
+            responses = {d: rng.choice(("yes", "yes", "no")) for d in history_days if rng.random() < 0.9}
+            storage.import_entries(user_id, f"habit-{h}", responses)
+        # Today's goals (what /markcompleted lists) plus a history of past days' goals.
+        for d in range(days):
+            created_at = now - timedelta(days=d)
+            for g in range(goals):
+                storage.add_goal(user_id, {"goal": f"goal {g}", "status": rng.choice(("pending", "completed")) if d else "pending",
+                                           "created_at": created_at, "date": created_at.date().isoformat()})
+    return user_ids
+
+
+async def run_commands(user_ids: list, commands: int, concurrency: int, rng: random.Random) -> dict:
+    latencies = {}
+
+    async def timed(name: str, handler, *args):
+        started = time.perf_counter()
+        await handler(*args)
+        latencies.setdefault(name, []).append(time.perf_counter() - started)
+
+    async def one(user_id: str, kind: int):
+        if kind == 0:
+            await timed("/summary", goal_manager.summary_command, _update(user_id), _context())
+        elif kind == 1:
+            await timed("/addgoal", goal_manager.add_goal, _update(user_id), _context(["bench", "goal"]))
+        elif kind == 2:
+            await timed("/monthlytrackers", goal_manager.monthly_trackers, _update(user_id), _context())
+            state = conversation_store.get(user_id)
+            if state is not None:
+                # Answer every habit of the checklist, then commit them with "Done".
+                for i in range(len(state["habits"])):
+                    await timed("tracker tap", goal_manager.handle_tracker_callback,
+                                _callback(user_id, f"tracker:{i}:yes"), _context())
+                await timed("tracker done", goal_manager.handle_tracker_callback,
+                            _callback(user_id, "tracker:done"), _context())
+        else:
+            await timed("/markcompleted", goal_manager.mark_goal_completed, _update(user_id), _context())
+            state = conversation_store.get(user_id)
+            if state is not None:
+                await timed("goal selection", goal_manager.handle_user_selection, _update(user_id, "1"),
+                            _context(), state)
+
+    plan = [(rng.choice(user_ids), rng.randrange(4)) for _ in range(commands)]
+    pending = iter(plan)
+
+    async def worker():
+        for user_id, kind in pending:
+            await one(user_id, kind)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "latencies": latencies}
+
+
+async def run_nightly(user_count: int) -> float:
+    # A fresh lease backend per run, as every backend replays the same run id.
+    scheduler.lease_backend = InMemoryLeaseBackend()
+    bot = _NullBot()
+    started = time.perf_counter()
+    await scheduler._send_daily_summary(bot, NIGHTLY_TICK)
+    elapsed = time.perf_counter() - started
+    if bot.sent != user_count:
+        print(f"  ⚠️ nightly run sent {bot.sent} of {user_count} summaries")
+    return elapsed
+
+
+async def bench_backend(name: str, storage, args):
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    user_ids = await asyncio.to_thread(seed, storage, args.users, args.habits, args.days, args.goals, rng)
+    print(f"\n[{name}] seeded {args.users} users × {args.habits} habits × {args.days} days "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    repository.set_storage(storage)
+    if not args.cache:
+        repository.user_cache = UserCache(ttl=0)
+
+    result = await run_commands(user_ids, args.commands, args.concurrency, rng)
+    print(f"  {args.commands} commands, concurrency {args.concurrency}: {result['elapsed']:.2f}s "
+          f"({args.commands / result['elapsed']:,.0f} commands/s)")
+    print(f"  {'handler':<18}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for handler, samples in sorted(result["latencies"].items()):
+        samples.sort()
+        print(f"  {handler:<18}{len(samples):>7}{percentile(samples, 0.5) * 1000:>9.2f}"
+              f"{percentile(samples, 0.95) * 1000:>9.2f}{percentile(samples, 0.99) * 1000:>9.2f}")
+
+    elapsed = await run_nightly(len(user_ids))
+    print(f"  nightly job: {len(user_ids)} users in {elapsed:.2f}s ({len(user_ids) / elapsed:,.0f} users/s)")
+
+
+async def main(args):
+    # Nothing but the storage should limit the nightly run: _NullBot has no outbox, leases stay in-process.
+    scheduler.SUMMARY_PROGRESS_EVERY = float("inf")
+
+    for name in args.backends.split(","):
+        if name == "memory":
+            storage = MemoryStorage()
+        elif name == "sqlite":
+            path = args.sqlite_path or os.path.join(tempfile.mkdtemp(prefix="bench-storage-"), "bench.sqlite3")
+            if os.path.exists(path):
+                raise SystemExit(f"{path} already exists; the benchmark needs an empty database")
+            storage = SQLiteStorage(path)
+        else:
+            raise SystemExit(f"Unknown backend {name!r} (expected 'memory' or 'sqlite')")
+        await bench_backend(name, storage, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark handlers and the nightly job on each storage backend.")
+    parser.add_argument("--backends", default="memory,sqlite", help="comma-separated: memory, sqlite")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--habits", type=int, default=5)
+    parser.add_argument("--days", type=int, default=90, help="days of entry history per habit")
+    parser.add_argument("--goals", type=int, default=3, help="goals per user and day")
+    parser.add_argument("--commands", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50, help="commands in flight at once")
+    parser.add_argument("--cache", action="store_true", help="keep the per-user cache enabled")
+    parser.add_argument("--sqlite-path", help="database file for the sqlite backend (default: a temp file)")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
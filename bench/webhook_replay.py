@@ -0,0 +1,135 @@
+# bench/webhook_replay.py
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+## POSTs recorded Telegram Update payloads to a webhook endpoint and reports updates/sec.
+##
+##   python -m bench.webhook_replay --url http://localhost:8080/telegram --file updates.jsonl
+##   python -m bench.webhook_replay --self-test --synthetic 20000
+##
+## --file takes one Update JSON object per line (or a JSON array). --synthetic generates
+## text-message updates instead. --self-test starts a local WebhookServer whose application
+## just sleeps for --handler-ms per update, to measure the server's own throughput offline.
+## Plain HTTP only; each sender keeps one keep-alive connection and writes every request in a
+## single packet, so client-side Nagle delays don't distort the numbers.
+
+
+def load_updates(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def synthetic_updates(count: int, users: int) -> list:
+    now = int(time.time())
+    return [{
+        "update_id": i,
+        "message": {
+            "message_id": i,
+            "date": now,
+            "chat": {"id": 1 + i % users, "type": "private"},
+            "from": {"id": 1 + i % users, "is_bot": False, "first_name": "Replay"},
+            "text": "/summary" if i % 4 == 0 else "1",
+        },
+    } for i in range(count)]
+
+
+## Sends one POST on an open keep-alive connection and returns the response status.
+async def _post(reader, writer, host: str, path: str, body: bytes, secret: str = None) -> int:
+    head = [f"POST {path} HTTP/1.1", f"Host: {host}", "Content-Type: application/json",
+            f"Content-Length: {len(body)}"]
+    if secret:
+        head.append(f"X-Telegram-Bot-Api-Secret-Token: {secret}")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    if length:
+        await reader.readexactly(length)
+    return status
+
+
+async def replay(url: str, updates: list, concurrency: int, secret: str = None) -> dict:
+    parts = urlsplit(url)
+    statuses = Counter()
+    pending = iter(updates)
+
+    async def sender():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        try:
+            for update in pending:
+                try:
+                    status = await _post(reader, writer, parts.netloc, parts.path or "/", json.dumps(update).encode(), secret)
+                    statuses[status] += 1
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    statuses[type(e).__name__] += 1
+                    writer.close()
+                    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"sent": len(updates), "elapsed": elapsed, "statuses": dict(statuses)}
+
+
+## Stand-in for telegram.ext.Application: only what WebhookServer uses.
+class _SleepingApplication:
+    def __init__(self, handler_ms: float):
+        self.bot = None
+        self.handler_ms = handler_ms
+
+    async def process_update(self, update):
+        await asyncio.sleep(self.handler_ms / 1000)
+
+
+async def main(args):
+    updates = load_updates(args.file) if args.file else synthetic_updates(args.synthetic, args.users)
+    server = None
+    url = args.url
+    if args.self_test:
+        from webhook import WebhookServer
+        server = WebhookServer(_SleepingApplication(args.handler_ms), host="127.0.0.1", port=0,
+                               path="/telegram", secret=args.secret)
+        await server.start()
+        url = f"http://127.0.0.1:{server.port}/telegram"
+
+    result = await replay(url, updates, args.concurrency, args.secret)
+    accepted = result["statuses"].get(200, 0)
+    print(f"POSTed {result['sent']} updates to {url} in {result['elapsed']:.2f}s "
+          f"({result['sent'] / result['elapsed']:,.0f} requests/s, {accepted / result['elapsed']:,.0f} accepted/s)")
+    print(f"  responses: {result['statuses']}")
+
+    if server is not None:
+        started = time.perf_counter()
+        await server.stop()
+        print(f"  drained remaining updates in {time.perf_counter() - started:.2f}s; "
+              f"processed {server.processed}, rejected (503) {server.rejected}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay Telegram updates against a webhook endpoint.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/telegram")
+    parser.add_argument("--file", help="recorded updates: JSON lines or a JSON array")
+    parser.add_argument("--synthetic", type=int, default=10000, help="number of generated updates when --file is not given")
+    parser.add_argument("--users", type=int, default=1000, help="distinct chats in generated updates")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--secret", help="value for X-Telegram-Bot-Api-Secret-Token")
+    parser.add_argument("--self-test", action="store_true", help="start a local WebhookServer with a dummy application")
+    parser.add_argument("--handler-ms", type=float, default=5.0, help="simulated handler time in --self-test mode")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,97 @@
+import itertools
+import os
+import time
+from collections import OrderedDict
+
+## Bounded per-user read-through cache. Each user_id owns a small dict of slots
+## ("habits", "entries:<date>", "goals:...", "stats") with a TTL; the least recently used
+## users are evicted once `max_users` is exceeded. All access happens on the event loop thread.
+##
+## A read that overlaps a write must not cache what it read before the write: every invalidation stamps
+## the user with a new generation, and a loaded value is only stored if the user's generation is still the
+## one taken before the load (see repository._cached).
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))   # users kept in memory
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))     # seconds before a slot is re-read
+
+MISSING = object()
+
+
+class UserCache:
+    def __init__(self, max_users: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._generations = OrderedDict()   # user_id -> stamp of their last invalidation, most recent last
+        self._oldest_generation = 0         # stamp reported for users no longer in _generations
+        self._stamps = itertools.count(1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.discarded = 0  # loaded values not stored because a write overlapped the load
+
+    ## Returns the cached value for (user_id, key), or MISSING if absent or expired.
+    def get(self, user_id: str, key: str):
+        slots = self._users.get(user_id)
+        if slots is not None:
+            entry = slots.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._users.move_to_end(user_id)
+                    self.hits += 1
+                    return value
+                del slots[key]
+        self.misses += 1
+        return MISSING
+
+    ## Stamp of the user's last invalidation (for `set`); it changes whenever the user is invalidated.
+    def generation(self, user_id: str) -> int:
+        return self._generations.get(user_id, self._oldest_generation)
+
+    ## Stores a value; with `generation` given, only if the user hasn't been invalidated since it was taken.
+    def set(self, user_id: str, key: str, value, generation: int = None):
+        if generation is not None and self.generation(user_id) != generation:
+            self.discarded += 1
+            return
+        slots = self._users.get(user_id)
+        if slots is None:
+            slots = self._users[user_id] = {}
+        else:
+            self._users.move_to_end(user_id)
+        slots[key] = (value, time.monotonic() + self.ttl)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+            self.evictions += 1
+
+    ## Drops the slots of a user whose key starts with any of `prefixes` (all slots if none given).
+    def invalidate(self, user_id: str, *prefixes: str):
+        self._generations[user_id] = next(self._stamps)
+        self._generations.move_to_end(user_id)
+        if len(self._generations) > self.max_users:
+            # Forgotten users all report the last stamp forgotten; a load spanning this is merely not cached.
+            _, self._oldest_generation = self._generations.popitem(last=False)
+        slots = self._users.get(user_id)
+        if slots is None:
+            return
+        if not prefixes:
+            del self._users[user_id]
+            return
+        for key in [k for k in slots if k.startswith(prefixes)]:
+            del slots[key]
+
+    def clear(self):
+        self._users.clear()
+        self._generations.clear()
+        self._oldest_generation = next(self._stamps)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "discarded": self.discarded,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
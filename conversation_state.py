@@ -0,0 +1,101 @@
+import json
+import os
+import sqlite3
+import time
+
+## Short-lived UI state of a chat (e.g. "waiting for the number of the goal to remove").
+## It lives next to the bot instead of in Firestore, so answering a prompt costs no remote
+## round trip, and it expires on its own after CONVERSATION_TTL seconds. Being per process, it needs all of
+## a chat's updates to reach the same replica (see webhook.py).
+##
+## Backends (CONVERSATION_STORE):
+##   memory – process-local dict (default)
+##   sqlite – local SQLite file (CONVERSATION_STORE_PATH), survives restarts
+
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory")
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", "conversation_state.sqlite3")
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", "600"))
+
+
+class ConversationStore:
+    def get(self, user_id: str):
+        raise NotImplementedError
+
+    def set(self, user_id: str, state: dict):
+        raise NotImplementedError
+
+    def clear(self, user_id: str):
+        raise NotImplementedError
+
+
+class InMemoryConversationStore(ConversationStore):
+    # Expired states are dropped lazily on read and swept every _SWEEP_EVERY writes.
+    _SWEEP_EVERY = 1000
+
+    def __init__(self, ttl: float = CONVERSATION_TTL):
+        self.ttl = ttl
+        self._states = {}
+        self._writes = 0
+
+    def get(self, user_id: str):
+        entry = self._states.get(user_id)
+        if entry is None:
+            return None
+        state, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._states[user_id]
+            return None
+        return state
+
+    def set(self, user_id: str, state: dict):
+        self._states[user_id] = (state, time.monotonic() + self.ttl)
+        self._writes += 1
+        if self._writes % self._SWEEP_EVERY == 0:
+            self._sweep()
+
+    def clear(self, user_id: str):
+        self._states.pop(user_id, None)
+
+    def _sweep(self):
+        now = time.monotonic()
+        for user_id in [uid for uid, (_, expires_at) in self._states.items() if expires_at <= now]:
+            del self._states[user_id]
+
+
+## States are stored as JSON, so they must only hold plain values (str/int/list/dict).
+class SQLiteConversationStore(ConversationStore):
+    def __init__(self, path: str = CONVERSATION_STORE_PATH, ttl: float = CONVERSATION_TTL):
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversation_state ("
+            "user_id TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("DELETE FROM conversation_state WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, user_id: str):
+        row = self._conn.execute(
+            "SELECT state FROM conversation_state WHERE user_id = ? AND expires_at > ?", (user_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, user_id: str, state: dict):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO conversation_state (user_id, state, expires_at) VALUES (?, ?, ?)",
+            (user_id, json.dumps(state), time.time() + self.ttl)
+        )
+
+    def clear(self, user_id: str):
+        self._conn.execute("DELETE FROM conversation_state WHERE user_id = ?", (user_id,))
+
+
+def create_conversation_store(kind: str = CONVERSATION_STORE) -> ConversationStore:
+    if kind == "memory":
+        return InMemoryConversationStore()
+    if kind == "sqlite":
+        return SQLiteConversationStore()
+    raise ValueError(f"Unknown CONVERSATION_STORE: {kind!r} (expected 'memory' or 'sqlite')")
+
+
+conversation_store = create_conversation_store()
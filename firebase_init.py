@@ -1,22 +1,62 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-import os
 import json  # For parsing Firebase credentials from JSON format
+import os
+import threading
+from storage import chunks
+
+## Firebase is set up on first use (get_db), not at import: importing firebase_admin, parsing the
+## credentials and building the gRPC client are a large part of a cold start, and a bad credential
+## should be an error the bot can report (see startup.py) instead of a crash while importing.
+
+# Firestore caps a WriteBatch at 500 operations.
+BATCH_WRITE_LIMIT = 500
+
+_db = None
+_lock = threading.Lock()
 
-## Attempt to load Firebase credentials from the FIREBASE_CREDENTIALS environment variable.
-cred_json = os.getenv("FIREBASE_CREDENTIALS")
 
-if cred_json:
-    # Load from env (Railway or prod)
-    cred_dict = json.loads(cred_json)
-    cred = credentials.Certificate(cred_dict)
-else:
+## Attempt to load Firebase credentials from the FIREBASE_CREDENTIALS environment variable.
+def _load_credentials():
+    from firebase_admin import credentials
+    cred_json = os.getenv("FIREBASE_CREDENTIALS")
+    if cred_json:
+        # Load from env (Railway or prod)
+        return credentials.Certificate(json.loads(cred_json))
     # Fallback to local file for development
-    cred = credentials.Certificate("serviceAccountKey.json")
+    return credentials.Certificate("serviceAccountKey.json")
+
+
+## Returns the Firestore client, initializing the Firebase app on the first call. Thread-safe; a failed
+## attempt raises and is retried by the next call.
+def get_db():
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                import firebase_admin
+                from firebase_admin import firestore
+                if not firebase_admin._apps:
+                    firebase_admin.initialize_app(_load_credentials())
+                _db = firestore.client()
+    return _db
+
+
+## Base of the classes that talk to Firestore (storage_firestore.FirestoreStorage, the partition leases).
+## `db` is the client given to the constructor, or get_db() on first use, so creating one never connects
+## anywhere.
+class FirestoreClient:
+    def __init__(self, db=None):
+        self._db = db
 
-## Initialize the Firebase app if it hasn't been initialized already.
-if not firebase_admin._apps:
-    firebase_admin.initialize_app(cred)
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_db()
+        return self._db
 
-## Create and expose the Firestore client for database operations.
-db = firestore.client()
\ No newline at end of file
+    ## Deletes the documents in WriteBatch commits of up to BATCH_WRITE_LIMIT.
+    def delete_documents(self, refs: list):
+        for chunk in chunks(refs, BATCH_WRITE_LIMIT):
+            batch = self.db.batch()
+            for ref in chunk:
+                batch.delete(ref)
+            batch.commit()
@@ -1,11 +1,17 @@
-from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from firebase_init import db
-from datetime import datetime, time, timedelta
-from pytz import timezone
+import asyncio
+import repository
+import reports
+from conversation_state import conversation_store
+from habit_stats import yes_percentage
+from user_time import local_now, normalize_timezone
 
 
-IST = timezone("Asia/Kolkata")
+## Current time in the user's own time zone; every "today" in this module follows it.
+async def user_now(user_id: str):
+    return local_now(await repository.get_user_timezone(user_id))
+
 
 ## Handler for /start command: sends a welcome message and instructions to the user.
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -20,9 +26,15 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "🧠 *Monthly Habit Tracking*\n"
         "• /addhabit <habit> - Start tracking a new habit\n"
         "• /removehabit - Remove a habit\n"
-        "• /monthlytrackers - Log your habits for today (Yes/No/Later)\n\n"
-        "🕛 Every night at *00:00 IST*, I'll send you a summary of your goals and habit tracking.\n\n"
-        "📆 At the end of the month, you'll receive a full *PDF report* of your progress (coming soon!)\n\n"
+        "• /monthlytrackers - Log your habits for today from one checklist\n"
+        "• /stats - Habit rates over 7 and 30 days, trends and best weekdays\n"
+        "• /streaks - Current and longest streak of every habit\n\n"
+        "🌍 *Settings*\n"
+        "• /timezone <Area/City> - Set your time zone (e.g. Europe/Berlin)\n\n"
+        "📄 *Reports*\n"
+        "• /report [YYYY-MM] - Get a PDF report (and CSV export) of a month, this month by default\n\n"
+        "🕛 Every night at *midnight* in your time zone (IST by default), I'll send you a summary of your goals and habit tracking.\n\n"
+        "📆 At the end of the month, you'll receive a full *PDF report* of your progress.\n\n"
         "Let's get started — type /addgoal or /addhabit to begin!",
         parse_mode="Markdown"
     )
@@ -39,11 +51,7 @@ async def add_goal(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ Usage: /addgoal <goal>")
         return
     
-    db.collection("users").document(user_id).collection("goals").add({
-        "goal": goal_text,
-        "status": "pending",
-        "created_at": datetime.now(IST)
-    })
+    await repository.add_goal(user_id, goal_text, await user_now(user_id))
 
     await update.message.reply_text(f"✅ Goal added: {goal_text}")
 
@@ -52,19 +60,16 @@ async def add_goal(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ## Handler for /removegoal command: lists pending goals for removal.
 async def remove_goal(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    goals_ref = db.collection("users").document(user_id).collection("goals")
-    goals = list(goals_ref.where("status", "==", "pending").stream())
+    today_str = (await user_now(user_id)).date().isoformat()
+    goals = await repository.get_pending_goals(user_id, today_str)
 
     if not goals:
         await update.message.reply_text("🎉 No pending goals to remove.")
         return
 
-    db.collection("users").document(user_id).collection("pending_action").document("current").set({
-        "action": "remove",
-        "goals": [{"id": g.id, **g.to_dict()} for g in goals]
-    })
+    conversation_store.set(user_id, {"action": "remove", "goals": [{"id": g["id"], "goal": g["goal"]} for g in goals]})
 
-    goal_list = "\n".join([f"{i+1}. {g.to_dict()['goal']}" for i, g in enumerate(goals)])
+    goal_list = "\n".join([f"{i+1}. {g['goal']}" for i, g in enumerate(goals)])
     await update.message.reply_text(f"Select the goal to remove by sending a number:\n{goal_list}")
 
 
@@ -72,33 +77,24 @@ async def remove_goal(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ## Handler for /markcompleted command: lists pending goals to be marked as completed.
 async def mark_goal_completed(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    goals_ref = db.collection("users").document(user_id).collection("goals")
-    goals = list(goals_ref.where("status", "==", "pending").stream())
+    today_str = (await user_now(user_id)).date().isoformat()
+    goals = await repository.get_pending_goals(user_id, today_str)
 
     if not goals:
         await update.message.reply_text("🎉 No pending goals to mark as completed.")
         return
 
-    db.collection("users").document(user_id).collection("pending_action").document("current").set({
-        "action": "complete",
-        "goals": [{"id": g.id, **g.to_dict()} for g in goals]
-    })
+    conversation_store.set(user_id, {"action": "complete", "goals": [{"id": g["id"], "goal": g["goal"]} for g in goals]})
 
-    goal_list = "\n".join([f"{i+1}. {g.to_dict()['goal']}" for i, g in enumerate(goals)])
+    goal_list = "\n".join([f"{i+1}. {g['goal']}" for i, g in enumerate(goals)])
     await update.message.reply_text(f"Select the goal to mark as completed:\n{goal_list}")
 
 
 # === Handle Selection (Step 2) ===
-## Processes the user's numeric selection for goal removal or completion.
-async def handle_user_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
+## Processes the user's numeric selection for goal removal or completion (routed for "remove"/"complete" states).
+async def handle_user_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, data: dict):
     user_id = str(update.effective_user.id)
-    user_doc = db.collection("users").document(user_id)
-    action_doc = user_doc.collection("pending_action").document("current").get()
-
-    if not action_doc.exists:
-        return
 
-    data = action_doc.to_dict()
     try:
         index = int(update.message.text.strip()) - 1
         goals = data.get("goals", [])
@@ -112,14 +108,14 @@ async def handle_user_selection(update: Update, context: ContextTypes.DEFAULT_TY
         action = data.get("action")
 
         if action == "remove":
-            user_doc.collection("goals").document(goal_id).delete()
+            await repository.delete_goal(user_id, goal_id)
             await update.message.reply_text(f"🗑️ Removed goal: {goal_text}")
 
         elif action == "complete":
-            user_doc.collection("goals").document(goal_id).update({"status": "completed"})
+            await repository.complete_goal(user_id, goal_id)
             await update.message.reply_text(f"🎯 Marked as completed: {goal_text}")
 
-        user_doc.collection("pending_action").document("current").delete()
+        conversation_store.clear(user_id)
 
     except ValueError:
         await update.message.reply_text("⚠️ Please reply with a number.")
@@ -127,18 +123,14 @@ async def handle_user_selection(update: Update, context: ContextTypes.DEFAULT_TY
 
 ## Generates today's summary text including goals and habit tracker responses.
 async def get_today_summary_text(user_id: str) -> str:
-    now = datetime.now(IST)
-    today = now.date()
-    start_dt = datetime.combine(today, time(0, 0, tzinfo=IST))
-    end_dt = start_dt + timedelta(days=1)
+    tz_name = await repository.get_user_timezone(user_id)
+    today = local_now(tz_name).date()
     today_str = today.isoformat()
 
-    goals_ref = db.collection("users").document(user_id).collection("goals")
-    docs = list(goals_ref.where("created_at", ">=", start_dt).where("created_at", "<", end_dt).stream())
+    goals = await repository.get_goals_for_date(user_id, today_str)
 
     lines = []
-    for doc in docs:
-        data = doc.to_dict()
+    for data in goals:
         status_emoji = "✅" if data.get("status") == "completed" else "❌"
         lines.append(f"{data.get('goal')} {status_emoji}")
 
@@ -146,14 +138,11 @@ async def get_today_summary_text(user_id: str) -> str:
     summary = header + ("\n".join(f"{i+1}. {line}" for i, line in enumerate(lines)) if lines else "No goals recorded today.")
 
     # Fetch habit tracker responses
-    habits_ref = db.collection("users").document(user_id).collection("trackers").list_documents()
     tracker_lines = []
-    for habit_doc in habits_ref:
-        habit_name = habit_doc.id
-        entry_ref = habit_doc.collection("entries").document(today_str)
-        entry_doc = entry_ref.get()
-        if entry_doc.exists:
-            response = entry_doc.to_dict().get("response", "N/A").capitalize()
+    entries = await repository.get_entries_for_date(user_id, today_str)
+    for habit_name, response in entries.items():
+        if response is not None:
+            response = response.capitalize()
             status_emoji = "✅" if response == 'Yes' else "❌"
             tracker_lines.append(f"{habit_name}: {status_emoji}")
         else:
@@ -165,22 +154,20 @@ async def get_today_summary_text(user_id: str) -> str:
     return summary
 
 ## Generates a detailed midnight summary including goal completion percentages and habit tracking.
-async def get_detailed_midnight_summary(user_id: str) -> str:
-    now = datetime.now(IST)
-    today = now.date()
-    start_dt = datetime.combine(today, time(0, 0, tzinfo=IST))
-    end_dt = start_dt + timedelta(days=1)
+## `day` defaults to the user's current local date; the nightly job passes the day it is summarising.
+async def get_detailed_midnight_summary(user_id: str, day=None) -> str:
+    tz_name = await repository.get_user_timezone(user_id)
+    today = day or local_now(tz_name).date()
     today_str = today.isoformat()
 
     summary_lines = [f"📅 Summary for {today_str}"]
 
     # === GOALS ===
-    goals_ref = db.collection("users").document(user_id).collection("goals")
-    goal_docs = list(goals_ref.where("created_at", ">=", start_dt).where("created_at", "<", end_dt).stream())
+    goal_docs = await repository.get_goals_for_date(user_id, today_str)
 
     if goal_docs:
-        completed = [doc for doc in goal_docs if doc.to_dict().get("status") == "completed"]
-        pending = [doc for doc in goal_docs if doc.to_dict().get("status") != "completed"]
+        completed = [doc for doc in goal_docs if doc.get("status") == "completed"]
+        pending = [doc for doc in goal_docs if doc.get("status") != "completed"]
         total = len(goal_docs)
         percent = (len(completed) / total) * 100 if total else 0
 
@@ -190,32 +177,22 @@ async def get_detailed_midnight_summary(user_id: str) -> str:
         if completed:
             summary_lines.append("\n✅ Completed:")
             for doc in completed:
-                summary_lines.append(f"- {doc.to_dict().get('goal')}")
+                summary_lines.append(f"- {doc.get('goal')}")
 
         if pending:
             summary_lines.append("\n❌ Missed:")
             for doc in pending:
-                summary_lines.append(f"- {doc.to_dict().get('goal')}")
+                summary_lines.append(f"- {doc.get('goal')}")
     else:
         summary_lines.append("\n🎯 GOALS:\nNo goals set for today.")
 
     # === HABITS ===
     summary_lines.append("\n🧠 HABITS:")
-    habits_ref = list(db.collection("users").document(user_id).collection("trackers").list_documents())
-
-    if habits_ref:
-        for habit_doc in habits_ref:
-            habit_name = habit_doc.id
-            entries_ref = habit_doc.collection("entries").stream()
-            yes_count, total_entries = 0, 0
-            for entry in entries_ref:
-                resp = entry.to_dict().get("response", "").lower()
-                if resp:
-                    total_entries += 1
-                    if resp == "yes":
-                        yes_count += 1
-            percent = (yes_count / total_entries) * 100 if total_entries else 0
-            summary_lines.append(f"- {habit_name}: {percent:.0f}%")
+    habit_stats = await repository.get_habit_stats(user_id)
+
+    if habit_stats:
+        for habit_name, stats in habit_stats.items():
+            summary_lines.append(f"- {habit_name}: {yes_percentage(stats):.0f}%")
     else:
         summary_lines.append("No habits tracking for this month.")
 
@@ -229,66 +206,94 @@ async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = await get_today_summary_text(user_id)
     await update.message.reply_text(text)
 
-## Handler for /monthlytrackers command: prompts the user to answer daily habit tracking questions.
+# === Monthly Trackers ===
+_TRACKER_MARKS = {"yes": "✅", "no": "❌", None: "▫️"}
+
+
+## Checklist keyboard: one row per habit ([mark + name] [Yes] [No]) and a Done row. Callback data is
+## "tracker:<index>:<yes|no|clear>" (an index into the state's habit list, as callback data is capped at
+## 64 bytes) or "tracker:done".
+def _tracker_keyboard(habits: list, answers: dict) -> InlineKeyboardMarkup:
+    rows = []
+    for i, habit in enumerate(habits):
+        answer = answers.get(habit)
+        rows.append([
+            InlineKeyboardButton(f"{_TRACKER_MARKS[answer]} {habit}", callback_data=f"tracker:{i}:clear"),
+            InlineKeyboardButton("✅ Yes" if answer == "yes" else "Yes", callback_data=f"tracker:{i}:yes"),
+            InlineKeyboardButton("❌ No" if answer == "no" else "No", callback_data=f"tracker:{i}:no"),
+        ])
+    rows.append([InlineKeyboardButton("💾 Done", callback_data="tracker:done")])
+    return InlineKeyboardMarkup(rows)
+
+
+## Parses answer data ("tracker:<index>:<yes|no|clear>") into (index, answer); None if it is malformed or the
+## index is out of range (callback data comes from the client and can be forged).
+def _parse_tracker_tap(data: str, habit_count: int):
+    parts = data.split(":")
+    if len(parts) != 3 or not parts[1].isdecimal() or parts[2] not in ("yes", "no", "clear"):
+        return None
+    index = int(parts[1])
+    return (index, parts[2]) if index < habit_count else None
+
+
+## Handler for /monthlytrackers command: sends a checklist of today's unanswered habits (one read pass).
+## Taps only change the conversation state; all answers are stored together on "Done".
 async def monthly_trackers(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    today_str = datetime.now(IST).date().isoformat()
-
-    # Dynamically load user's habits
-    habit_docs = db.collection("users").document(user_id).collection("trackers").list_documents()
-    user_habits = [doc.id for doc in habit_docs]
-
-    for habit in user_habits:
-        doc_ref = db.collection("users").document(user_id)\
-                    .collection("trackers").document(habit)\
-                    .collection("entries").document(today_str)
-        if doc_ref.get().exists:
-            continue  # already answered today
-
-        context.user_data["current_tracker_habit"] = habit
-
-        reply_markup = ReplyKeyboardMarkup(
-            [[KeyboardButton("Yes"), KeyboardButton("No"), KeyboardButton("Later")]],
-            one_time_keyboard=True,
-            resize_keyboard=True
-        )
-
-        await update.message.reply_text(f"Did you perform the habit: *{habit}* today?",
-                                        parse_mode="Markdown",
-                                        reply_markup=reply_markup)
-        return  # wait for response before moving to next
-
-    await update.message.reply_text("✅ All trackers already recorded for today.")
-
-
-## Processes the user's response for habit tracking and schedules the next tracker if available.
-async def handle_tracker_response(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = str(update.effective_user.id)
-    response = update.message.text.strip().lower()
-    today_str = datetime.now(IST).date().isoformat()
+    today_str = (await user_now(user_id)).date().isoformat()
 
-    if "current_tracker_habit" not in context.user_data:
+    entries = await repository.get_entries_for_date(user_id, today_str)
+    habits = [habit for habit, response in entries.items() if response is None]
+    if not habits:
+        conversation_store.clear(user_id)
+        await update.message.reply_text("✅ All trackers already recorded for today.")
         return
 
-    habit = context.user_data["current_tracker_habit"]
-
-    if response in ["yes", "no"]:
-        # store response
-        doc_ref = db.collection("users").document(user_id)\
-                    .collection("trackers").document(habit)\
-                    .collection("entries").document(today_str)
-        doc_ref.set({"response": response})
-    elif response == "will enter later":
-        # do not store — so we ask it again later
-        await update.message.reply_text(f"🕒 Skipped for now: {habit}")
-    else:
-        await update.message.reply_text("⚠️ Invalid response. Please choose from the options.")
-        return  # don't continue if response is invalid
+    message = await update.message.reply_text(
+        f"📝 Did you perform these habits today ({today_str})?\n"
+        "Tap Yes or No for each, then Done. Habits you leave open can be logged later.",
+        reply_markup=_tracker_keyboard(habits, {}))
+    conversation_store.set(user_id, {"action": "tracker", "date": today_str, "habits": habits, "answers": {},
+                                     "message_id": message.message_id})
+
+
+## Handles taps on the tracker checklist (callback data "tracker:..."): an answer edits the keyboard in place,
+## "Done" stores every answer in one write. Answers count for the day the checklist was sent, even after midnight.
+async def handle_tracker_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    user_id = str(query.from_user.id)
+    state = conversation_store.get(user_id)
+    if not state or state.get("action") != "tracker" or state.get("message_id") != query.message.message_id:
+        await query.answer("⌛ This checklist has expired. Send /monthlytrackers for a new one.")
+        await query.edit_message_reply_markup(reply_markup=None)
+        return
 
-    context.user_data.pop("current_tracker_habit")
+    habits, answers = state["habits"], state["answers"]
+    if query.data == "tracker:done":
+        await repository.set_entries(user_id, state["date"], answers)
+        conversation_store.clear(user_id)
+        await query.answer()
+        lines = [f"{_TRACKER_MARKS[answers.get(habit)]} {habit}" for habit in habits]
+        text = f"✅ Logged {len(answers)} of {len(habits)} habits for {state['date']}."
+        if len(answers) < len(habits):
+            text += "\n🕒 The rest are open — run /monthlytrackers again to log them."
+        await query.edit_message_text(text + "\n\n" + "\n".join(lines))
+        return
 
-    # Ask next habit
-    await monthly_trackers(update, context)
+    tap = _parse_tracker_tap(query.data, len(habits))
+    if tap is None:
+        await query.answer("⚠️ Unknown button. Send /monthlytrackers for a new checklist.")
+        return
+    index, answer = tap
+    habit = habits[index]
+    updated = {h: a for h, a in answers.items() if h != habit}
+    if answer != "clear" and answers.get(habit) != answer:
+        updated[habit] = answer  # tapping the current answer again clears it
+    await query.answer()
+    if updated == answers:
+        return  # nothing to redraw (Telegram rejects an unchanged keyboard)
+    conversation_store.set(user_id, {**state, "answers": updated})
+    await query.edit_message_reply_markup(reply_markup=_tracker_keyboard(habits, updated))
 
 
 # === Add Habit ===
@@ -301,9 +306,10 @@ async def add_habit_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⚠️ Usage: /addhabit <habit name>")
         return
 
-    db.collection("users").document(user_id)\
-        .collection("trackers").document(habit_text).set({})
-    
+    if not await repository.add_habit(user_id, habit_text):
+        await update.message.reply_text(f"⚠️ You're already tracking: {habit_text}")
+        return
+
     await update.message.reply_text(f"✅ Habit added: {habit_text}")
 
 
@@ -313,38 +319,142 @@ async def remove_habit_command(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = str(update.effective_user.id)
 
     # Get list of habits
-    habits = list(db.collection("users").document(user_id).collection("trackers").list_documents())
-    if not habits:
+    habit_names = await repository.list_habits(user_id)
+    if not habit_names:
         await update.message.reply_text("No habits found.")
         return
 
-    context.user_data["habit_removal_list"] = habits
-    habit_names = [doc.id for doc in habits]
+    conversation_store.set(user_id, {"action": "remove_habit", "habits": habit_names})
     habit_list = "\n".join([f"{i+1}. {name}" for i, name in enumerate(habit_names)])
     await update.message.reply_text(f"Select the habit to remove by sending a number:\n{habit_list}")
 
 
 # === Handle Habit Removal Selection ===
-## Processes the user's numeric selection to remove a habit from tracking.
-async def handle_habit_removal_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
+## Processes the user's numeric selection to remove a habit from tracking (routed for "remove_habit" state).
+async def handle_habit_removal_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, state: dict):
     user_id = str(update.effective_user.id)
 
-    if "habit_removal_list" not in context.user_data:
-        return
-
     try:
         index = int(update.message.text.strip()) - 1
-        habit_docs = context.user_data["habit_removal_list"]
+        habit_names = state["habits"]
 
-        if index < 0 or index >= len(habit_docs):
+        if index < 0 or index >= len(habit_names):
             await update.message.reply_text("⚠️ Invalid selection.")
             return
 
-        habit_doc = habit_docs[index]
-        habit_doc.delete()
+        habit = habit_names[index]
+        await repository.delete_habit(user_id, habit)
 
-        await update.message.reply_text(f"🗑️ Removed habit: {habit_doc.id}")
-        context.user_data.pop("habit_removal_list")
+        await update.message.reply_text(f"🗑️ Removed habit: {habit}")
+        conversation_store.clear(user_id)
 
     except ValueError:
-        await update.message.reply_text("⚠️ Please reply with a number.")
\ No newline at end of file
+        await update.message.reply_text("⚠️ Please reply with a number.")
+
+
+# === Time Zone ===
+## Handler for /timezone command: shows or sets the user's time zone (IANA name, e.g. Europe/Berlin).
+async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+
+    if not context.args:
+        current = await repository.get_user_timezone(user_id)
+        await update.message.reply_text(f"🌍 Your time zone: {current}\n"
+                                        "⚠️ Usage: /timezone <Area/City>, e.g. /timezone Europe/Berlin")
+        return
+
+    tz_name = normalize_timezone(" ".join(context.args))
+    if tz_name is None:
+        await update.message.reply_text("⚠️ Unknown time zone. Use an Area/City name like Europe/Berlin or America/New_York.")
+        return
+
+    await repository.set_user_timezone(user_id, tz_name)
+    now = local_now(tz_name)
+    await update.message.reply_text(f"✅ Time zone set to {tz_name} (local time {now:%H:%M}). "
+                                    "Your daily summary will arrive just before your midnight.")
+
+
+# === Monthly Report ===
+## Handler for /report [YYYY-MM]: sends the month's PDF report and CSV export (current month by default).
+async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    tz_name = await repository.get_user_timezone(user_id)
+
+    if context.args:
+        parsed = reports.parse_month(context.args[0])
+        if parsed is None:
+            await update.message.reply_text("⚠️ Usage: /report [YYYY-MM], e.g. /report 2025-06")
+            return
+        year, month = parsed
+    else:
+        today = local_now(tz_name).date()
+        year, month = today.year, today.month
+
+    report = await reports.get_monthly_report(user_id, year, month, tz_name)
+    if report is None:
+        await update.message.reply_text(f"📭 No goals or habit entries for {year:04d}-{month:02d}.")
+        return
+
+    pdf, csv_data = await asyncio.gather(asyncio.to_thread(reports.read_file, report["pdf"]),
+                                         asyncio.to_thread(reports.read_file, report["csv"]))
+    await update.message.reply_document(document=pdf, filename=f"goal-tracker-{report['month']}.pdf",
+                                        caption=f"📄 Your report for {report['month']}")
+    await update.message.reply_document(document=csv_data, filename=f"goal-tracker-{report['month']}.csv")
+
+
+# === Habit Stats ===
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def _percent(rate) -> str:
+    return "–" if rate is None else f"{rate * 100:.0f}%"
+
+
+def _trend_arrow(change) -> str:
+    if change is None or abs(change) < 0.05:
+        return "→"
+    return "↑" if change > 0 else "↓"
+
+
+## Runs the analytics over the history kept on the user's tracker records (one cached read for all habits).
+async def _habit_analytics(user_id: str):
+    import habit_analytics  # loads numpy
+    stats = await repository.get_habit_stats(user_id)
+    return habit_analytics.analyze(stats, (await user_now(user_id)).date())
+
+
+## Handler for /stats command: 7- and 30-day rates with their trend, all-time rate and weekday pattern per habit.
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    analytics = await _habit_analytics(user_id)
+    if not analytics["habits"]:
+        await update.message.reply_text("📭 No habits tracked yet. Add one with /addhabit <habit>.")
+        return
+
+    lines = ["📊 HABIT STATS (last 7 days · last 30 days · all time)"]
+    for habit, figures in analytics["habits"].items():
+        lines.append(f"\n• {habit}: {_percent(figures['rate_7'])} {_trend_arrow(figures['trend_7'])} · "
+                     f"{_percent(figures['rate_30'])} · {_percent(figures['rate_all'])}")
+        rated = [(rate, day) for rate, day in zip(figures["weekdays"], _WEEKDAYS) if rate is not None]
+        if len(rated) > 1:
+            best, worst = max(rated), min(rated)
+            lines.append(f"   best on {best[1]} ({_percent(best[0])}), weakest on {worst[1]} ({_percent(worst[0])})")
+
+    weekdays = " ".join(f"{day} {_percent(rate)}" for day, rate in zip(_WEEKDAYS, analytics["weekdays"]))
+    lines.append(f"\n📅 By weekday, all habits: {weekdays}")
+    await update.message.reply_text("\n".join(lines))
+
+
+## Handler for /streaks command: current and longest "yes" streak of every habit, longest-running first.
+async def streaks_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    analytics = await _habit_analytics(user_id)
+    if not analytics["habits"]:
+        await update.message.reply_text("📭 No habits tracked yet. Add one with /addhabit <habit>.")
+        return
+
+    lines = ["🔥 STREAKS (current · best)"]
+    for habit, figures in sorted(analytics["habits"].items(), key=lambda item: -item[1]["current_streak"]):
+        days = figures["current_streak"]
+        lines.append(f"• {habit}: {days} day{'s' if days != 1 else ''} · {figures['longest_streak']}")
+    await update.message.reply_text("\n".join(lines))
@@ -0,0 +1,110 @@
+import calendar
+from datetime import date
+import numpy as np
+from habit_stats import NO, UNANSWERED, YES
+
+## Streak and trend analytics over the day-by-day history kept on each tracker (habit_stats "history").
+## A user's habits are laid out as one (habits × days) array of day codes, from the first month with any
+## history up to today, so every figure below is computed for all habits at once:
+##   current_streak / longest_streak – consecutive "yes" days (the current one ends today, or yesterday
+##                                     while today is still unanswered)
+##   rate_7 / rate_30                – share of answered days that were "yes" in the last 7 / 30 days
+##   trend_7                         – rate_7 now minus rate_7 a week ago
+##   rate_all                        – the same share over the whole history
+##   weekdays                        – the share per weekday, Monday first
+## Rates are None where there is no answered day to base them on.
+
+_YES, _NO = ord(YES), ord(NO)
+
+
+## Day codes as a (habits × days) uint8 array for first_day..today, plus first_day.
+def history_matrix(histories: list, today: date):
+    today_month = today.strftime("%Y-%m")
+    months = sorted({month for history in histories for month in history if month <= today_month})
+    first_day = date.fromisoformat(months[0] + "-01") if months else today.replace(day=1)
+
+    spans = []
+    year, month = first_day.year, first_day.month
+    while (year, month) <= (today.year, today.month):
+        spans.append((f"{year:04d}-{month:02d}", calendar.monthrange(year, month)[1]))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    days = (today - first_day).days + 1
+    rows = ["".join(history.get(key, "")[:length].ljust(length, UNANSWERED) for key, length in spans)[:days]
+            for history in histories]
+    codes = np.frombuffer("".join(rows).encode("ascii"), dtype=np.uint8).reshape(len(histories), days)
+    return codes, first_day
+
+
+def _rates(yes, answered):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return yes / answered
+
+
+## Number of consecutive True values ending at column `end` of each row (0 if end is before the start).
+def _run_ending(flags, end: int):
+    if end < 0:
+        return np.zeros(len(flags), dtype=np.int64)
+    window = flags[:, end::-1]
+    return np.where(window.all(axis=1), window.shape[1], np.argmin(window, axis=1))
+
+
+## Longest run of True values in each row.
+def _longest_run(flags):
+    padded = np.zeros((flags.shape[0], flags.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = flags
+    steps = np.diff(padded, axis=1)
+    starts, ends = np.nonzero(steps == 1), np.nonzero(steps == -1)
+    longest = np.zeros(flags.shape[0], dtype=np.int64)
+    np.maximum.at(longest, starts[0], ends[1] - starts[1])  # starts and ends pair up row by row
+    return longest
+
+
+## Trailing sums over `window` days ending at each day (days before the history count as 0).
+def _rolling(counts, window: int):
+    totals = np.cumsum(counts, axis=1)
+    totals = np.pad(totals, ((0, 0), (window, 0)))
+    return totals[:, window:] - totals[:, :-window]
+
+
+def _value(rate):
+    return None if np.isnan(rate) else float(rate)
+
+
+## Returns {"habits": {habit: figures}, "weekdays": [rate per weekday over all habits]} for a user's
+## {habit: aggregates} (repository.get_habit_stats) as of `today`, the user's local date.
+def analyze(stats_by_habit: dict, today: date) -> dict:
+    habits = list(stats_by_habit)
+    codes, first_day = history_matrix([stats_by_habit[habit].get("history") or {} for habit in habits], today)
+    yes = (codes == _YES).astype(np.int32)
+    answered = yes + (codes == _NO)
+    days = codes.shape[1]
+
+    current = np.where(answered[:, -1] > 0, _run_ending(yes > 0, days - 1), _run_ending(yes > 0, days - 2))
+    longest = _longest_run(yes > 0)
+
+    yes_7, answered_7 = _rolling(yes, 7), _rolling(answered, 7)
+    rate_7 = _rates(yes_7[:, -1], answered_7[:, -1])
+    week_ago = _rates(yes_7[:, -8], answered_7[:, -8]) if days > 7 else np.full(len(habits), np.nan)
+    rate_30 = _rates(_rolling(yes, 30)[:, -1], _rolling(answered, 30)[:, -1])
+    rate_all = _rates(yes.sum(axis=1), answered.sum(axis=1))
+
+    # (days × 7) one-hot weekday matrix: per-weekday counts for every habit in one product.
+    weekday = (first_day.weekday() + np.arange(days)) % 7
+    one_hot = (weekday[:, None] == np.arange(7)).astype(np.int32)
+    yes_by_weekday, answered_by_weekday = yes @ one_hot, answered @ one_hot
+    weekday_rates = _rates(yes_by_weekday, answered_by_weekday)
+    overall_weekdays = _rates(yes_by_weekday.sum(axis=0), answered_by_weekday.sum(axis=0))
+
+    figures = {}
+    for i, habit in enumerate(habits):
+        figures[habit] = {
+            "current_streak": int(current[i]),
+            "longest_streak": int(longest[i]),
+            "rate_7": _value(rate_7[i]),
+            "rate_30": _value(rate_30[i]),
+            "trend_7": _value(rate_7[i] - week_ago[i]),
+            "rate_all": _value(rate_all[i]),
+            "weekdays": [_value(rate) for rate in weekday_rates[i]],
+        }
+    return {"habits": figures, "weekdays": [_value(rate) for rate in overall_weekdays]}
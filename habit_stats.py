@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+
+## Running aggregates kept on each tracker document (users/{id}/trackers/{habit}), so summaries never have to
+## rescan a habit's full entry history:
+##   yes_count / total   – answered days and how many of them were "yes"
+##   current_streak      – consecutive "yes" days ending at last_date
+##   streak_before       – the streak as it stood the day before last_date (lets last_date be re-answered)
+##   last_date           – most recent answered day (ISO date)
+##   months              – {"YYYY-MM": {"yes": n, "total": m}}
+##   history             – {"YYYY-MM": day codes}, one character per day of the month from the 1st:
+##                         "y", "n", or "." for an unanswered day; trailing unanswered days are left off
+##                         (the compact layout habit_analytics reads as arrays)
+
+YES, NO, UNANSWERED = "y", "n", "."
+
+
+## Returns the aggregate fields of a tracker document, with defaults for habits that have none yet.
+def empty_stats() -> dict:
+    return {"yes_count": 0, "total": 0, "current_streak": 0, "streak_before": 0, "last_date": None, "months": {},
+            "history": {}}
+
+
+def read_stats(data: dict) -> dict:
+    stats = empty_stats()
+    if data:
+        stats.update({key: data[key] for key in stats if key in data})
+    return stats
+
+
+## Returns the updated aggregates after storing `response` for `date_str`.
+## `previous` is the response already stored for that date (None if the day was unanswered).
+def apply_entry(stats: dict, date_str: str, response: str, previous: str = None) -> dict:
+    stats = read_stats(stats)
+    is_yes = response == "yes"
+    was_yes = previous == "yes"
+
+    if previous is None:
+        stats["total"] += 1
+    stats["yes_count"] += int(is_yes) - int(was_yes)
+
+    month_key = date_str[:7]
+    month = dict(stats["months"].get(month_key, {"yes": 0, "total": 0}))
+    if previous is None:
+        month["total"] += 1
+    month["yes"] += int(is_yes) - int(was_yes)
+    stats["months"] = {**stats["months"], month_key: month}
+
+    day = int(date_str[8:10]) - 1
+    days = stats["history"].get(month_key, "").ljust(day + 1, UNANSWERED)
+    code = YES if is_yes else NO
+    stats["history"] = {**stats["history"], month_key: days[:day] + code + days[day + 1:]}
+
+    last_date = stats["last_date"]
+    if last_date is None or date_str > last_date:
+        yesterday = (date.fromisoformat(date_str) - timedelta(days=1)).isoformat()
+        base = stats["current_streak"] if last_date == yesterday else 0
+        stats["streak_before"] = base
+        stats["current_streak"] = base + 1 if is_yes else 0
+        stats["last_date"] = date_str
+    elif date_str == last_date:
+        stats["current_streak"] = stats["streak_before"] + 1 if is_yes else 0
+    # Answers for days before last_date only change the counters; the streak is anchored at last_date.
+
+    return stats
+
+
+## Rebuilds the aggregates from scratch from {date_str: response} (used by the backfill).
+def compute_stats(responses: dict) -> dict:
+    stats = empty_stats()
+    for date_str in sorted(responses):
+        response = (responses[date_str] or "").lower()
+        if response:
+            stats = apply_entry(stats, date_str, response)
+    return stats
+
+
+## Share of answered days that were "yes", as a percentage.
+def yes_percentage(stats: dict) -> float:
+    return (stats["yes_count"] / stats["total"]) * 100 if stats["total"] else 0
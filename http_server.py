@@ -0,0 +1,143 @@
+import asyncio
+
+## Minimal asyncio HTTP/1.1 server (keep-alive, Content-Length bodies only) used for the
+## webhook endpoint. Handlers are registered per (method, path) and return a Response.
+
+MAX_BODY_BYTES = 1 << 20        # Telegram updates are far smaller than this
+IDLE_TIMEOUT = 60               # seconds an idle keep-alive connection is kept open
+
+MAX_HEADERS = 100               # header lines per request; a line may be up to the stream limit (64 KiB)
+
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 414: "URI Too Long", 431: "Request Header Fields Too Large",
+            500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class _RequestError(Exception):
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method: str, path: str, headers: dict, body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+
+class Response:
+    def __init__(self, status: int = 200, body: bytes = b"", content_type: str = "text/plain; charset=utf-8",
+                 headers: dict = None):
+        self.status = status
+        self.body = body if isinstance(body, bytes) else body.encode()
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+class HTTPServer:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.routes = {}
+        self._server = None
+        self._connections = set()
+
+    def route(self, method: str, path: str, handler):
+        self.routes[(method, path)] = handler
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        # Port 0 picks a free port; expose the real one.
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    ## Stops accepting connections and closes the open ones.
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._connections):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), IDLE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except _RequestError as e:
+                    await self._write(writer, Response(e.status), keep_alive=False)
+                    return
+                if request is None:
+                    return
+
+                response = await self._dispatch(request)
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._write(writer, response, keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = await _read_line(reader, 414)
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise _RequestError(400)
+
+        headers = {}
+        for _ in range(MAX_HEADERS + 1):
+            line = await _read_line(reader, 431)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise _RequestError(431)
+
+        # Digits only: int() would also take "-1", "+1" or "1_0".
+        length = headers.get("content-length", "0") or "0"
+        if not (length.isascii() and length.isdigit()):
+            raise _RequestError(400)
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise _RequestError(413)
+        body = await reader.readexactly(length) if length else b""
+        return Request(method, target.split("?", 1)[0], headers, body)
+
+    async def _dispatch(self, request: Request) -> Response:
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            known_path = any(path == request.path for _, path in self.routes)
+            return Response(405 if known_path else 404)
+        try:
+            return await handler(request)
+        except Exception as e:
+            print(f"[❌] HTTP {request.method} {request.path} failed: {type(e).__name__}: {e}")
+            return Response(500)
+
+    async def _write(self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+        head = [f"HTTP/1.1 {response.status} {_REASONS.get(response.status, '')}",
+                f"Content-Type: {response.content_type}",
+                f"Content-Length: {len(response.body)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        head += [f"{name}: {value}" for name, value in response.headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + response.body)
+        await writer.drain()
+
+
+## Reads one line; a line longer than the stream's limit is answered with `status`.
+async def _read_line(reader: asyncio.StreamReader, status: int) -> bytes:
+    try:
+        return await reader.readline()
+    except ValueError:  # StreamReader.readline's form of LimitOverrunError
+        raise _RequestError(status)
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import time
+import repository
+
+## Durable ledger of a scheduled job run (one run per nightly tick), kept in storage (see storage.py):
+##   run record  – {"date", "users", "complete", "failed", "updated_at"}
+##   user state  – {"status", "attempts", "phase", "error", "retry_at", "permanent"}, where status goes
+##                 pending → filled (unanswered habits auto-filled) → sent, or to failed (in `phase`)
+## A "sent" state is written as soon as the summary is sent: `record` returns once it is stored, and the
+## states recorded while a write is in flight go out together in the next one, so users sent concurrently
+## share writes instead of taking one each. Other states are buffered with `stage` and go out with the next
+## write. A run that is started again – after a restart, by another replica, or by the catch-up – skips
+## users already sent and retries the failed ones with exponential backoff, up to SUMMARY_MAX_ATTEMPTS tries
+## each. Runs are deleted after SUMMARY_LEDGER_DAYS.
+##
+## Delivery is at least once, not exactly once: if the process is killed outright, the users whose send was
+## in flight or whose "sent" state was still being written get their summary again when the run resumes –
+## at most one user per concurrent send (SUMMARY_CONCURRENCY in scheduler.py), each once more.
+
+SUMMARY_MAX_ATTEMPTS = int(os.getenv("SUMMARY_MAX_ATTEMPTS", "3"))     # tries per user in one run
+SUMMARY_RETRY_DELAY = float(os.getenv("SUMMARY_RETRY_DELAY", "60"))    # seconds before the first retry, doubling
+SUMMARY_LEDGER_DAYS = float(os.getenv("SUMMARY_LEDGER_DAYS", "7"))     # days a run's ledger is kept
+
+PENDING, FILLED, SENT, FAILED = "pending", "filled", "sent", "failed"
+
+
+# === User States ===
+## True unless the user was sent already or has failed for good.
+def should_run(state: dict) -> bool:
+    return state["status"] != SENT and (state["status"] != FAILED or retryable(state))
+
+
+def retryable(state: dict) -> bool:
+    return state["status"] == FAILED and not state.get("permanent") and state["attempts"] < SUMMARY_MAX_ATTEMPTS
+
+
+## Auto-fill is redone only if it never succeeded; it is idempotent anyway (it only fills missing entries).
+def needs_fill(state: dict) -> bool:
+    return state["status"] == PENDING or (state["status"] == FAILED and state.get("phase") == "autofill")
+
+
+def filled(state: dict) -> dict:
+    return {**state, "status": FILLED}
+
+
+def sent(state: dict) -> dict:
+    return {"status": SENT, "attempts": state["attempts"] + 1}
+
+
+## `permanent` failures (e.g. the user blocked the bot) are not retried.
+def failed(state: dict, phase: str, error: Exception, permanent: bool = False) -> dict:
+    attempts = state["attempts"] + 1
+    return {"status": FAILED, "attempts": attempts, "phase": phase, "error": f"{type(error).__name__}: {error}",
+            "retry_at": time.time() + SUMMARY_RETRY_DELAY * 2 ** (attempts - 1), "permanent": permanent}
+
+
+# === Ledger ===
+class JobLedger:
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self._unflushed = {}
+        self._writing = asyncio.Lock()
+
+    async def get_run(self):
+        return (await repository.get_job_runs([self.run_id]))[self.run_id]
+
+    ## Records that the run has (re)started; also what tells the catch-up about an interrupted run.
+    async def start(self, **fields):
+        await repository.update_job_run(self.run_id, {**fields, "updated_at": time.time()})
+
+    async def complete(self, **fields):
+        await repository.update_job_run(self.run_id, {**fields, "complete": True, "updated_at": time.time()})
+
+    ## Returns {user_id: state} for a batch of users (one batched read), pending for users not seen yet.
+    async def load(self, user_ids: list) -> dict:
+        stored = await repository.get_job_states(self.run_id, user_ids)
+        return {user_id: self._unflushed.get(user_id) or stored.get(user_id) or {"status": PENDING, "attempts": 0}
+                for user_id in user_ids}
+
+    ## Buffers a state for the next write.
+    def stage(self, user_id: str, state: dict):
+        self._unflushed[user_id] = state
+
+    ## Stores a state; returns once it is written, together with everything buffered until then.
+    async def record(self, user_id: str, state: dict):
+        self._unflushed[user_id] = state
+        await self.flush()
+
+    ## Writes the buffered states. Callers that arrive during a write wait for it; the first one then writes
+    ## everything buffered meanwhile, and the others find their states already written.
+    async def flush(self):
+        async with self._writing:
+            states, self._unflushed = self._unflushed, {}
+            try:
+                await repository.set_job_states(self.run_id, states)
+            except Exception:
+                self._unflushed = {**states, **self._unflushed}  # kept for the next flush
+                raise
+
+    ## Returns {user_id: state} of every failed user of the run (one query).
+    async def failures(self) -> dict:
+        return await repository.list_job_states(self.run_id, FAILED)
+
+
+## Deletes the ledgers of runs older than SUMMARY_LEDGER_DAYS, and the partition leases of runs as old from
+## `leases` (see partitions.py) if given; returns how many ledgers.
+async def prune(leases=None):
+    before = time.time() - SUMMARY_LEDGER_DAYS * 86400
+    if leases is not None:
+        await asyncio.to_thread(leases.delete_records, before)
+    return await repository.delete_job_runs(before)
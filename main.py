@@ -1,4 +1,5 @@
-from telegram.ext import (ApplicationBuilder, CommandHandler, MessageHandler, filters)
+from telegram.ext import (ApplicationBuilder, CallbackQueryHandler, CommandHandler, MessageHandler, filters)
+from telegram.request import HTTPXRequest
 from goal_manager import (add_goal, 
                           remove_goal, 
                           mark_goal_completed, 
@@ -6,52 +7,177 @@ from goal_manager import (add_goal,
                           summary_command,
                           start_command,
                           monthly_trackers,
-                          handle_tracker_response,
+                          handle_tracker_callback,
                           add_habit_command,
                           remove_habit_command,
-                          handle_habit_removal_selection
+                          handle_habit_removal_selection,
+                          timezone_command,
+                          report_command,
+                          stats_command,
+                          streaks_command
                           )
-from scheduler import start_apscheduler
+from scheduler import catch_up_daily_summaries, start_apscheduler, stop_summary_jobs
+from conversation_state import conversation_store
+from router import TextRouter
+import metrics
+import outbox
+import reports
+import repository
+import startup
+from update_processor import ChatOrderedUpdateProcessor, POLLING_CONCURRENCY
+from webhook import WebhookServer, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_WORKERS
 import os
+import re
+import secrets
+import signal
+import ssl
+import certifi
 from dotenv import load_dotenv
 import asyncio
 
 load_dotenv()
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+BOT_MODE = os.getenv("BOT_MODE", "polling")  # "polling" or "webhook"
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")  # e.g. a local Bot API server
+
+## Builds the Telegram application and registers every command and message handler.
+## `request` and `rate_limiter` replace the Bot API client and the outbox; bench/load.py passes a fake Bot API.
+def build_application(token: str, webhook: bool = False, request=None, rate_limiter=None):
+    # Bot API calls go through a request object that times them (same pool sizes as PTB's defaults). Both
+    # clients share one TLS context: building one per client is a visible part of start-up.
+    tls = ssl.create_default_context(cafile=certifi.where())
+    builder = (ApplicationBuilder().token(token).base_url(TELEGRAM_API_URL)
+               .request(request or metrics.TelegramMetricsRequest(connection_pool_size=256, httpx_kwargs={"verify": tls}))
+               .get_updates_request(HTTPXRequest(connection_pool_size=1, httpx_kwargs={"verify": tls}))
+               # Every message to a chat is queued, rate-limited and retried by the outbox (see outbox.py).
+               .rate_limiter(rate_limiter or outbox.Outbox()))
+    if webhook:
+        # Updates arrive through WebhookServer, so no polling updater is needed.
+        builder = builder.updater(None)
+    else:
+        # Polled updates of different chats run concurrently, each chat's in order (see update_processor.py);
+        # never more at once than there are interactive storage threads, each handler using one at a time.
+        builder = builder.concurrent_updates(
+            ChatOrderedUpdateProcessor(min(POLLING_CONCURRENCY, repository.DB_MAX_WORKERS)))
+    app = builder.build()
+
+    # Register command handlers for various bot commands; each one is timed and counted (see metrics.py).
+    commands = {
+        "start": start_command,
+        "addgoal": add_goal,
+        "removegoal": remove_goal,
+        "markcompleted": mark_goal_completed,
+        "summary": summary_command,
+        "monthlytrackers": monthly_trackers,
+        "addhabit": add_habit_command,
+        "removehabit": remove_habit_command,
+        "timezone": timezone_command,
+        "report": report_command,
+        "stats": stats_command,
+        "streaks": streaks_command,
+    }
+    for name, handler in commands.items():
+        app.add_handler(CommandHandler(name, metrics.instrument_handler(f"/{name}", handler)))
+
+    # All plain-text replies go through one router, dispatched on the chat's conversation state
+    text_router = TextRouter(conversation_store)
+    replies = {
+        "remove": handle_user_selection,
+        "complete": handle_user_selection,
+        "remove_habit": handle_habit_removal_selection,
+    }
+    for action, handler in replies.items():
+        text_router.route(action, metrics.instrument_handler(f"reply:{action}", handler))
+    app.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), text_router.dispatch))
+
+    # Taps on the inline tracker checklist sent by /monthlytrackers
+    app.add_handler(CallbackQueryHandler(metrics.instrument_handler("button:tracker", handle_tracker_callback),
+                                         pattern=r"^tracker:"))
+    return app
+
 
 ## Main function to initialize and start the Telegram bot, set up command and message handlers, and start the scheduler.
 async def start_bot():
+    if BOT_MODE not in ("polling", "webhook"):
+        raise SystemExit(f"Unknown BOT_MODE {BOT_MODE!r} (expected 'polling' or 'webhook')")
+    webhook_mode = BOT_MODE == "webhook"
+    if webhook_mode and not WEBHOOK_URL:
+        raise SystemExit("BOT_MODE=webhook requires WEBHOOK_URL")
+    # The webhook listens on all interfaces by default, so it only takes updates that carry the secret
+    # registered with Telegram; without WEBHOOK_SECRET each start registers a random one.
+    webhook_secret = WEBHOOK_SECRET
+    if webhook_mode and not webhook_secret:
+        webhook_secret = secrets.token_urlsafe(32)
+        print("[⚠️] WEBHOOK_SECRET is not set; using a random secret (set one shared by every replica)")
+    elif webhook_mode and not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", webhook_secret):
+        raise SystemExit("WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ and -")
+
     # Build the Telegram bot application with the provided token.
-    app = ApplicationBuilder().token(TOKEN).build()
-
-    # Register command handlers for various bot commands.
-    app.add_handler(CommandHandler("start", start_command))
-    app.add_handler(CommandHandler("addgoal", add_goal))
-    app.add_handler(CommandHandler("removegoal", remove_goal))
-    app.add_handler(CommandHandler("markcompleted", mark_goal_completed))
-    app.add_handler(CommandHandler("summary", summary_command))
-    app.add_handler(CommandHandler("monthlytrackers", monthly_trackers))
-    app.add_handler(MessageHandler(filters.Regex("^(Yes|No|Will Enter Later)$"), handle_tracker_response))
-
-    # Text replies for goal selection
-    app.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), handle_user_selection))
-    
-    app.add_handler(CommandHandler("addhabit", add_habit_command))
-    app.add_handler(CommandHandler("removehabit", remove_habit_command))
-    app.add_handler(MessageHandler(filters.Regex("^[0-9]+$"), handle_habit_removal_selection))
+    app = build_application(TOKEN, webhook=webhook_mode)
 
     # Start the scheduler after the app's event loop is running
     async def on_startup(application):
         start_apscheduler(application.bot)
 
+    # /metrics and /ready come up first, so probes see "starting" (503) rather than a refused connection.
+    readiness = startup.Readiness(("telegram", "storage"))
+    metrics_server = await metrics.start_server()
+    if metrics_server is not None:
+        metrics_server.route("GET", "/ready", readiness.serve)
+    webhook_server = None
+    if webhook_mode:
+        webhook_server = WebhookServer(app, secret=webhook_secret)
+        # The webhook port is reachable from outside (unlike the metrics one by default), so probes can use it
+        # too; it answers /ready now and takes updates once the application has started.
+        webhook_server.http.route("GET", "/ready", readiness.serve)
+        await webhook_server.listen()
+    # Storage connects in the background while Telegram is initialized; see startup.py.
+    warm_up_task = asyncio.create_task(startup.warm_up(readiness))
+
     # Instead of run_polling (which closes the loop), use individual startup pieces
     await app.initialize()
     await on_startup(app)
     await app.start()
-    await app.updater.start_polling()
 
-    # Keep it alive until manually stopped
-    await asyncio.Event().wait()
+    if webhook_server is not None:
+        await webhook_server.start()
+        await app.bot.set_webhook(url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                                  secret_token=webhook_secret,
+                                  max_connections=min(100, WEBHOOK_WORKERS))
+    else:
+        await app.updater.start_polling()
+    readiness.passed("telegram")
+
+    # Nightly summaries missed or interrupted while the bot was down go out once storage is up.
+    async def catch_up():
+        await readiness.wait("storage")
+        await catch_up_daily_summaries(app.bot)
+    catch_up_task = asyncio.create_task(catch_up())
+
+    # Keep it alive until SIGINT/SIGTERM, then shut down gracefully
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows: fall back to KeyboardInterrupt
+    await stop_event.wait()
+
+    print("Shutting down...")
+    warm_up_task.cancel()
+    catch_up_task.cancel()
+    await stop_summary_jobs()
+    if webhook_server is not None:
+        # Finish the updates already accepted; Telegram redelivers anything refused meanwhile.
+        await webhook_server.stop()
+    else:
+        await app.updater.stop()
+    await app.stop()
+    await app.shutdown()
+    reports.shutdown()
+    if metrics_server is not None:
+        await metrics_server.stop()
 
 if __name__ == "__main__":
     try:
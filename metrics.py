@@ -0,0 +1,342 @@
+import bisect
+import contextvars
+import functools
+import math
+import os
+import threading
+import time
+from telegram.request import HTTPXRequest
+
+## In-process metrics in the Prometheus text format, served on METRICS_LISTEN:METRICS_PORT/metrics.
+## No client library: counters, gauges and histograms are plain dicts behind one lock, because they
+## are updated both from the event loop and from the repository's storage threads.
+##
+## What is measured:
+##   handlers  – latency and errors (by exception type) of every command and routed text reply
+##   storage   – every Storage call, its latency, and reads/writes per command (via command_scope)
+##   telegram  – latency and outcome of every Bot API request (TelegramMetricsRequest)
+##   outbox    – messages sent, coalesced, retried and dropped by the outbound queue, and time queued
+##   jobs      – users processed, failures, users/sec and per-phase durations of the scheduled jobs
+##   startup   – time until each readiness check passed (startup.py)
+##   cache     – hits, misses and evictions of the repository's user cache (copied in at every scrape)
+
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))        # -1 disables the endpoint
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+# === Registry ===
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format_labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{self._format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    ## For totals counted elsewhere and copied in by a collector (see add_collector).
+    def set_total(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = _LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    ## Per label set: [count per bucket (non-cumulative, last one is +Inf), sum, count].
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    ## Returns (sum, count) of the observations with the given labels.
+    def totals(self, **labels) -> tuple:
+        with self._lock:
+            series = self._values.get(self._key(labels))
+            return (series[1], series[2]) if series else (0.0, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, ([*counts], total, n)) for key, (counts, total, n) in self._values.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == "+Inf" else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{self._format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {n}")
+        return lines
+
+
+## Sample values in full: ints as ints, floats with every digit (`:g` would round a large total to 6 digits).
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(int(value))
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+_registry = []
+_collectors = []
+
+
+## Registers `collect()`, called before every render to copy values kept elsewhere into the metrics.
+def add_collector(collect):
+    _collectors.append(collect)
+
+
+def render() -> str:
+    for collect in _collectors:
+        collect()
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+# === Metrics ===
+handler_seconds = Histogram("bot_handler_duration_seconds", "Time spent in a command or text-reply handler.", ("handler",))
+handler_errors = Counter("bot_handler_errors_total", "Handler invocations that raised, by exception type.", ("handler", "error"))
+storage_seconds = Histogram("bot_storage_call_duration_seconds", "Latency of storage backend calls.", ("op",))
+storage_calls = Counter("bot_storage_calls_total", "Storage calls by issuing command and kind (read/write).",
+                        ("command", "op", "kind"))
+storage_errors = Counter("bot_storage_errors_total", "Storage calls that raised, by exception type.", ("op", "error"))
+command_storage_calls = Histogram("bot_command_storage_calls", "Storage calls made by one handler invocation.",
+                                  ("command", "kind"), buckets=_COUNT_BUCKETS)
+telegram_seconds = Histogram("bot_telegram_request_duration_seconds", "Latency of Telegram Bot API requests.", ("method",))
+telegram_requests = Counter("bot_telegram_requests_total", "Telegram Bot API requests by outcome.", ("method", "outcome"))
+outbox_messages = Counter("bot_outbox_messages_total", "Messages through the outbound queue by priority and outcome "
+                          "(sent, coalesced into another message, or the error that dropped it).", ("priority", "outcome"))
+outbox_retries = Counter("bot_outbox_retries_total", "Outbound sends retried, by cause.", ("cause",))
+outbox_wait = Histogram("bot_outbox_wait_seconds", "Time a message spent in the outbound queue.", ("priority",))
+outbox_queued = Gauge("bot_outbox_queued", "Messages waiting in the outbound queue.")
+job_users = Counter("bot_job_users_total", "Users handled by scheduled jobs, by outcome.", ("job", "outcome"))
+job_failures = Counter("bot_job_failures_total", "Per-user failures in scheduled jobs, by phase and exception type.",
+                       ("job", "phase", "error"))
+job_phase_seconds = Histogram("bot_job_phase_duration_seconds", "Time spent per phase of a scheduled job run.",
+                              ("job", "phase"), buckets=(0.01, 0.1, 0.5, 1, 5, 15, 60, 300, 900, 3600))
+job_duration = Gauge("bot_job_last_duration_seconds", "Wall time of the last run of a scheduled job.", ("job",))
+job_throughput = Gauge("bot_job_last_users_per_second", "Users per second in the last run of a scheduled job.", ("job",))
+startup_seconds = Gauge("bot_startup_seconds", "Seconds from start-up until each readiness check passed.", ("check",))
+cache_lookups = Counter("bot_user_cache_lookups_total", "User cache lookups by result (hit or miss).", ("result",))
+cache_evictions = Counter("bot_user_cache_evictions_total", "Users evicted from the user cache to stay within its size.")
+cache_discarded = Counter("bot_user_cache_discarded_total", "Values loaded but not cached because a write overlapped the load.")
+cache_users = Gauge("bot_user_cache_users", "Users with values in the user cache.")
+
+
+# === Command Scope ===
+## Storage calls made while a scope is active count towards it: in the task that opened it and in the
+## storage threads it awaits (repository.run_blocking carries the context over).
+class _Scope:
+    def __init__(self, command: str):
+        self.command = command
+        self.reads = 0
+        self.writes = 0
+
+
+_scope = contextvars.ContextVar("metrics_command_scope", default=None)
+
+
+## Opens a scope for the rest of the current task (used by scheduled jobs).
+def command_scope(command: str) -> _Scope:
+    scope = _Scope(command)
+    _scope.set(scope)
+    return scope
+
+
+## Wraps a handler (`async def handler(update, context, *args)`) with latency, error and storage-call metrics.
+def instrument_handler(name: str, handler):
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        scope = _Scope(name)
+        token = _scope.set(scope)
+        started = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        except Exception as e:
+            handler_errors.inc(handler=name, error=type(e).__name__)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, handler=name)
+            command_storage_calls.observe(scope.reads, command=name, kind="read")
+            command_storage_calls.observe(scope.writes, command=name, kind="write")
+            _scope.reset(token)
+    return wrapper
+
+
+# === Storage ===
+_READ_PREFIXES = ("get_", "list_")
+
+
+## Storage proxy that times and counts every call, attributing it to the active command scope.
+class InstrumentedStorage:
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __getattr__(self, name):
+        attr = getattr(self._storage, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        kind = "read" if name.startswith(_READ_PREFIXES) else "write"
+
+        def call(*args, **kwargs):
+            scope = _scope.get()
+            if scope is not None:
+                if kind == "read":
+                    scope.reads += 1
+                else:
+                    scope.writes += 1
+            storage_calls.inc(command=scope.command if scope else "", op=name, kind=kind)
+            started = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            except Exception as e:
+                storage_errors.inc(op=name, error=type(e).__name__)
+                raise
+            finally:
+                storage_seconds.observe(time.perf_counter() - started, op=name)
+        return call
+
+
+# === Telegram ===
+## HTTPXRequest that records the latency and outcome of every Bot API call (labelled by API method).
+class TelegramMetricsRequest(HTTPXRequest):
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            status, payload = await super().do_request(url, method, request_data, *args, **kwargs)
+        except Exception as e:
+            telegram_requests.inc(method=api_method, outcome=type(e).__name__)
+            raise
+        finally:
+            telegram_seconds.observe(time.perf_counter() - started, method=api_method)
+        telegram_requests.inc(method=api_method, outcome=str(status))
+        return status, payload
+
+
+# === Jobs ===
+## Collects per-phase durations of one job run; phases may run concurrently across users, so each
+## phase's time is summed over its occurrences and observed once when the run finishes.
+class JobRun:
+    def __init__(self, job: str):
+        self.job = job
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.users = 0
+
+    def phase(self, name: str):
+        return _PhaseTimer(self, name)
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def record_user(self, outcome: str):
+        self.users += 1
+        job_users.inc(job=self.job, outcome=outcome)
+
+    def record_failure(self, phase: str, error: Exception):
+        job_failures.inc(job=self.job, phase=phase, error=type(error).__name__)
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.started
+        for phase, seconds in self.phases.items():
+            job_phase_seconds.observe(seconds, job=self.job, phase=phase)
+        job_duration.set(elapsed, job=self.job)
+        job_throughput.set(self.users / elapsed if elapsed > 0 else 0.0, job=self.job)
+        return elapsed
+
+    def phase_report(self) -> str:
+        return ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in self.phases.items())
+
+
+class _PhaseTimer:
+    def __init__(self, run: JobRun, name: str):
+        self.run = run
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.run.add(self.name, time.perf_counter() - self.started)
+
+
+# === Endpoint ===
+## Starts GET /metrics on METRICS_LISTEN:METRICS_PORT; returns the server (None if disabled).
+async def start_server(host: str = METRICS_LISTEN, port: int = METRICS_PORT):
+    if port < 0:
+        return None
+    from http_server import HTTPServer, Response
+
+    async def serve(request):
+        return Response(200, render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    server = HTTPServer(host, port)
+    server.route("GET", "/metrics", serve)
+    await server.start()
+    print(f"📈 Metrics on http://{host}:{server.port}/metrics")
+    return server
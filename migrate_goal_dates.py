@@ -0,0 +1,26 @@
+# migrate_goal_dates.py
+import asyncio
+import repository
+
+## One-off migration: gives every existing goal a "date" field (the user's local date of its created_at),
+## which the per-day goal queries and the (date, status) index rely on. Goals that already have a date
+## are left alone, so it is safe to re-run. Run migrate_timezones.py first so every user has a time zone.
+## Usage: python migrate_goal_dates.py
+async def migrate_goal_dates(concurrency: int = 16):
+    repository.use_bulk_pool()
+    user_ids = await repository.list_user_ids()
+    print(f"Dating goals of {len(user_ids)} users...")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    goals_done = 0
+
+    async def migrate(user_id: str):
+        nonlocal goals_done
+        async with semaphore:
+            goals_done += await repository.backfill_goal_dates(user_id)
+
+    await asyncio.gather(*(migrate(user_id) for user_id in user_ids))
+    print(f"✅ Dated {goals_done} goals.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_goal_dates())
@@ -0,0 +1,16 @@
+# migrate_timezones.py
+import asyncio
+import repository
+
+## One-off migration: gives every existing user a profile with the default time zone (Asia/Kolkata)
+## and its delivery bucket, so the 15-minute scheduler picks them up. Users who already set a
+## time zone are left alone. Usage: python migrate_timezones.py
+async def migrate_timezones():
+    repository.use_bulk_pool()
+    user_ids = await repository.list_user_ids()
+    print(f"Checking {len(user_ids)} users...")
+    created = await repository.ensure_user_profiles(user_ids)
+    print(f"✅ Assigned the default time zone to {created} users.")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_timezones())
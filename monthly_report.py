@@ -0,0 +1,150 @@
+import calendar
+import csv
+import io
+from datetime import date
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import KeepTogether, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from xml.sax.saxutils import escape
+
+## Pure month-report computation and rendering. Everything here runs inside the report worker processes
+## (see reports.py), so it takes and returns plain values only and never touches storage or the bot.
+##
+## Input ("month data"), collected by reports.collect_month:
+##   {"user_id", "month": "YYYY-MM", "timezone",
+##    "habits": {habit: {date_str: "yes"/"no"}}, "goals": [{"date", "goal", "status"}]}
+
+_YES = colors.HexColor("#4caf50")
+_NO = colors.HexColor("#e57373")
+_UNANSWERED = colors.HexColor("#eeeeee")
+
+
+# === Computation ===
+def _month_days(month: str) -> list:
+    year, month_number = int(month[:4]), int(month[5:7])
+    return [date(year, month_number, d).isoformat() for d in range(1, calendar.monthrange(year, month_number)[1] + 1)]
+
+
+## Per-habit figures for one month: answered days, yes rate, longest streak and the streak at month end.
+def habit_figures(days: list, responses: dict) -> dict:
+    yes = sum(1 for d in days if responses.get(d) == "yes")
+    answered = sum(1 for d in days if responses.get(d) in ("yes", "no"))
+    longest = current = 0
+    for d in days:
+        current = current + 1 if responses.get(d) == "yes" else 0
+        longest = max(longest, current)
+    return {
+        "yes": yes,
+        "answered": answered,
+        "days": len(days),
+        "rate": yes / answered * 100 if answered else 0.0,
+        "longest_streak": longest,
+        "final_streak": current,
+    }
+
+
+def build_report(data: dict) -> dict:
+    days = _month_days(data["month"])
+    goals = sorted(data["goals"], key=lambda g: g["date"])
+    completed = sum(1 for g in goals if g["status"] == "completed")
+    return {
+        **data,
+        "days": days,
+        "goals": goals,
+        "goal_totals": {"total": len(goals), "completed": completed,
+                        "rate": completed / len(goals) * 100 if goals else 0.0},
+        "habit_figures": {habit: habit_figures(days, responses) for habit, responses in data["habits"].items()},
+    }
+
+
+# === Rendering ===
+## One row per day and habit, then one row per goal: date, kind, name, value.
+def render_csv(report: dict) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["date", "kind", "name", "value"])
+    for habit, responses in report["habits"].items():
+        for d in report["days"]:
+            writer.writerow([d, "habit", habit, responses.get(d, "")])
+    for goal in report["goals"]:
+        writer.writerow([goal["date"], "goal", goal["goal"], goal["status"]])
+    return out.getvalue()
+
+
+## Mon–Sun grid of the month, each day coloured by the habit's answer.
+def _calendar_table(days: list, responses: dict) -> Table:
+    first = date.fromisoformat(days[0])
+    cells = [""] * first.weekday() + [str(int(d[8:])) for d in days]
+    cells += [""] * (-len(cells) % 7)
+    rows = [["Mo", "Tu", "We", "Th", "Fr", "Sa", "Su"]] + [cells[i:i + 7] for i in range(0, len(cells), 7)]
+
+    style = [
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.white),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.grey),
+    ]
+    for i, d in enumerate(days):
+        cell = first.weekday() + i
+        fill = {"yes": _YES, "no": _NO}.get(responses.get(d), _UNANSWERED)
+        style.append(("BACKGROUND", (cell % 7, 1 + cell // 7), (cell % 7, 1 + cell // 7), fill))
+    table = Table(rows, colWidths=[9 * mm] * 7, rowHeights=[6 * mm] * len(rows), hAlign="LEFT")
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def render_pdf(report: dict) -> bytes:
+    styles = getSampleStyleSheet()
+    month_name = date.fromisoformat(report["days"][0]).strftime("%B %Y")
+    story = [
+        Paragraph(f"Goal Tracker: {month_name}", styles["Title"]),
+        Paragraph(f"Time zone: {escape(report['timezone'])}", styles["Normal"]),
+        Spacer(1, 6 * mm),
+        Paragraph("Habits", styles["Heading2"]),
+    ]
+
+    if not report["habits"]:
+        story.append(Paragraph("No habits tracked this month.", styles["Normal"]))
+    for habit, responses in report["habits"].items():
+        figures = report["habit_figures"][habit]
+        story.append(KeepTogether([
+            Paragraph(escape(habit), styles["Heading3"]),
+            Paragraph(f"{figures['rate']:.0f}% yes ({figures['yes']} of {figures['answered']} answered days, "
+                      f"{figures['days']} days in month). Longest streak: {figures['longest_streak']} days; "
+                      f"streak at month end: {figures['final_streak']} days.", styles["Normal"]),
+            Spacer(1, 2 * mm),
+            _calendar_table(report["days"], responses),
+            Spacer(1, 4 * mm),
+        ]))
+
+    totals = report["goal_totals"]
+    story += [Spacer(1, 4 * mm), Paragraph("Goals", styles["Heading2"])]
+    if report["goals"]:
+        story.append(Paragraph(f"{totals['completed']} of {totals['total']} goals completed ({totals['rate']:.0f}%).",
+                               styles["Normal"]))
+        story.append(Spacer(1, 2 * mm))
+        rows = [["Date", "Goal", "Status"]] + [
+            [g["date"], Paragraph(escape(g["goal"]), styles["Normal"]), g["status"]] for g in report["goals"]
+        ]
+        table = Table(rows, colWidths=[25 * mm, 120 * mm, 25 * mm], repeatRows=1, hAlign="LEFT")
+        table.setStyle(TableStyle([
+            ("LINEBELOW", (0, 0), (-1, 0), 0.5, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+        ]))
+        story.append(table)
+    else:
+        story.append(Paragraph("No goals set this month.", styles["Normal"]))
+
+    out = io.BytesIO()
+    SimpleDocTemplate(out, pagesize=A4, title=f"Goal Tracker {report['month']}",
+                      leftMargin=18 * mm, rightMargin=18 * mm, topMargin=18 * mm, bottomMargin=18 * mm).build(story)
+    return out.getvalue()
+
+
+## Worker entry point: builds the report from month data and returns (pdf bytes, csv text).
+def render_report(data: dict):
+    report = build_report(data)
+    return render_pdf(report), render_csv(report)
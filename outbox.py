@@ -0,0 +1,288 @@
+import asyncio
+import contextvars
+import itertools
+import os
+import time as clock
+from collections import deque
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from telegram.ext import BaseRateLimiter
+import metrics
+
+## Central outbound queue for every Bot API call addressed to a chat. It is installed as the
+## application's rate limiter (ApplicationBuilder.rate_limiter), so handlers keep calling reply_text /
+## send_message and the scheduled jobs call bot.send_message as before: each call waits here until it
+## may be sent, and returns (or raises) once it has been.
+##
+##   limits      – one token bucket for the whole bot and one per chat (group chats get a slower one)
+##   priority    – interactive replies first; tasks that called use_bulk_priority() (the scheduled jobs)
+##                 get the capacity left over
+##   coalescing  – text messages waiting for the same chat with the same options go out as one message
+##                 (up to Telegram's 4096 characters); each caller gets the merged message back
+##   retries     – RetryAfter pauses all sending for the time Telegram asks for (its flood limits are
+##                 mostly bot-wide); network errors are retried with backoff; a blocked bot or a bad
+##                 request fails at once
+##
+## Calls without a chat (answerCallbackQuery, getMe, setWebhook, ...) are passed straight through.
+
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "25"))     # messages/sec across all chats
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1.0"))        # messages/sec to one private chat
+OUTBOX_GROUP_RATE = float(os.getenv("OUTBOX_GROUP_RATE", "0.33"))     # messages/sec to one group (20/min)
+OUTBOX_CHAT_BURST = float(os.getenv("OUTBOX_CHAT_BURST", "3"))        # messages one chat may get back to back
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "32"))       # Bot API requests in flight
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_DRAIN_TIMEOUT = float(os.getenv("OUTBOX_DRAIN_TIMEOUT", "10"))  # seconds to flush the queue on shutdown
+
+INTERACTIVE, BULK = 0, 1
+_PRIORITY_NAMES = ("interactive", "bulk")
+_MAX_TEXT = 4096
+_SWEEP_EVERY = 1000
+
+_bulk = contextvars.ContextVar("outbox_bulk", default=False)
+
+
+## Sends every message of the current task at bulk priority (used by the scheduled jobs).
+def use_bulk_priority():
+    _bulk.set(True)
+
+
+# === Rate Limiting ===
+## Token bucket: `rate` tokens per second, at most `capacity` saved up.
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = clock.monotonic()
+
+    def _refill(self):
+        now = clock.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    ## Seconds until a token is available (0 if one is available now).
+    def delay(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+# === Queue ===
+class _Job:
+    def __init__(self, callback, args, kwargs, priority: int, future):
+        self.callback = callback
+        self.endpoint, self.data = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.queued_at = clock.monotonic()
+        self.attempts = 0
+
+
+## Only plain text messages with identical options (parse mode, silence, ...) and no keyboard are merged.
+def _mergeable(a: _Job, b: _Job) -> bool:
+    if a.endpoint != "sendMessage" or b.endpoint != "sendMessage" or a.kwargs != b.kwargs:
+        return False
+    if "reply_markup" in a.data or "reply_markup" in b.data:
+        return False
+    return {k: v for k, v in a.data.items() if k != "text"} == {k: v for k, v in b.data.items() if k != "text"}
+
+
+class _Chat:
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.queues = (deque(), deque())  # one per priority
+        self.not_before = 0.0             # backoff after a network error
+        self.in_flight = False
+        self.ticket = None                # entry in the ready queue, if any
+        self.ticket_priority = None
+
+    def priority(self):
+        for priority, queue in enumerate(self.queues):
+            if queue:
+                return priority
+        return None
+
+    ## Takes the next message (plus any that can be merged into it) from the most urgent queue.
+    def take_batch(self) -> list:
+        queue = self.queues[self.priority()]
+        batch = [queue.popleft()]
+        length = len(batch[0].data.get("text", ""))
+        while queue and _mergeable(batch[0], queue[0]):
+            length += 2 + len(queue[0].data["text"])
+            if length > _MAX_TEXT:
+                break
+            batch.append(queue.popleft())
+        return batch
+
+
+class Outbox(BaseRateLimiter):
+    def __init__(self, global_rate: float = OUTBOX_GLOBAL_RATE, chat_rate: float = OUTBOX_CHAT_RATE,
+                 group_rate: float = OUTBOX_GROUP_RATE, chat_burst: float = OUTBOX_CHAT_BURST,
+                 concurrency: int = OUTBOX_CONCURRENCY, max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self._global = TokenBucket(global_rate)
+        self._paused_until = 0.0
+        self._chats = {}
+        self._tickets = itertools.count()
+        self._queued = 0
+        self._sends = 0
+        self._sending = set()
+        self._task = None
+
+    async def initialize(self):
+        if self._task is None:
+            self._ready = asyncio.PriorityQueue()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.create_task(self._run())
+
+    ## Gives queued messages up to OUTBOX_DRAIN_TIMEOUT to go out, then fails whatever is left.
+    async def shutdown(self):
+        if self._task is None:
+            return
+        deadline = clock.monotonic() + OUTBOX_DRAIN_TIMEOUT
+        while (self._queued or self._sending) and clock.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._task.cancel()
+        self._task = None
+        for chat in self._chats.values():
+            for queue in chat.queues:
+                self._fail(list(queue), NetworkError("Bot shut down before the message was sent"))
+                queue.clear()
+        self._chats.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return await callback(*args, **kwargs)
+        await self.initialize()
+
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            group = isinstance(chat_id, int) and chat_id < 0
+            chat = self._chats[chat_id] = _Chat(self.group_rate if group else self.chat_rate, self.chat_burst)
+        job = _Job(callback, args, kwargs, BULK if _bulk.get() else INTERACTIVE,
+                   asyncio.get_running_loop().create_future())
+        chat.queues[job.priority].append(job)
+        self._set_queued(1)
+        self._schedule(chat_id)
+        return await job.future
+
+    def _set_queued(self, change: int):
+        self._queued += change
+        metrics.outbox_queued.set(self._queued)
+
+    ## Puts a chat with pending messages in the ready queue, unless it is already there at the same
+    ## priority or has a request in flight (it is rescheduled when that one completes).
+    def _schedule(self, chat_id):
+        chat = self._chats.get(chat_id)
+        if chat is None or chat.in_flight or self._task is None:
+            return
+        priority = chat.priority()
+        if priority is None or (chat.ticket is not None and chat.ticket_priority <= priority):
+            return
+        chat.ticket, chat.ticket_priority = next(self._tickets), priority
+        self._ready.put_nowait((priority, chat.ticket, chat_id))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, ticket, chat_id = await self._ready.get()
+            chat = self._chats.get(chat_id)
+            if chat is None or chat.ticket != ticket:
+                continue  # superseded by a more urgent entry for the same chat
+            chat.ticket = None
+            wait = max(chat.bucket.delay(), chat.not_before - clock.monotonic())
+            if wait > 0:
+                loop.call_later(wait, self._schedule, chat_id)
+                continue
+
+            chat.in_flight = True
+            await self._slots.acquire()
+            while (wait := max(self._global.delay(), self._paused_until - clock.monotonic())) > 0:
+                await asyncio.sleep(wait)
+            self._global.take()
+            chat.bucket.take()
+
+            # Messages whose sender gave up waiting are dropped before sending.
+            for queue in chat.queues:
+                for job in [job for job in queue if job.future.done()]:
+                    queue.remove(job)
+                    self._set_queued(-1)
+                    metrics.outbox_messages.inc(priority=_PRIORITY_NAMES[job.priority], outcome="cancelled")
+            if chat.priority() is None:
+                chat.in_flight = False
+                self._slots.release()
+                continue
+            batch = chat.take_batch()
+            self._set_queued(-len(batch))
+            task = asyncio.create_task(self._send(chat_id, chat, batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, chat_id, chat, batch: list):
+        head = batch[0]
+        data = head.data
+        if len(batch) > 1:
+            data = {**head.data, "text": "\n\n".join(job.data["text"] for job in batch)}
+        for job in batch:
+            job.attempts += 1
+        try:
+            result = await head.callback(head.endpoint, data, **head.kwargs)
+        except RetryAfter as e:
+            self._paused_until = max(self._paused_until, clock.monotonic() + e.retry_after)
+            self._retry(chat, batch, e)
+        except (Forbidden, BadRequest) as e:
+            self._fail(batch, e)  # user blocked the bot / chat gone / malformed — retrying won't help
+        except NetworkError as e:
+            chat.not_before = clock.monotonic() + min(2 ** head.attempts, 30)
+            self._retry(chat, batch, e)
+        except Exception as e:
+            self._fail(batch, e)
+        else:
+            now = clock.monotonic()
+            for i, job in enumerate(batch):
+                priority = _PRIORITY_NAMES[job.priority]
+                metrics.outbox_messages.inc(priority=priority, outcome="sent" if i == 0 else "coalesced")
+                metrics.outbox_wait.observe(now - job.queued_at, priority=priority)
+                if not job.future.done():
+                    job.future.set_result(result)
+        finally:
+            chat.in_flight = False
+            self._slots.release()
+            self._schedule(chat_id)
+            self._sends += 1
+            if self._sends % _SWEEP_EVERY == 0:
+                self._sweep()
+
+    ## Puts the batch back at the front of its queue, or fails the messages out of attempts.
+    def _retry(self, chat: _Chat, batch: list, error: Exception):
+        metrics.outbox_retries.inc(cause=type(error).__name__)
+        retry = [job for job in batch if job.attempts < self.max_attempts]
+        self._fail([job for job in batch if job.attempts >= self.max_attempts], error)
+        for job in reversed(retry):
+            chat.queues[job.priority].appendleft(job)
+        self._set_queued(len(retry))
+
+    @staticmethod
+    def _fail(jobs: list, error: Exception):
+        for job in jobs:
+            metrics.outbox_messages.inc(priority=_PRIORITY_NAMES[job.priority], outcome=type(error).__name__)
+            if not job.future.done():
+                job.future.set_exception(error)
+
+    ## Forgets idle chats whose bucket has refilled (a new one would start out identical).
+    def _sweep(self):
+        for chat_id in [chat_id for chat_id, chat in self._chats.items()
+                        if not chat.in_flight and chat.priority() is None and chat.bucket.full]:
+            del self._chats[chat_id]
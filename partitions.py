@@ -0,0 +1,239 @@
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+import zlib
+from firebase_init import FirestoreClient
+from storage import STORAGE_BACKEND
+
+## Horizontal sharding for the nightly job. Users are split into SUMMARY_PARTITIONS partitions by a
+## stable hash of their id. Every replica runs the job at the same time. Each one claims partitions
+## through a lease backend, processes them batch by batch, and checkpoints a cursor after every
+## batch. A replica that dies stops renewing its lease. Once the lease expires another replica takes
+## the partition over and resumes after the last checkpoint. The batch that was in progress is handed over
+## whole, so the caller keeps per-user progress of its own (the nightly job: its ledger, job_ledger.py) and
+## skips the users already done; only the work in flight when the replica died is repeated.
+##
+## Lease backends (SUMMARY_LEASE_BACKEND):
+##   firestore – summary_runs/{run_id}/partitions/{k} documents, updated transactionally
+##   memory    – process-local; for a single replica or for tests
+## Defaults to firestore when the data lives in Firestore (STORAGE_BACKEND), otherwise memory. Records are
+## deleted with the nightly ledger once they are SUMMARY_LEDGER_DAYS old (job_ledger.prune).
+
+SUMMARY_PARTITIONS = int(os.getenv("SUMMARY_PARTITIONS", "16"))
+SUMMARY_LEASE_SECONDS = float(os.getenv("SUMMARY_LEASE_SECONDS", "120"))
+SUMMARY_LEASE_BACKEND = os.getenv("SUMMARY_LEASE_BACKEND", "firestore" if STORAGE_BACKEND == "firestore" else "memory")
+SUMMARY_RUN_TIMEOUT = float(os.getenv("SUMMARY_RUN_TIMEOUT", "3600"))  # max time a replica waits for others' partitions
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+## Stable across processes and restarts (unlike hash()).
+def partition_of(user_id: str, partitions: int = SUMMARY_PARTITIONS) -> int:
+    return zlib.crc32(user_id.encode()) % partitions
+
+
+# === Lease Backends ===
+## A partition record is {"owner", "lease_expires_at", "cursor", "done"}; `cursor` is the last user id
+## (in sorted order) whose batch has been fully processed. All methods are blocking.
+class LeaseBackend:
+    ## Takes the partition if it is free, expired or already ours; returns its record, or None.
+    def claim(self, run_id: str, partition: int, owner: str, ttl: float):
+        raise NotImplementedError
+
+    ## Extends our lease and stores the cursor; returns False if the lease was lost.
+    def checkpoint(self, run_id: str, partition: int, owner: str, ttl: float, cursor: str = None) -> bool:
+        raise NotImplementedError
+
+    def complete(self, run_id: str, partition: int, owner: str):
+        raise NotImplementedError
+
+    ## Returns {partition: record} for every partition touched in this run.
+    def records(self, run_id: str) -> dict:
+        raise NotImplementedError
+
+    ## Deletes the records whose lease ran out before `before` (epoch seconds); returns how many.
+    def delete_records(self, before: float) -> int:
+        raise NotImplementedError
+
+
+def _claimable(record: dict, owner: str, now: float) -> bool:
+    if record is None:
+        return True
+    if record.get("done"):
+        return False
+    return record.get("owner") == owner or record.get("lease_expires_at", 0) <= now
+
+
+class InMemoryLeaseBackend(LeaseBackend):
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def claim(self, run_id, partition, owner, ttl):
+        with self._lock:
+            record = self._records.get((run_id, partition))
+            if not _claimable(record, owner, time.time()):
+                return None
+            record = {**(record or {"cursor": None, "done": False}), "owner": owner, "lease_expires_at": time.time() + ttl}
+            self._records[(run_id, partition)] = record
+            return dict(record)
+
+    def checkpoint(self, run_id, partition, owner, ttl, cursor=None):
+        with self._lock:
+            record = self._records.get((run_id, partition))
+            if record is None or record["owner"] != owner:
+                return False
+            record["lease_expires_at"] = time.time() + ttl
+            if cursor is not None:
+                record["cursor"] = cursor
+            return True
+
+    def complete(self, run_id, partition, owner):
+        with self._lock:
+            record = self._records.get((run_id, partition))
+            if record is not None and record["owner"] == owner:
+                record["done"] = True
+
+    def records(self, run_id):
+        with self._lock:
+            return {p: dict(r) for (rid, p), r in self._records.items() if rid == run_id}
+
+    def delete_records(self, before):
+        with self._lock:
+            expired = [key for key, record in self._records.items() if record["lease_expires_at"] < before]
+            for key in expired:
+                del self._records[key]
+            return len(expired)
+
+
+## The client is looked up on first use (firebase_init.FirestoreClient), so creating the backend never connects anywhere.
+class FirestoreLeaseBackend(FirestoreClient, LeaseBackend):
+    def _ref(self, run_id: str, partition: int):
+        return self.db.collection("summary_runs").document(run_id).collection("partitions").document(str(partition))
+
+    def _update_owned(self, run_id, partition, owner, fields: dict) -> bool:
+        from firebase_admin import firestore
+        ref = self._ref(run_id, partition)
+
+        @firestore.transactional
+        def update(transaction):
+            snap = ref.get(transaction=transaction)
+            if not snap.exists or snap.to_dict().get("owner") != owner:
+                return False
+            transaction.update(ref, fields)
+            return True
+
+        return update(self.db.transaction())
+
+    def claim(self, run_id, partition, owner, ttl):
+        from firebase_admin import firestore
+        ref = self._ref(run_id, partition)
+
+        @firestore.transactional
+        def claim(transaction):
+            snap = ref.get(transaction=transaction)
+            record = snap.to_dict() if snap.exists else None
+            if not _claimable(record, owner, time.time()):
+                return None
+            record = {**(record or {"cursor": None, "done": False}), "owner": owner, "lease_expires_at": time.time() + ttl}
+            transaction.set(ref, record)
+            return record
+
+        return claim(self.db.transaction())
+
+    def checkpoint(self, run_id, partition, owner, ttl, cursor=None):
+        fields = {"lease_expires_at": time.time() + ttl}
+        if cursor is not None:
+            fields["cursor"] = cursor
+        return self._update_owned(run_id, partition, owner, fields)
+
+    def complete(self, run_id, partition, owner):
+        self._update_owned(run_id, partition, owner, {"done": True})
+
+    def records(self, run_id):
+        partitions = self.db.collection("summary_runs").document(run_id).collection("partitions").stream()
+        return {int(snap.id): snap.to_dict() for snap in partitions}
+
+    ## Uses the collection-group index on partitions.lease_expires_at (firestore.indexes.json).
+    def delete_records(self, before):
+        refs = [snap.reference for snap in
+                self.db.collection_group("partitions").where("lease_expires_at", "<", before).select([]).stream()]
+        self.delete_documents(refs)
+        return len(refs)
+
+
+def create_lease_backend(kind: str = SUMMARY_LEASE_BACKEND) -> LeaseBackend:
+    if kind == "memory":
+        return InMemoryLeaseBackend()
+    if kind == "firestore":
+        return FirestoreLeaseBackend()
+    raise ValueError(f"Unknown SUMMARY_LEASE_BACKEND: {kind!r} (expected 'firestore' or 'memory')")
+
+
+# === Partitioned Run ===
+class LeaseLost(Exception):
+    pass
+
+
+## Processes every partition of `run_id` that this worker can claim, calling `process_batch(user_ids)`
+## for consecutive batches of each partition's (sorted) users. Keeps going until every partition is done,
+## picking up partitions whose owner stopped renewing. Returns the number of partitions this worker finished.
+## A batch interrupted by a crash is passed again, whole, to whoever takes the partition over: process_batch
+## must skip the users it already recorded as done.
+async def run_partitioned(run_id: str, user_ids: list, process_batch, backend: LeaseBackend,
+                          worker_id: str = WORKER_ID, partitions: int = SUMMARY_PARTITIONS,
+                          batch_size: int = 100, lease_seconds: float = SUMMARY_LEASE_SECONDS,
+                          timeout: float = SUMMARY_RUN_TIMEOUT) -> int:
+    by_partition = {p: [] for p in range(partitions)}
+    for user_id in user_ids:
+        by_partition[partition_of(user_id, partitions)].append(user_id)
+    for members in by_partition.values():
+        members.sort()
+
+    finished = 0
+    deadline = time.monotonic() + timeout
+    while True:
+        records = await asyncio.to_thread(backend.records, run_id)
+        remaining = [p for p in range(partitions) if not records.get(p, {}).get("done")]
+        if not remaining:
+            return finished
+        if time.monotonic() > deadline:
+            print(f"[⚠️] Run {run_id}: gave up waiting for partitions {remaining}")
+            return finished
+
+        # Different workers start at different partitions so they rarely contend for the same lease.
+        random.shuffle(remaining)
+        claimed_any = False
+        for partition in remaining:
+            record = await asyncio.to_thread(backend.claim, run_id, partition, worker_id, lease_seconds)
+            if record is None:
+                continue
+            claimed_any = True
+            try:
+                await _run_partition(run_id, partition, by_partition[partition], record.get("cursor"),
+                                     process_batch, backend, worker_id, batch_size, lease_seconds)
+                finished += 1
+            except LeaseLost:
+                print(f"[⚠️] Run {run_id}: lost lease on partition {partition}")
+
+        if not claimed_any:
+            # Everything left is leased by other workers; check back once their leases could have expired.
+            await asyncio.sleep(min(lease_seconds / 2, max(0.0, deadline - time.monotonic())))
+
+
+async def _run_partition(run_id, partition, members, cursor, process_batch, backend, worker_id, batch_size, lease_seconds):
+    if cursor is not None:
+        print(f"[↩️] Run {run_id}: resuming partition {partition} after {cursor}")
+        members = [user_id for user_id in members if user_id > cursor]
+
+    for start in range(0, len(members), batch_size):
+        batch = members[start:start + batch_size]
+        await process_batch(batch)
+        # A crash before this checkpoint hands the batch to whoever takes the partition over; process_batch
+        # skips the users it recorded as done, so only the ones in flight at the crash are repeated.
+        if not await asyncio.to_thread(backend.checkpoint, run_id, partition, worker_id, lease_seconds, batch[-1]):
+            raise LeaseLost(partition)
+
+    await asyncio.to_thread(backend.complete, run_id, partition, worker_id)
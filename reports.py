@@ -0,0 +1,136 @@
+import asyncio
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import repository
+
+## Monthly PDF/CSV reports. A month of one user's entries and goals is collected through the repository,
+## then computed and rendered by monthly_report in a process pool, so neither the CPU-heavy PDF layout
+## nor the GIL it holds ever stalls the bot's event loop.
+##
+## Output is cached on disk as REPORT_CACHE_DIR/{user_id}/{YYYY-MM}.{fingerprint}.pdf|csv, where the
+## fingerprint hashes the collected data: asking again for a month that hasn't changed costs the reads
+## but no rendering.
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))              # processes rendering reports
+REPORT_CONCURRENCY = int(os.getenv("REPORT_CONCURRENCY", "8"))      # users handled at once by the month-end batch
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", "reports")
+
+_executor = None
+
+
+## Worker processes are spawned (not forked) because the bot process runs thread pools.
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+## Worker-side entry points. monthly_report (and reportlab with it) is only ever imported in the workers,
+## which keeps it out of the bot's own start-up.
+def _render(data: dict):
+    from monthly_report import render_report
+    return render_report(data)
+
+
+def _preload():
+    import monthly_report  # loads reportlab
+
+
+## Starts the workers and has each import the renderer, so the first report doesn't wait for either.
+async def warm_up():
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    await asyncio.gather(*(loop.run_in_executor(executor, _preload) for _ in range(REPORT_WORKERS)))
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# === Months ===
+## Parses "YYYY-MM" into (year, month), or returns None.
+def parse_month(text: str):
+    try:
+        year, month = (int(part) for part in text.strip().split("-"))
+        date(year, month, 1)
+    except ValueError:
+        return None
+    return year, month
+
+
+def previous_month(day: date):
+    last = day.replace(day=1) - timedelta(days=1)
+    return last.year, last.month
+
+
+## First and last ISO date of a month.
+def month_dates(year: int, month: int):
+    first = date(year, month, 1)
+    last = (first + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+    return first.isoformat(), last.isoformat()
+
+
+# === Pipeline ===
+## Collects one user's month as plain values (the input of monthly_report.render_report).
+async def collect_month(user_id: str, year: int, month: int, tz_name: str = None) -> dict:
+    tz_name = tz_name or await repository.get_user_timezone(user_id)
+    first, last = month_dates(year, month)
+    habits = await repository.get_entries_between(user_id, first, last)
+    goals = await repository.get_goals_for_dates(user_id, first, last)
+    return {
+        "user_id": user_id,
+        "month": f"{year:04d}-{month:02d}",
+        "timezone": tz_name,
+        "habits": habits,
+        "goals": [{"date": goal["date"], "goal": goal.get("goal", ""),
+                   "status": goal.get("status", "pending")} for goal in goals],
+    }
+
+
+def _fingerprint(data: dict) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _write_files(prefix: str, paths: dict, pdf: bytes, csv_text: str):
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    for path, content in ((paths["pdf"], pdf), (paths["csv"], csv_text.encode())):
+        with open(path + ".tmp", "wb") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+    # Renders of older data for the same month are stale now.
+    for path in glob.glob(glob.escape(prefix) + ".*"):
+        if path not in paths.values():
+            os.remove(path)
+
+
+## Returns {"month", "pdf", "csv", "cached"} with the paths of the user's report for the month, rendering it
+## only if the month's data changed since the last render; None if there is nothing to report.
+async def get_monthly_report(user_id: str, year: int, month: int, tz_name: str = None):
+    data = await collect_month(user_id, year, month, tz_name)
+    if not data["goals"] and not any(data["habits"].values()):
+        return None
+
+    prefix = os.path.join(REPORT_CACHE_DIR, user_id, data["month"])
+    stem = f"{prefix}.{_fingerprint(data)}"
+    paths = {"pdf": stem + ".pdf", "csv": stem + ".csv"}
+    if all(os.path.exists(path) for path in paths.values()):
+        return {"month": data["month"], **paths, "cached": True}
+
+    loop = asyncio.get_running_loop()
+    pdf, csv_text = await loop.run_in_executor(_get_executor(), _render, data)
+    await asyncio.to_thread(_write_files, prefix, paths, pdf, csv_text)
+    return {"month": data["month"], **paths, "cached": False}
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
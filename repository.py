@@ -0,0 +1,302 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from cache import MISSING, UserCache
+from habit_stats import compute_stats, read_stats
+import metrics
+from metrics import InstrumentedStorage
+from storage import create_storage
+from user_time import DEFAULT_TIMEZONE, delivery_bucket, get_zone
+
+## Non-blocking data-access layer. The storage backends (see storage.py) are synchronous, so every
+## call is pushed onto a dedicated thread pool and handlers simply await the result.
+
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "32"))        # threads serving interactive commands
+DB_BULK_WORKERS = int(os.getenv("DB_BULK_WORKERS", "16"))      # threads reserved for batch jobs (nightly summary)
+
+_interactive_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="db")
+_bulk_executor = ThreadPoolExecutor(max_workers=DB_BULK_WORKERS, thread_name_prefix="db-bulk")
+
+# Batch jobs flip this so their queries never queue behind (or in front of) interactive ones.
+_use_bulk_pool = contextvars.ContextVar("use_bulk_pool", default=False)
+
+
+## Routes every repository call made from the current task onto the bulk thread pool.
+def use_bulk_pool():
+    _use_bulk_pool.set(True)
+
+
+# Backend chosen by STORAGE_BACKEND; created on first use so importing this module never connects anywhere.
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = InstrumentedStorage(create_storage())
+    return _storage
+
+
+## Creates the storage backend and opens its connections ahead of the first command (see startup.py).
+async def warm_up():
+    await run_blocking(lambda: get_storage().warm_up())
+
+
+## Swaps the storage backend (benchmarks, tests, local runs) and drops everything cached from the old one.
+def set_storage(storage):
+    global _storage
+    _storage = InstrumentedStorage(storage)
+    user_cache.clear()
+
+
+# Read-through cache of each user's habits, goals, today's entries and habit stats.
+# Every mutating function below updates or invalidates the slots it affects.
+user_cache = UserCache()
+
+
+## Copies the user cache's counters into the metrics on every scrape of /metrics.
+def _collect_cache_metrics():
+    stats = user_cache.stats()
+    metrics.cache_lookups.set_total(stats["hits"], result="hit")
+    metrics.cache_lookups.set_total(stats["misses"], result="miss")
+    metrics.cache_evictions.set_total(stats["evictions"])
+    metrics.cache_discarded.set_total(stats["discarded"])
+    metrics.cache_users.set(stats["users"])
+
+
+metrics.add_collector(_collect_cache_metrics)
+
+
+## Returns the cached value for (user_id, key), loading it with the blocking `loader` on a miss. The value
+## is not cached if a write invalidated the user while it loaded, as it may have been read before the write.
+async def _cached(user_id: str, key: str, loader):
+    value = user_cache.get(user_id, key)
+    if value is MISSING:
+        generation = user_cache.generation(user_id)
+        value = await run_blocking(loader)
+        user_cache.set(user_id, key, value, generation)
+    return value
+
+
+## Runs a blocking callable on the appropriate thread pool and awaits its result.
+async def run_blocking(fn, *args, **kwargs):
+    executor = _bulk_executor if _use_bulk_pool.get() else _interactive_executor
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context into the thread, so storage metrics know which command issued the call.
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, partial(context.run, fn, *args, **kwargs))
+
+
+# === Users ===
+## Returns the ids of every user that has data stored.
+async def list_user_ids() -> list:
+    return await run_blocking(get_storage().list_user_ids)
+
+
+def _default_profile() -> dict:
+    return {"timezone": DEFAULT_TIMEZONE, "delivery_bucket": delivery_bucket(DEFAULT_TIMEZONE)}
+
+
+## Returns the user's time zone name, creating their profile with the default zone on first use.
+async def get_user_timezone(user_id: str) -> str:
+    def read():
+        storage = get_storage()
+        data = storage.get_users([user_id])[user_id] or {}
+        if data.get("timezone"):
+            return data["timezone"]
+        storage.update_users({user_id: _default_profile()})
+        return DEFAULT_TIMEZONE
+    return await _cached(user_id, "profile:timezone", read)
+
+
+async def set_user_timezone(user_id: str, tz_name: str):
+    await run_blocking(get_storage().update_users,
+                       {user_id: {"timezone": tz_name, "delivery_bucket": delivery_bucket(tz_name)}})
+    user_cache.invalidate(user_id)
+
+
+## Returns {user_id: (timezone, stored bucket)} for users whose stored delivery bucket is one of `buckets`.
+async def list_users_in_buckets(buckets: list) -> dict:
+    users = await run_blocking(get_storage().list_users_in_buckets, list(buckets))
+    return {user_id: (tz_name or DEFAULT_TIMEZONE, bucket) for user_id, (tz_name, bucket) in users.items()}
+
+
+## Stores new delivery buckets ({user_id: bucket}), e.g. after a DST change.
+async def set_delivery_buckets(buckets: dict):
+    await run_blocking(get_storage().update_users,
+                       {user_id: {"delivery_bucket": bucket} for user_id, bucket in buckets.items()})
+
+
+## Gives every listed user without a profile the default time zone; returns how many were created.
+async def ensure_user_profiles(user_ids: list) -> int:
+    def ensure():
+        storage = get_storage()
+        users = storage.get_users(user_ids)
+        missing = [user_id for user_id in user_ids if not (users.get(user_id) or {}).get("timezone")]
+        if missing:
+            storage.update_users({user_id: _default_profile() for user_id in missing})
+        return len(missing)
+    return await run_blocking(ensure)
+
+
+# === Goals ===
+## `created_at` is the user's local time; its date is the day the goal belongs to.
+async def add_goal(user_id: str, goal_text: str, created_at):
+    await run_blocking(get_storage().add_goal, user_id, {
+        "goal": goal_text,
+        "status": "pending",
+        "created_at": created_at,
+        "date": created_at.date().isoformat()
+    })
+    user_cache.invalidate(user_id, "goals")
+
+
+## Returns the goals of one day (ISO date), as dicts with an "id" key.
+async def get_goals_for_date(user_id: str, date_str: str) -> list:
+    return await _cached(user_id, f"goals:{date_str}", lambda: get_storage().get_goals(user_id, date_str, date_str))
+
+
+## Returns the goals of one day still marked as pending.
+async def get_pending_goals(user_id: str, date_str: str) -> list:
+    return await _cached(user_id, f"goals:pending:{date_str}",
+                         lambda: get_storage().get_goals(user_id, date_str, date_str, "pending"))
+
+
+## Returns the goals dated first_date..last_date (ISO, inclusive); uncached, used by reports.
+async def get_goals_for_dates(user_id: str, first_date: str, last_date: str) -> list:
+    return await run_blocking(get_storage().get_goals, user_id, first_date, last_date)
+
+
+async def delete_goal(user_id: str, goal_id: str):
+    await run_blocking(get_storage().delete_goal, user_id, goal_id)
+    user_cache.invalidate(user_id, "goals")
+
+
+async def complete_goal(user_id: str, goal_id: str):
+    await run_blocking(get_storage().update_goal, user_id, goal_id, {"status": "completed"})
+    user_cache.invalidate(user_id, "goals")
+
+
+## Gives goals stored before goals had a "date" the local date of their created_at (one-off migration);
+## returns how many were updated.
+async def backfill_goal_dates(user_id: str) -> int:
+    tz_name = await get_user_timezone(user_id)
+
+    def backfill():
+        storage = get_storage()
+        zone = get_zone(tz_name)
+        dates = {goal["id"]: goal["created_at"].astimezone(zone).date().isoformat()
+                 for goal in storage.list_undated_goals(user_id) if goal.get("created_at")}
+        if dates:
+            storage.set_goal_dates(user_id, dates)
+        return len(dates)
+    updated = await run_blocking(backfill)
+    user_cache.invalidate(user_id, "goals")
+    return updated
+
+
+# === Habit Trackers ===
+async def list_habits(user_id: str) -> list:
+    return await _cached(user_id, "habits", lambda: get_storage().list_habits(user_id))
+
+
+## Returns False if the user already tracks the habit (nothing changes then).
+async def add_habit(user_id: str, habit: str) -> bool:
+    added = await run_blocking(get_storage().add_habit, user_id, habit)
+    user_cache.invalidate(user_id, "habits", "entries", "stats")
+    return added
+
+
+async def delete_habit(user_id: str, habit: str):
+    await run_blocking(get_storage().delete_habit, user_id, habit)
+    user_cache.invalidate(user_id, "habits", "entries", "stats")
+
+
+## Returns {habit: response or None} for all of a user's habits on a date (one list + one batched read).
+async def get_entries_for_date(user_id: str, date_str: str) -> dict:
+    habits = await list_habits(user_id)
+
+    def read():
+        responses = get_storage().get_entries([(user_id, habit) for habit in habits], date_str)
+        return {habit: responses[(user_id, habit)] for habit in habits}
+    return await _cached(user_id, f"entries:{date_str}", read)
+
+
+## Returns {habit: {date_str: response}} for first_date..last_date (ISO, inclusive); uncached, used by reports.
+async def get_entries_between(user_id: str, first_date: str, last_date: str) -> dict:
+    return await run_blocking(get_storage().get_entries_between, user_id, first_date, last_date)
+
+
+## Writes a user's answers for one date ({habit: response}) and folds them into the trackers' running
+## aggregates, in one atomic write.
+async def set_entries(user_id: str, date_str: str, responses: dict):
+    if not responses:
+        return
+    await run_blocking(get_storage().record_entries, user_id, date_str, responses)
+    entries = user_cache.get(user_id, f"entries:{date_str}")
+    if entries is not MISSING:
+        user_cache.set(user_id, f"entries:{date_str}", {**entries, **responses})
+    user_cache.invalidate(user_id, "stats")
+
+
+## Returns {habit: aggregates} for all of a user's habits, read from the tracker records alone.
+async def get_habit_stats(user_id: str) -> dict:
+    def read():
+        return {habit: read_stats(data) for habit, data in get_storage().get_trackers(user_id).items()}
+    return await _cached(user_id, "stats", read)
+
+
+## Stores `response` for every habit without an entry on the given date, for a whole batch of users,
+## updating each tracker's aggregates in the same atomic write (batched reads and writes on every
+## backend); returns the number of entries filled.
+async def fill_missing_entries(user_ids: list, date_str: str, response: str = "no") -> int:
+    filled = await run_blocking(get_storage().fill_missing_entries, user_ids, date_str, response)
+    for user_id in user_ids:
+        user_cache.invalidate(user_id, f"entries:{date_str}", "stats")
+    return filled
+
+
+## Recomputes the aggregates of every habit of a user from its full entry history (one-off backfill).
+async def rebuild_habit_stats(user_id: str) -> int:
+    def rebuild():
+        storage = get_storage()
+        habits = list(storage.get_trackers(user_id))
+        for habit in habits:
+            storage.set_tracker_stats(user_id, habit, compute_stats(storage.get_entry_history(user_id, habit)))
+        return len(habits)
+    rebuilt = await run_blocking(rebuild)
+    user_cache.invalidate(user_id, "stats")
+    return rebuilt
+
+
+# === Job Ledger ===
+## Per-user progress of scheduled job runs (see job_ledger.py); uncached, as only the jobs read it.
+async def get_job_runs(run_ids: list) -> dict:
+    return await run_blocking(get_storage().get_job_runs, run_ids)
+
+
+async def update_job_run(run_id: str, fields: dict):
+    await run_blocking(get_storage().update_job_run, run_id, fields)
+
+
+async def get_job_states(run_id: str, user_ids: list) -> dict:
+    return await run_blocking(get_storage().get_job_states, run_id, user_ids)
+
+
+async def list_job_states(run_id: str, status: str) -> dict:
+    return await run_blocking(get_storage().list_job_states, run_id, status)
+
+
+async def set_job_states(run_id: str, states: dict):
+    if states:
+        await run_blocking(get_storage().set_job_states, run_id, states)
+
+
+async def delete_job_runs(before: float) -> int:
+    return await run_blocking(get_storage().delete_job_runs, before)
@@ -0,0 +1,29 @@
+from telegram import Update
+from telegram.ext import ContextTypes
+from conversation_state import ConversationStore
+
+## Single entry point for plain-text (non-command) messages.
+## A chat's conversation state names what the bot is waiting for ("remove", "complete",
+## "remove_habit"); the router looks it up once and hands the message to the
+## matching handler as handler(update, context, state). Text without an active state is
+## dropped without touching storage.
+
+
+class TextRouter:
+    def __init__(self, store: ConversationStore):
+        self.store = store
+        self.routes = {}
+        self.dispatched = 0
+        self.ignored = 0
+
+    def route(self, action: str, handler):
+        self.routes[action] = handler
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        state = self.store.get(str(update.effective_user.id))
+        handler = self.routes.get(state.get("action")) if state else None
+        if handler is None:
+            self.ignored += 1
+            return
+        self.dispatched += 1
+        await handler(update, context, state)
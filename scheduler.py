@@ -1,43 +1,340 @@
 import asyncio
-from datetime import datetime
+import os
+import time as clock
+from datetime import datetime, timedelta
+from telegram.error import Forbidden
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from firebase_init import db
+import metrics
+import outbox
+import job_ledger
+import repository
+import reports
+from partitions import create_lease_backend, run_partitioned, WORKER_ID
 from goal_manager import get_detailed_midnight_summary
-from pytz import timezone
+from user_time import BUCKET_MINUTES, current_tick, bucket_of_tick, candidate_buckets, delivery_bucket, get_zone
+from pytz import utc
 
-IST = timezone("Asia/Kolkata")
+## Fan-out tuning for the nightly summary job (overridable from the environment).
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "64"))        # users processed at the same time
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "100"))         # users auto-filled per batched read/write
+SUMMARY_PROGRESS_EVERY = float(os.getenv("SUMMARY_PROGRESS_EVERY", "5"))  # seconds between progress reports
+SUMMARY_CATCH_UP_HOURS = float(os.getenv("SUMMARY_CATCH_UP_HOURS", "6"))   # how far back missed/failed runs are resumed
+# How late a trigger may still start; keep it under 15 minutes, or a late start is taken for the next tick.
+SUMMARY_MISFIRE_GRACE = int(os.getenv("SUMMARY_MISFIRE_GRACE", "600"))
 
-## Scheduled job: sends daily summary messages to all users.
-async def _send_daily_summary(bot):
-    users = list(db.collection("users").list_documents())
-    # Get today's date in ISO format based on IST timezone.
-    today = datetime.now(IST).date().isoformat()
-    
-    print(f"[⏰ APScheduler] Starting summary job for {today}")
+
+# === Per-user work ===
+## Tracks how far the nightly job has got and periodically prints throughput and ETA.
+class SummaryProgress:
+    def __init__(self, total: int):
+        self.total = total
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0    # already handled by an earlier attempt of the run
+        self.started = clock.monotonic()
+        self.last_report = self.started
+
+    @property
+    def done(self) -> int:
+        return self.sent + self.failed + self.skipped
+
+    def record(self, ok: bool):
+        if ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+        self._maybe_report()
+
+    def skip(self, count: int):
+        self.skipped += count
+        if count:
+            self._maybe_report()
+
+    def _maybe_report(self):
+        now = clock.monotonic()
+        if now - self.last_report >= SUMMARY_PROGRESS_EVERY or self.done == self.total:
+            self.last_report = now
+            print(f"[📊] {self.report()}")
+
+    def report(self) -> str:
+        elapsed = clock.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float("inf")
+        return (f"{self.done}/{self.total} users ({self.sent} sent, {self.failed} failed, {self.skipped} skipped) "
+                f"in {elapsed:.1f}s — {rate:.1f} users/s, ETA {eta:.0f}s")
+
+
+# Partition leases and checkpoints, shared by every replica running the job.
+lease_backend = create_lease_backend()
+
+
+## Returns the users due at `tick`, i.e. whose local 23:59 falls in its bucket, as {user_id: timezone}.
+## Stored buckets can be off right after a DST change, so every bucket a zone due now used or will use
+## around it is checked too (user_time.candidate_buckets), and any stale bucket is corrected for the next run.
+async def _users_due(tick) -> dict:
+    bucket = bucket_of_tick(tick)
+    candidates = await repository.list_users_in_buckets(await asyncio.to_thread(candidate_buckets, tick))
+    due = {user_id: tz for user_id, (tz, _) in candidates.items() if delivery_bucket(tz, tick) == bucket}
+
+    tomorrow = tick + timedelta(days=1)
+    moved = {user_id: delivery_bucket(tz, tomorrow) for user_id, tz in due.items()}
+    moved = {user_id: b for user_id, b in moved.items() if b != candidates[user_id][1]}
+    if moved:
+        await repository.set_delivery_buckets(moved)
+    return due
+
+
+## Ledger run id of the nightly job at `tick`, e.g. "daily-2025-06-01T1829Z" (one tick is one bucket).
+def summary_run_id(tick) -> str:
+    return f"daily-{tick:%Y-%m-%dT%H%M}Z"
+
+
+# Runs in progress in this process ({run_id: task}); the start-up catch-up and the trigger may ask for
+# the same one.
+_active_runs = {}
+
+
+## Scheduled job (every 15 minutes): sends the daily summary to users whose local midnight is due.
+## Progress is kept per user in the job ledger (job_ledger.py), so running a tick again resumes it.
+async def _send_daily_summary(bot, tick=None):
+    # Keep the job's Firestore traffic on its own thread pool and its messages behind interactive replies,
+    # so commands stay responsive while it runs.
+    repository.use_bulk_pool()
+    outbox.use_bulk_priority()
+    metrics.command_scope("job:daily_summary")
+    tick = tick or current_tick()
+    run_id = summary_run_id(tick)
+    if run_id in _active_runs:
+        return
+    _active_runs[run_id] = asyncio.current_task()
+    try:
+        await _run_daily_summary(bot, tick, run_id)
+    except Exception as e:
+        # Nobody awaits the scheduled task, so this is the only place the error can surface. The run stays
+        # incomplete in the ledger and is resumed by the next tick (_daily_summary_tick).
+        print(f"[❌] Summary run {run_id} failed, will resume at the next tick: {type(e).__name__}: {e}")
+        metrics.job_failures.inc(job="daily_summary", phase="run", error=type(e).__name__)
+    finally:
+        _active_runs.pop(run_id, None)
+
+
+## Stops the summary runs in progress (on shutdown); each writes out its ledger, so a restart resumes it.
+async def stop_summary_jobs():
+    tasks = list(_active_runs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _run_daily_summary(bot, tick, run_id: str):
+    ledger = job_ledger.JobLedger(run_id)
+    record = await ledger.get_run()
+    if record and record.get("complete"):
+        print(f"[⏰ APScheduler] Summary run {run_id} is already complete, skipping.")
+        return
+    run = metrics.JobRun("daily_summary")
+    with run.phase("select"):
+        due = await _users_due(tick)
+    users = sorted(due)
+    if not users:
+        await ledger.complete(users=0, failed=0)
+        return
+    # Everyone in one bucket shares the same UTC offset, hence the same local date.
+    day = tick.astimezone(get_zone(due[users[0]])).date()
+    today = day.isoformat()
+    await ledger.start(date=today, users=len(users))
+
+    print(f"[⏰ APScheduler] {'Resuming' if record else 'Starting'} summary job for {today} "
+          f"(bucket {bucket_of_tick(tick)}, {tick:%H:%M} UTC)")
     print(f"[⏰ APScheduler] Found {len(users)} users to notify.")
 
-    for user_doc in users:
-        user_id = user_doc.id
-        
-        print(f"[📤] Sending summary to user: {user_id}")
+    progress = SummaryProgress(len(users))
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+    async def process(user_id: str, state: dict):
+        async with semaphore:
+            phase = "build"
+            try:
+                with run.phase("build"):
+                    text = await get_detailed_midnight_summary(user_id, day)
+                phase = "send"
+                with run.phase("send"):
+                    # Rate limits, flood control and retries are handled by the bot's outbox (outbox.py).
+                    await bot.send_message(chat_id=int(user_id), text=text)
+            except Exception as e:
+                print(f"[❌] Summary for user {user_id} ({today}) failed in {phase} phase: {type(e).__name__}: {e}")
+                run.record_failure(phase, e)
+                run.record_user("failed")
+                progress.record(False)
+                # A user who blocked the bot (or deleted the chat) won't get it on a retry either.
+                ledger.stage(user_id, job_ledger.failed(state, phase, e, permanent=isinstance(e, Forbidden)))
+            else:
+                run.record_user("sent")
+                progress.record(True)
+                # Stored before the slot is released, so a crash repeats at most the sends in flight. A failed
+                # write keeps the state buffered; the flush at the end of the batch fails if it still can't write.
+                try:
+                    await ledger.record(user_id, job_ledger.sent(state))
+                except Exception as e:
+                    print(f"[⚠️] Ledger write for user {user_id} ({today}) failed, will retry: {type(e).__name__}: {e}")
+
+    # Users are handled batch by batch: one batched ledger read, skipping users already sent; one batched
+    # auto-fill of unanswered habits for the rest; then their summaries are built and sent concurrently
+    # (bounded by SUMMARY_CONCURRENCY). Users whose auto-fill failed are retried later instead of being
+    # sent a summary with unanswered habits.
+    async def process_batch(batch: list):
+        states = await ledger.load(batch)
+        todo = [user_id for user_id in batch if job_ledger.should_run(states[user_id])]
+        progress.skip(len(batch) - len(todo))
+        to_fill = [user_id for user_id in todo if job_ledger.needs_fill(states[user_id])]
+        if to_fill:
+            try:
+                with run.phase("autofill"):
+                    await repository.fill_missing_entries(to_fill, today, "no")
+            except Exception as e:
+                print(f"[❌] Auto-fill of {today} for users {to_fill[0]}..{to_fill[-1]} ({len(to_fill)}) failed: "
+                      f"{type(e).__name__}: {e}")
+                run.record_failure("autofill", e)
+                for user_id in to_fill:
+                    run.record_user("failed")
+                    progress.record(False)
+                    ledger.stage(user_id, job_ledger.failed(states[user_id], "autofill", e))
+                todo = [user_id for user_id in todo if user_id not in set(to_fill)]
+            else:
+                for user_id in to_fill:
+                    states[user_id] = job_ledger.filled(states[user_id])
+                    ledger.stage(user_id, states[user_id])
+        await asyncio.gather(*(process(user_id, states[user_id]) for user_id in todo))
+        # Written before the partition checkpoint, so every batch checkpointed as done is in the ledger.
+        await ledger.flush()
+
+    # Batches come from the partitions this replica manages to claim; other replicas take the rest. Once
+    # every partition is done, the users that failed are retried in further rounds (partitioned the same
+    # way) after their backoff, until they are sent or out of attempts.
+    round_users, attempt = users, 0
+    try:
+        while True:
+            partition_run = run_id if attempt == 0 else f"{run_id}-retry{attempt}"
+            finished = await run_partitioned(partition_run, round_users, process_batch, lease_backend,
+                                             batch_size=SUMMARY_BATCH_SIZE)
+            print(f"[✅] Summary job completed on {WORKER_ID} ({finished} partitions): {progress.report()}")
+            failures = await ledger.failures()
+            retry = {user_id: state for user_id, state in failures.items() if job_ledger.retryable(state)}
+            attempt += 1
+            if not retry or attempt >= job_ledger.SUMMARY_MAX_ATTEMPTS:
+                break
+            delay = max(0.0, max(state["retry_at"] for state in retry.values()) - clock.time())
+            print(f"[🔁] Retrying {len(retry)} failed summaries for {today} in {delay:.0f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+            round_users = sorted(retry)
+            progress = SummaryProgress(len(round_users))
+    except asyncio.CancelledError:
+        # Shutting down (stop_summary_jobs): keep what was done, so the resumed run skips it.
+        await ledger.flush()
+        raise
+
+    run.finish()
+    await ledger.complete(failed=len(failures))
+    if failures:
+        print(f"[❌] {len(failures)} summaries for {today} could not be delivered; see the ledger of {run_id}.")
+    print(f"[📊] Time per phase, summed over users: {run.phase_report()}")
+    await job_ledger.prune(lease_backend)
+
+
+## Returns the nightly ticks of the last SUMMARY_CATCH_UP_HOURS up to `latest` whose run never ran or never
+## completed, oldest first (one ledger read). Only ticks after the earliest one in the ledger count, so a
+## first start with an empty ledger re-sends nothing.
+async def _incomplete_ticks(latest) -> list:
+    ticks = [latest - timedelta(minutes=BUCKET_MINUTES * i)
+             for i in range(int(SUMMARY_CATCH_UP_HOURS * 60 // BUCKET_MINUTES), -1, -1)]
+    records = await repository.get_job_runs([summary_run_id(tick) for tick in ticks])
+    known = [i for i, tick in enumerate(ticks) if records[summary_run_id(tick)] is not None]
+    if not known:
+        return []
+    return [tick for tick in ticks[known[0]:] if not (records[summary_run_id(tick)] or {}).get("complete")]
+
 
-        # Auto-fill missing habit tracker responses with "no" for habits not yet answered.
-        habits_ref = db.collection("users").document(user_id).collection("trackers").list_documents()
-        for habit_doc in habits_ref:
-            entry_ref = habit_doc.collection("entries").document(today)
-            if not entry_ref.get().exists:
-                entry_ref.set({"response": "no"})
+## Start-up catch-up: runs the nightly ticks that never ran (the bot was down at the trigger) or never
+## completed (it was interrupted), oldest first.
+async def catch_up_daily_summaries(bot):
+    repository.use_bulk_pool()
+    missed = await _incomplete_ticks(current_tick())
+    if missed:
+        print(f"[↩️] Catching up on {len(missed)} summary runs: {', '.join(map(summary_run_id, missed))}")
+    for tick in missed:
+        await _send_daily_summary(bot, tick)
 
-        try:
-            
-            text = await get_detailed_midnight_summary(user_id)
-            await bot.send_message(chat_id=int(user_id), text=text)
-        except Exception:
-            print("something's fucked")
-            continue
 
-    print("[✅] Summary job completed.")
+## Scheduled job (every 15 minutes): sends the summaries due at this tick, then resumes the runs of earlier
+## ticks that are still incomplete (e.g. one that failed part-way), oldest first, so a failed run doesn't
+## wait for a restart.
+async def _daily_summary_tick(bot):
+    repository.use_bulk_pool()
+    tick = current_tick()
+    try:
+        earlier = await _incomplete_ticks(tick - timedelta(minutes=BUCKET_MINUTES))
+    except Exception as e:
+        print(f"[❌] Could not look up incomplete summary runs: {type(e).__name__}: {e}")
+        earlier = []
+    await _send_daily_summary(bot, tick)
+    if earlier:
+        print(f"[↩️] Resuming {len(earlier)} incomplete summary runs: {', '.join(map(summary_run_id, earlier))}")
+    for earlier_tick in earlier:
+        await _send_daily_summary(bot, earlier_tick)
+
+
+## Scheduled job (1st of the month, 12:30 UTC, when the previous month has ended in every time zone):
+## renders each user's report for the previous month in the report process pool and sends the PDF.
+async def _send_monthly_reports(bot, year: int = None, month: int = None):
+    repository.use_bulk_pool()
+    outbox.use_bulk_priority()
+    metrics.command_scope("job:monthly_report")
+    run = metrics.JobRun("monthly_report")
+    if year is None:
+        year, month = reports.previous_month(datetime.now(utc).date())
+    label = f"{year:04d}-{month:02d}"
+    users = sorted(await repository.list_user_ids())
+    print(f"[⏰ APScheduler] Starting monthly report job for {label}: {len(users)} users.")
+
+    progress = SummaryProgress(len(users))
+    semaphore = asyncio.Semaphore(reports.REPORT_CONCURRENCY)
+    empty = 0
+
+    async def process(user_id: str):
+        nonlocal empty
+        async with semaphore:
+            phase = "render"
+            try:
+                with run.phase("render"):
+                    report = await reports.get_monthly_report(user_id, year, month)
+                if report is None:
+                    empty += 1
+                    run.record_user("empty")
+                else:
+                    phase = "send"
+                    with run.phase("send"):
+                        pdf = await asyncio.to_thread(reports.read_file, report["pdf"])
+                        await bot.send_document(chat_id=int(user_id), document=pdf, filename=f"goal-tracker-{label}.pdf",
+                                                caption=f"📆 Your report for {label}. Send /report {label} for the CSV export.")
+                    run.record_user("sent")
+            except Exception as e:
+                print(f"[❌] Monthly report {label} for user {user_id} failed in {phase} phase: {type(e).__name__}: {e}")
+                run.record_failure(phase, e)
+                run.record_user("failed")
+                progress.record(False)
+            else:
+                progress.record(True)
+
+    async def process_batch(batch: list):
+        await asyncio.gather(*(process(user_id) for user_id in batch))
+
+    finished = await run_partitioned(f"report-{label}", users, process_batch, lease_backend,
+                                     batch_size=SUMMARY_BATCH_SIZE)
+    run.finish()
+    print(f"[✅] Monthly report job completed on {WORKER_ID} ({finished} partitions, {empty} users without data): "
+          f"{progress.report()}")
+    print(f"[📊] Time per phase, summed over users: {run.phase_report()}")
 
 def start_apscheduler(bot):
     """
@@ -45,15 +342,26 @@ def start_apscheduler(bot):
     Must be called after the bot is built (so you can pass bot instance).
     """
     scheduler = AsyncIOScheduler()
-    # CronTrigger: every day at 00:00 local time
-    trigger = CronTrigger(hour=23, minute=59, timezone=IST)
+    # CronTrigger: every 15 minutes, on the UTC minutes where some time zone reaches 23:59
+    trigger = CronTrigger(minute="14,29,44,59", timezone=utc)
     # schedule the job
     loop = asyncio.get_event_loop()
     scheduler.add_job(
-        func=lambda: loop.call_soon_threadsafe(asyncio.create_task, _send_daily_summary(bot)),
+        func=lambda: loop.call_soon_threadsafe(asyncio.create_task, _daily_summary_tick(bot)),
         trigger=trigger,
         id="daily_summary_job",
         replace_existing=True,
+        # A trigger delayed (e.g. by a busy loop) still runs, once; restarts are covered by the catch-up.
+        misfire_grace_time=SUMMARY_MISFIRE_GRACE,
+        coalesce=True,
+    )
+    scheduler.add_job(
+        func=lambda: loop.call_soon_threadsafe(asyncio.create_task, _send_monthly_reports(bot)),
+        trigger=CronTrigger(day=1, hour=12, minute=30, timezone=utc),
+        id="monthly_report_job",
+        replace_existing=True,
+        misfire_grace_time=3600,
+        coalesce=True,
     )
     scheduler.start()
-    print("APScheduler started")
\ No newline at end of file
+    print("APScheduler started")
@@ -19,8 +19,14 @@ async def force_set_commands():
         BotCommand("addhabit", "Start tracking a new habit"),
         BotCommand("removehabit", "Remove an existing habit"),
         BotCommand("monthlytrackers", "Answer daily habit questions"),
+        BotCommand("stats", "Habit rates, trends and best weekdays"),
+        BotCommand("streaks", "Current and best habit streaks"),
+        BotCommand("timezone", "Set your time zone for daily summaries"),
+        BotCommand("report", "Get a monthly PDF/CSV progress report"),
     ]
     await bot.set_my_commands(commands)
     print("✅ Commands successfully registered.")
 
-asyncio.run(force_set_commands())
\ No newline at end of file
+
+if __name__ == "__main__":
+    asyncio.run(force_set_commands())
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import time
+import metrics
+import reports
+import repository
+from http_server import Response
+
+## Start-up sequence. The bot starts taking updates without waiting for its backends: storage is built
+## and connected (for Firestore: credentials, access token, gRPC channel) by a background warm-up that
+## runs while Telegram is being initialized, and GET /ready (on the metrics endpoint, and in webhook mode
+## on the webhook port too) answers 503 until every check has passed. A failing check (e.g. a bad
+## credential) is logged, shown on /ready and retried instead of crashing the process.
+
+STARTUP_RETRY_MAX = float(os.getenv("STARTUP_RETRY_MAX", "60"))  # max seconds between warm-up retries
+
+
+# === Readiness ===
+class Readiness:
+    def __init__(self, checks: tuple):
+        self.started = time.perf_counter()
+        self.pending = set(checks)
+        self.errors = {}
+        self.ready_after = None
+        self._passed = {check: asyncio.Event() for check in checks}
+
+    @property
+    def ready(self) -> bool:
+        return not self.pending
+
+    def passed(self, check: str):
+        elapsed = time.perf_counter() - self.started
+        self.pending.discard(check)
+        self.errors.pop(check, None)
+        self._passed[check].set()
+        metrics.startup_seconds.set(elapsed, check=check)
+        if self.ready and self.ready_after is None:
+            self.ready_after = elapsed
+            print(f"[✅] Ready {elapsed:.2f}s after start-up")
+
+    async def wait(self, check: str):
+        await self._passed[check].wait()
+
+    async def wait_ready(self):
+        await asyncio.gather(*(event.wait() for event in self._passed.values()))
+
+    def failed(self, check: str, error: Exception):
+        self.errors[check] = f"{type(error).__name__}: {error}"
+
+    ## GET /ready: 200 once every check passed, 503 (with what is still pending or failing) before that.
+    async def serve(self, request):
+        body = {"ready": self.ready, "pending": sorted(self.pending), "errors": self.errors}
+        return Response(200 if self.ready else 503, json.dumps(body), content_type="application/json")
+
+
+# === Warm-up ===
+## Retries `warm` (a coroutine function) until it succeeds, then marks `check` as passed.
+async def _warm(readiness: Readiness, check: str, warm):
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            await warm()
+        except Exception as e:
+            delay = min(2 ** attempt, STARTUP_RETRY_MAX)
+            print(f"[❌] Warm-up of {check} failed (attempt {attempt}), retrying in {delay:.0f}s: {type(e).__name__}: {e}")
+            readiness.failed(check, e)
+            await asyncio.sleep(delay)
+        else:
+            readiness.passed(check)
+            return
+
+
+## Background warm-up: storage first (it gates readiness), then the report workers, which only
+## matter for the first /report. They start once the bot is ready: each spawned worker imports the
+## bot's modules and reportlab, which on a small instance competes for the CPU with connecting to Telegram.
+async def warm_up(readiness: Readiness):
+    await _warm(readiness, "storage", repository.warm_up)
+    await readiness.wait_ready()
+    try:
+        await reports.warm_up()
+    except Exception as e:
+        print(f"[❌] Report workers failed to start: {type(e).__name__}: {e}")
@@ -0,0 +1,154 @@
+import os
+
+## Storage interface behind the repository. Implementations are synchronous (blocking); the repository
+## runs them on its thread pools, caches reads and exposes the async API the handlers use.
+##
+## Data model (same in every backend):
+##   user     – {"timezone", "delivery_bucket"}
+##   goal     – {"id", "goal", "status": "pending"|"completed", "created_at": aware datetime,
+##               "date": the user's local ISO date when it was added – every goal query is by date}
+##   tracker  – one per habit, holding the running aggregates from habit_stats
+##   entry    – response ("yes"/"no") of one habit on one ISO date
+##   job run  – ledger of one run of a scheduled job ({"updated_at", ...}), with one state per user
+##              ({"status", "attempts", ...}); see job_ledger.py
+##
+## Backends (STORAGE_BACKEND):
+##   firestore – Cloud Firestore via firebase_init (default)
+##   sqlite    – local SQLite file (STORAGE_PATH), WAL mode
+##   memory    – process-local dicts; for benchmarks, load tests and development
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+STORAGE_PATH = os.getenv("STORAGE_PATH", "goal_tracker.sqlite3")
+
+
+## Splits `items` into consecutive lists of at most `size`, for the backends' batched reads and writes.
+def chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class Storage:
+    ## Opens connections ahead of the first request (called once at start-up); a no-op by default.
+    def warm_up(self):
+        pass
+
+    # === Users ===
+    def list_user_ids(self) -> list:
+        raise NotImplementedError
+
+    ## Returns {user_id: user dict or None} for the given ids.
+    def get_users(self, user_ids: list) -> dict:
+        raise NotImplementedError
+
+    ## Merges `fields` into each user ({user_id: fields}), creating users as needed.
+    def update_users(self, updates: dict):
+        raise NotImplementedError
+
+    ## Returns {user_id: (timezone, delivery_bucket)} for users whose bucket is in `buckets`.
+    def list_users_in_buckets(self, buckets: list) -> dict:
+        raise NotImplementedError
+
+    # === Goals ===
+    ## Stores a goal ({"goal", "status", "created_at", "date"}) and returns its id.
+    def add_goal(self, user_id: str, goal: dict) -> str:
+        raise NotImplementedError
+
+    ## Goals dated first_date..last_date (ISO, inclusive), optionally only those with the given status.
+    def get_goals(self, user_id: str, first_date: str, last_date: str, status: str = None) -> list:
+        raise NotImplementedError
+
+    ## Goals stored before goals had a "date" (see migrate_goal_dates.py).
+    def list_undated_goals(self, user_id: str) -> list:
+        raise NotImplementedError
+
+    ## Stores {goal_id: date_str} in one batch.
+    def set_goal_dates(self, user_id: str, dates: dict):
+        raise NotImplementedError
+
+    def update_goal(self, user_id: str, goal_id: str, fields: dict):
+        raise NotImplementedError
+
+    def delete_goal(self, user_id: str, goal_id: str):
+        raise NotImplementedError
+
+    # === Habit Trackers ===
+    def list_habits(self, user_id: str) -> list:
+        raise NotImplementedError
+
+    ## Creates a habit with empty aggregates. Returns False, leaving it untouched, if it already exists.
+    def add_habit(self, user_id: str, habit: str) -> bool:
+        raise NotImplementedError
+
+    def delete_habit(self, user_id: str, habit: str):
+        raise NotImplementedError
+
+    ## Returns {habit: tracker dict} for one user.
+    def get_trackers(self, user_id: str) -> dict:
+        raise NotImplementedError
+
+    def set_tracker_stats(self, user_id: str, habit: str, stats: dict):
+        raise NotImplementedError
+
+    ## Returns {(user_id, habit): response or None} for the given keys on one date, in as few reads as possible.
+    def get_entries(self, keys: list, date_str: str) -> dict:
+        raise NotImplementedError
+
+    ## Returns {habit: {date_str: response}} for all of a user's habits, limited to first_date..last_date (inclusive).
+    def get_entries_between(self, user_id: str, first_date: str, last_date: str) -> dict:
+        raise NotImplementedError
+
+    ## Returns {date_str: response} with a habit's whole history.
+    def get_entry_history(self, user_id: str, habit: str) -> dict:
+        raise NotImplementedError
+
+    ## Stores a user's answers for one date ({habit: response}) and folds them into the tracker aggregates,
+    ## all in one atomic write.
+    def record_entries(self, user_id: str, date_str: str, responses: dict):
+        raise NotImplementedError
+
+    ## Stores `response` for every habit of `user_ids` without an entry on `date_str`, atomically with the
+    ## aggregates and without overwriting answers that race with it. Returns the number of entries written.
+    def fill_missing_entries(self, user_ids: list, date_str: str, response: str) -> int:
+        raise NotImplementedError
+
+    ## Bulk-loads {date_str: response} for a habit (creating it) and recomputes its aggregates.
+    def import_entries(self, user_id: str, habit: str, responses: dict):
+        raise NotImplementedError
+
+    # === Job Ledger ===
+    ## Returns {run_id: run record or None} for the given runs of a scheduled job.
+    def get_job_runs(self, run_ids: list) -> dict:
+        raise NotImplementedError
+
+    ## Merges `fields` (always including "updated_at", epoch seconds) into a run record, creating it as needed.
+    def update_job_run(self, run_id: str, fields: dict):
+        raise NotImplementedError
+
+    ## Returns {user_id: state or None} for the given users of a run, in as few reads as possible.
+    def get_job_states(self, run_id: str, user_ids: list) -> dict:
+        raise NotImplementedError
+
+    ## Returns {user_id: state} for every user of a run whose state has the given status.
+    def list_job_states(self, run_id: str, status: str) -> dict:
+        raise NotImplementedError
+
+    ## Stores {user_id: state} (each with a "status") for a run in one batched write.
+    def set_job_states(self, run_id: str, states: dict):
+        raise NotImplementedError
+
+    ## Deletes the runs last updated before `before` (epoch seconds), with their states; returns how many.
+    def delete_job_runs(self, before: float) -> int:
+        raise NotImplementedError
+
+
+def create_storage(kind: str = STORAGE_BACKEND) -> Storage:
+    if kind == "firestore":
+        from storage_firestore import FirestoreStorage
+        return FirestoreStorage()
+    if kind == "sqlite":
+        from storage_sqlite import SQLiteStorage
+        return SQLiteStorage(STORAGE_PATH)
+    if kind == "memory":
+        from storage_memory import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {kind!r} (expected 'firestore', 'sqlite' or 'memory')")
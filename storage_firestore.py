@@ -0,0 +1,243 @@
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, FailedPrecondition
+from firebase_init import BATCH_WRITE_LIMIT, FirestoreClient
+from habit_stats import apply_entry, compute_stats
+from storage import Storage, chunks
+
+## Cloud Firestore backend. Layout:
+##   users/{user_id}                                   {timezone, delivery_bucket}
+##   users/{user_id}/goals/{goal_id}                   {goal, status, created_at, date}
+## Goal queries filter on date (+ status), served by the composite index in firestore.indexes.json.
+##   users/{user_id}/trackers/{habit}                  running aggregates
+##   users/{user_id}/trackers/{habit}/entries/{date}   {response}
+##   job_runs/{run_id}                                 job ledger run record {updated_at, ...}
+##   job_runs/{run_id}/states/{user_id}                {status, attempts, ...}
+
+# Reads are chunked to keep individual RPCs small (writes: firebase_init.BATCH_WRITE_LIMIT).
+_BATCH_READ_LIMIT = 300
+
+
+def _goal_dict(doc) -> dict:
+    return {"id": doc.id, **doc.to_dict()}
+
+
+## The client is built on first use (firebase_init.FirestoreClient), so creating the backend never connects anywhere.
+class FirestoreStorage(FirestoreClient, Storage):
+    ## One tiny read: initializes Firebase, fetches an access token and opens the gRPC channel.
+    def warm_up(self):
+        list(self.db.collection("users").limit(1).stream())
+
+    def _user(self, user_id: str):
+        return self.db.collection("users").document(user_id)
+
+    def _tracker_ref(self, user_id: str, habit: str):
+        return self._user(user_id).collection("trackers").document(habit)
+
+    def _entry_ref(self, user_id: str, habit: str, date_str: str):
+        return self._tracker_ref(user_id, habit).collection("entries").document(date_str)
+
+    # === Users ===
+    def list_user_ids(self):
+        return [doc.id for doc in self.db.collection("users").list_documents()]
+
+    def get_users(self, user_ids):
+        users = {}
+        for chunk in chunks(list(user_ids), _BATCH_READ_LIMIT):
+            for snap in self.db.get_all([self._user(user_id) for user_id in chunk]):
+                users[snap.id] = snap.to_dict() if snap.exists else None
+        return users
+
+    def update_users(self, updates):
+        for chunk in chunks(list(updates.items()), BATCH_WRITE_LIMIT):
+            batch = self.db.batch()
+            for user_id, fields in chunk:
+                batch.set(self._user(user_id), fields, merge=True)
+            batch.commit()
+
+    def list_users_in_buckets(self, buckets):
+        docs = self.db.collection("users").where("delivery_bucket", "in", list(buckets)).stream()
+        return {doc.id: (doc.get("timezone"), doc.get("delivery_bucket")) for doc in docs}
+
+    # === Goals ===
+    def add_goal(self, user_id, goal):
+        _, ref = self._user(user_id).collection("goals").add(goal)
+        return ref.id
+
+    def get_goals(self, user_id, first_date, last_date, status=None):
+        query = self._user(user_id).collection("goals")
+        if first_date == last_date:
+            query = query.where("date", "==", first_date)
+        else:
+            query = query.where("date", ">=", first_date).where("date", "<=", last_date)
+        if status is not None:
+            query = query.where("status", "==", status)
+        return [_goal_dict(doc) for doc in query.stream()]
+
+    ## Firestore cannot query for a missing field, so this scans the user's goals (one-off migration only).
+    def list_undated_goals(self, user_id):
+        return [_goal_dict(doc) for doc in self._user(user_id).collection("goals").stream() if not doc.get("date")]
+
+    def set_goal_dates(self, user_id, dates):
+        goals_ref = self._user(user_id).collection("goals")
+        for chunk in chunks(list(dates.items()), BATCH_WRITE_LIMIT):
+            batch = self.db.batch()
+            for goal_id, date_str in chunk:
+                batch.update(goals_ref.document(goal_id), {"date": date_str})
+            batch.commit()
+
+    def update_goal(self, user_id, goal_id, fields):
+        self._user(user_id).collection("goals").document(goal_id).update(fields)
+
+    def delete_goal(self, user_id, goal_id):
+        self._user(user_id).collection("goals").document(goal_id).delete()
+
+    # === Habit Trackers ===
+    ## Only existing tracker documents count: list_documents() would also return a deleted habit whose
+    ## entries are still there.
+    def list_habits(self, user_id):
+        return [snap.id for snap in self._user(user_id).collection("trackers").select([]).stream()]
+
+    def add_habit(self, user_id, habit):
+        try:
+            self._tracker_ref(user_id, habit).create({})
+        except AlreadyExists:
+            return False
+        return True
+
+    ## Deleting a document leaves its subcollections behind, so the entries are deleted in batches first and
+    ## the tracker last (an interrupted delete leaves the habit listed and can simply be repeated).
+    def delete_habit(self, user_id, habit):
+        tracker = self._tracker_ref(user_id, habit)
+        self.delete_documents([*tracker.collection("entries").list_documents(), tracker])
+
+    def get_trackers(self, user_id):
+        return {doc.id: doc.to_dict() for doc in self._user(user_id).collection("trackers").stream()}
+
+    def set_tracker_stats(self, user_id, habit, stats):
+        self._tracker_ref(user_id, habit).set(stats, merge=True)
+
+    ## Batched get_all calls of up to _BATCH_READ_LIMIT documents.
+    def get_entries(self, keys, date_str):
+        responses = {key: None for key in keys}
+        for chunk in chunks(list(keys), _BATCH_READ_LIMIT):
+            refs = [self._entry_ref(user_id, habit, date_str) for user_id, habit in chunk]
+            for snap in self.db.get_all(refs):
+                if snap.exists:
+                    habit_ref = snap.reference.parent.parent
+                    user_id = habit_ref.parent.parent.id
+                    responses[(user_id, habit_ref.id)] = snap.to_dict().get("response")
+        return responses
+
+    ## One range query on the entry ids (ISO dates) per habit.
+    def get_entries_between(self, user_id, first_date, last_date):
+        entries = {}
+        for habit in self.list_habits(user_id):
+            entries_ref = self._tracker_ref(user_id, habit).collection("entries")
+            docs = (entries_ref.where("__name__", ">=", entries_ref.document(first_date))
+                    .where("__name__", "<=", entries_ref.document(last_date)).stream())
+            entries[habit] = {doc.id: doc.to_dict().get("response") for doc in docs}
+        return entries
+
+    def get_entry_history(self, user_id, habit):
+        entries = self._tracker_ref(user_id, habit).collection("entries").stream()
+        return {entry.id: entry.to_dict().get("response") for entry in entries}
+
+    ## Writes an entry and folds it into the tracker's running aggregates inside one transaction.
+    ## One transaction: a single get_all of every tracker and entry involved, then two writes per habit
+    ## (a transaction takes at most 500 writes, far more habits than a user keeps).
+    def record_entries(self, user_id, date_str, responses):
+        refs = {habit: (self._tracker_ref(user_id, habit), self._entry_ref(user_id, habit, date_str))
+                for habit in responses}
+
+        @firestore.transactional
+        def write(transaction):
+            snaps = {snap.reference.path: snap
+                     for snap in transaction.get_all([ref for pair in refs.values() for ref in pair])}
+            for habit, response in responses.items():
+                tracker_ref, entry_ref = refs[habit]
+                tracker_snap, entry_snap = snaps[tracker_ref.path], snaps[entry_ref.path]
+                previous = entry_snap.to_dict().get("response") if entry_snap.exists else None
+                stats = apply_entry(tracker_snap.to_dict() if tracker_snap.exists else {}, date_str, response, previous)
+                transaction.set(entry_ref, {"response": response})
+                transaction.set(tracker_ref, stats, merge=True)
+
+        write(self.db.transaction())
+
+    ## Reads go through batched get_all and writes through WriteBatch commits. Every write is conditional
+    ## on what was read, so a concurrent answer is never overwritten and never counted twice.
+    def fill_missing_entries(self, user_ids, date_str, response):
+        trackers = {}
+        for user_id in user_ids:
+            for snap in self._user(user_id).collection("trackers").stream():
+                trackers[(user_id, snap.id)] = snap
+        missing = [key for key, value in self.get_entries(list(trackers), date_str).items() if value is None]
+        # Each fill is two writes (entry + tracker aggregates).
+        for chunk in chunks(missing, BATCH_WRITE_LIMIT // 2):
+            batch = self.db.batch()
+            for user_id, habit in chunk:
+                tracker = trackers[(user_id, habit)]
+                # create() fails the whole batch if the user answered this day in the meantime; the update_time
+                # precondition does if they answered another day (the aggregates read above would be stale).
+                batch.create(self._entry_ref(user_id, habit, date_str), {"response": response})
+                batch.update(tracker.reference, apply_entry(tracker.to_dict(), date_str, response),
+                             option=self.db.write_option(last_update_time=tracker.update_time))
+            try:
+                batch.commit()
+            except (AlreadyExists, FailedPrecondition):
+                # Lost a race with a user's answer: fall back to one transaction per habit for this chunk, which
+                # reads the tracker again.
+                for user_id, habit in chunk:
+                    if self._entry_ref(user_id, habit, date_str).get().exists:
+                        continue
+                    self.record_entries(user_id, date_str, {habit: response})
+        return len(missing)
+
+    def import_entries(self, user_id, habit, responses):
+        items = list(responses.items())
+        for chunk in chunks(items, BATCH_WRITE_LIMIT):
+            batch = self.db.batch()
+            for date_str, response in chunk:
+                batch.set(self._entry_ref(user_id, habit, date_str), {"response": response})
+            batch.commit()
+        self._tracker_ref(user_id, habit).set(compute_stats(self.get_entry_history(user_id, habit)), merge=True)
+
+    # === Job Ledger ===
+    def _job_run_ref(self, run_id: str):
+        return self.db.collection("job_runs").document(run_id)
+
+    def get_job_runs(self, run_ids):
+        runs = {}
+        for chunk in chunks(list(run_ids), _BATCH_READ_LIMIT):
+            for snap in self.db.get_all([self._job_run_ref(run_id) for run_id in chunk]):
+                runs[snap.id] = snap.to_dict() if snap.exists else None
+        return runs
+
+    def update_job_run(self, run_id, fields):
+        self._job_run_ref(run_id).set(fields, merge=True)
+
+    def get_job_states(self, run_id, user_ids):
+        states_ref = self._job_run_ref(run_id).collection("states")
+        states = {}
+        for chunk in chunks(list(user_ids), _BATCH_READ_LIMIT):
+            for snap in self.db.get_all([states_ref.document(user_id) for user_id in chunk]):
+                states[snap.id] = snap.to_dict() if snap.exists else None
+        return states
+
+    ## Served by the automatic single-field index on status.
+    def list_job_states(self, run_id, status):
+        docs = self._job_run_ref(run_id).collection("states").where("status", "==", status).stream()
+        return {doc.id: doc.to_dict() for doc in docs}
+
+    def set_job_states(self, run_id, states):
+        states_ref = self._job_run_ref(run_id).collection("states")
+        for chunk in chunks(list(states.items()), BATCH_WRITE_LIMIT):
+            batch = self.db.batch()
+            for user_id, state in chunk:
+                batch.set(states_ref.document(user_id), state)
+            batch.commit()
+
+    def delete_job_runs(self, before):
+        runs = list(self.db.collection("job_runs").where("updated_at", "<", before).stream())
+        for run in runs:
+            self.delete_documents([*run.reference.collection("states").list_documents(), run.reference])
+        return len(runs)
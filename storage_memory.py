@@ -0,0 +1,166 @@
+import itertools
+import threading
+from habit_stats import apply_entry, compute_stats
+from storage import Storage
+
+## Process-local backend: plain dicts behind one lock. Nothing survives a restart; meant for
+## benchmarks, load tests and running the bot without credentials.
+
+
+class MemoryStorage(Storage):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}        # user_id -> {timezone, delivery_bucket}
+        self._goals = {}        # user_id -> {goal_id: goal dict}
+        self._trackers = {}     # user_id -> {habit: aggregates}
+        self._entries = {}      # (user_id, habit) -> {date_str: response}
+        self._job_runs = {}     # run_id -> run record
+        self._job_states = {}   # run_id -> {user_id: state}
+        self._goal_ids = itertools.count(1)
+
+    # === Users ===
+    def list_user_ids(self):
+        with self._lock:
+            return sorted(set(self._users) | set(self._goals) | set(self._trackers))
+
+    def get_users(self, user_ids):
+        with self._lock:
+            return {user_id: dict(self._users[user_id]) if user_id in self._users else None for user_id in user_ids}
+
+    def update_users(self, updates):
+        with self._lock:
+            for user_id, fields in updates.items():
+                self._users.setdefault(user_id, {}).update(fields)
+
+    def list_users_in_buckets(self, buckets):
+        wanted = set(buckets)
+        with self._lock:
+            return {user_id: (data.get("timezone"), data.get("delivery_bucket"))
+                    for user_id, data in self._users.items() if data.get("delivery_bucket") in wanted}
+
+    # === Goals ===
+    def add_goal(self, user_id, goal):
+        with self._lock:
+            goal_id = str(next(self._goal_ids))
+            self._goals.setdefault(user_id, {})[goal_id] = dict(goal)
+            return goal_id
+
+    def get_goals(self, user_id, first_date, last_date, status=None):
+        with self._lock:
+            return [{"id": goal_id, **goal} for goal_id, goal in self._goals.get(user_id, {}).items()
+                    if goal.get("date") and first_date <= goal["date"] <= last_date
+                    and (status is None or goal.get("status") == status)]
+
+    def list_undated_goals(self, user_id):
+        with self._lock:
+            return [{"id": goal_id, **goal} for goal_id, goal in self._goals.get(user_id, {}).items() if not goal.get("date")]
+
+    def set_goal_dates(self, user_id, dates):
+        with self._lock:
+            for goal_id, date_str in dates.items():
+                self._goals[user_id][goal_id]["date"] = date_str
+
+    def update_goal(self, user_id, goal_id, fields):
+        with self._lock:
+            self._goals[user_id][goal_id].update(fields)
+
+    def delete_goal(self, user_id, goal_id):
+        with self._lock:
+            self._goals.get(user_id, {}).pop(goal_id, None)
+
+    # === Habit Trackers ===
+    def list_habits(self, user_id):
+        with self._lock:
+            return sorted(self._trackers.get(user_id, {}))
+
+    def add_habit(self, user_id, habit):
+        with self._lock:
+            trackers = self._trackers.setdefault(user_id, {})
+            if habit in trackers:
+                return False
+            trackers[habit] = {}
+            return True
+
+    def delete_habit(self, user_id, habit):
+        with self._lock:
+            self._trackers.get(user_id, {}).pop(habit, None)
+            self._entries.pop((user_id, habit), None)
+
+    def get_trackers(self, user_id):
+        with self._lock:
+            return {habit: dict(data) for habit, data in sorted(self._trackers.get(user_id, {}).items())}
+
+    def set_tracker_stats(self, user_id, habit, stats):
+        with self._lock:
+            self._trackers.setdefault(user_id, {}).setdefault(habit, {}).update(stats)
+
+    def get_entries(self, keys, date_str):
+        with self._lock:
+            return {key: self._entries.get(key, {}).get(date_str) for key in keys}
+
+    def get_entries_between(self, user_id, first_date, last_date):
+        with self._lock:
+            return {habit: {d: r for d, r in self._entries.get((user_id, habit), {}).items() if first_date <= d <= last_date}
+                    for habit in sorted(self._trackers.get(user_id, {}))}
+
+    def get_entry_history(self, user_id, habit):
+        with self._lock:
+            return dict(self._entries.get((user_id, habit), {}))
+
+    def _record(self, user_id, habit, date_str, response):
+        entries = self._entries.setdefault((user_id, habit), {})
+        tracker = self._trackers.setdefault(user_id, {}).setdefault(habit, {})
+        tracker.update(apply_entry(tracker, date_str, response, entries.get(date_str)))
+        entries[date_str] = response
+
+    def record_entries(self, user_id, date_str, responses):
+        with self._lock:
+            for habit, response in responses.items():
+                self._record(user_id, habit, date_str, response)
+
+    def fill_missing_entries(self, user_ids, date_str, response):
+        filled = 0
+        with self._lock:
+            for user_id in user_ids:
+                for habit in self._trackers.get(user_id, {}):
+                    if self._entries.get((user_id, habit), {}).get(date_str) is None:
+                        self._record(user_id, habit, date_str, response)
+                        filled += 1
+        return filled
+
+    def import_entries(self, user_id, habit, responses):
+        with self._lock:
+            entries = self._entries.setdefault((user_id, habit), {})
+            entries.update(responses)
+            self._trackers.setdefault(user_id, {}).setdefault(habit, {}).update(compute_stats(entries))
+
+    # === Job Ledger ===
+    def get_job_runs(self, run_ids):
+        with self._lock:
+            return {run_id: dict(self._job_runs[run_id]) if run_id in self._job_runs else None for run_id in run_ids}
+
+    def update_job_run(self, run_id, fields):
+        with self._lock:
+            self._job_runs.setdefault(run_id, {}).update(fields)
+
+    def get_job_states(self, run_id, user_ids):
+        with self._lock:
+            states = self._job_states.get(run_id, {})
+            return {user_id: dict(states[user_id]) if user_id in states else None for user_id in user_ids}
+
+    def list_job_states(self, run_id, status):
+        with self._lock:
+            return {user_id: dict(state) for user_id, state in self._job_states.get(run_id, {}).items()
+                    if state.get("status") == status}
+
+    def set_job_states(self, run_id, states):
+        with self._lock:
+            self._job_states.setdefault(run_id, {}).update({user_id: dict(state) for user_id, state in states.items()})
+
+    def delete_job_runs(self, before):
+        with self._lock:
+            expired = [run_id for run_id, run in self._job_runs.items() if run.get("updated_at", 0) < before]
+            for run_id in expired:
+                del self._job_runs[run_id]
+                self._job_states.pop(run_id, None)
+            return len(expired)
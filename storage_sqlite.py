@@ -0,0 +1,349 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pytz import utc
+from habit_stats import apply_entry, compute_stats
+from storage import Storage, chunks
+
+## Local SQLite backend for a single-host deployment, development and benchmarks. The database runs
+## in WAL mode, so readers never block the writer. Every repository thread gets its own connection,
+## and writes take the lock up front (BEGIN IMMEDIATE) so read-modify-write sequences stay atomic.
+## Goal timestamps are stored as UTC epoch seconds, tracker aggregates and job ledger records as JSON.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    timezone TEXT,
+    delivery_bucket INTEGER
+);
+CREATE INDEX IF NOT EXISTS users_by_bucket ON users (delivery_bucket);
+
+CREATE TABLE IF NOT EXISTS goals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    goal TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    date TEXT
+);
+
+CREATE TABLE IF NOT EXISTS trackers (
+    user_id TEXT NOT NULL,
+    habit TEXT NOT NULL,
+    stats TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (user_id, habit)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS entries (
+    user_id TEXT NOT NULL,
+    habit TEXT NOT NULL,
+    date TEXT NOT NULL,
+    response TEXT NOT NULL,
+    PRIMARY KEY (user_id, habit, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_by_date ON entries (user_id, date);
+
+CREATE TABLE IF NOT EXISTS job_runs (
+    run_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS job_runs_by_updated ON job_runs (updated_at);
+
+CREATE TABLE IF NOT EXISTS job_states (
+    run_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (run_id, user_id)
+) WITHOUT ROWID;
+"""
+
+# Created after the column migrations below, as they index columns older databases may lack.
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS goals_by_date ON goals (user_id, date, status);
+DROP INDEX IF EXISTS goals_by_status;
+DROP INDEX IF EXISTS goals_by_created;
+"""
+
+_USER_COLUMNS = ("timezone", "delivery_bucket")
+_GOAL_COLUMNS = ("goal", "status", "created_at", "date")
+
+# SQLite limits the number of "?" parameters per statement (999 in older builds).
+_MAX_PARAMS = 900
+
+
+def _epoch(dt) -> float:
+    return dt.timestamp()
+
+
+_GOAL_SELECT = "SELECT id, goal, status, created_at, date FROM goals"
+
+
+def _goal_row(row) -> dict:
+    goal_id, goal, status, created_at, date_str = row
+    return {"id": str(goal_id), "goal": goal, "status": status, "created_at": datetime.fromtimestamp(created_at, utc),
+            "date": date_str}
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        if "date" not in [column[1] for column in conn.execute("PRAGMA table_info(goals)")]:
+            conn.execute("ALTER TABLE goals ADD COLUMN date TEXT")
+        conn.executescript(_INDEXES)
+
+    ## One connection per thread; autocommit unless a transaction is opened explicitly.
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    # === Users ===
+    def list_user_ids(self):
+        rows = self._conn().execute(
+            "SELECT user_id FROM users UNION SELECT user_id FROM goals UNION SELECT user_id FROM trackers"
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def get_users(self, user_ids):
+        users = {user_id: None for user_id in user_ids}
+        for chunk in chunks(list(user_ids), _MAX_PARAMS):
+            rows = self._conn().execute(
+                f"SELECT user_id, timezone, delivery_bucket FROM users WHERE user_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for user_id, tz_name, bucket in rows:
+                users[user_id] = {key: value for key, value in (("timezone", tz_name), ("delivery_bucket", bucket))
+                                  if value is not None}
+        return users
+
+    def update_users(self, updates):
+        def write(conn):
+            for user_id, fields in updates.items():
+                columns = [column for column in _USER_COLUMNS if column in fields]
+                conn.execute(
+                    f"INSERT INTO users (user_id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) "
+                    f"ON CONFLICT (user_id) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in columns)}",
+                    [user_id, *(fields[column] for column in columns)]
+                )
+        self._write(write)
+
+    def list_users_in_buckets(self, buckets):
+        buckets = list(buckets)
+        rows = self._conn().execute(
+            f"SELECT user_id, timezone, delivery_bucket FROM users WHERE delivery_bucket IN ({','.join('?' * len(buckets))})",
+            buckets
+        ).fetchall()
+        return {user_id: (tz_name, bucket) for user_id, tz_name, bucket in rows}
+
+    # === Goals ===
+    def add_goal(self, user_id, goal):
+        cursor = self._conn().execute(
+            "INSERT INTO goals (user_id, goal, status, created_at, date) VALUES (?, ?, ?, ?, ?)",
+            (user_id, goal["goal"], goal["status"], _epoch(goal["created_at"]), goal.get("date"))
+        )
+        return str(cursor.lastrowid)
+
+    def get_goals(self, user_id, first_date, last_date, status=None):
+        sql = f"{_GOAL_SELECT} WHERE user_id = ? AND date BETWEEN ? AND ?"
+        params = [user_id, first_date, last_date]
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        rows = self._conn().execute(sql + " ORDER BY date, id", params).fetchall()
+        return [_goal_row(row) for row in rows]
+
+    def list_undated_goals(self, user_id):
+        rows = self._conn().execute(f"{_GOAL_SELECT} WHERE user_id = ? AND date IS NULL", (user_id,)).fetchall()
+        return [_goal_row(row) for row in rows]
+
+    def set_goal_dates(self, user_id, dates):
+        self._write(lambda conn: conn.executemany(
+            "UPDATE goals SET date = ? WHERE user_id = ? AND id = ?",
+            [(date_str, user_id, int(goal_id)) for goal_id, date_str in dates.items()]
+        ))
+
+    def update_goal(self, user_id, goal_id, fields):
+        fields = {key: _epoch(value) if key == "created_at" else value
+                  for key, value in fields.items() if key in _GOAL_COLUMNS}
+        self._conn().execute(
+            f"UPDATE goals SET {', '.join(f'{key} = ?' for key in fields)} WHERE user_id = ? AND id = ?",
+            [*fields.values(), user_id, int(goal_id)]
+        )
+
+    def delete_goal(self, user_id, goal_id):
+        self._conn().execute("DELETE FROM goals WHERE user_id = ? AND id = ?", (user_id, int(goal_id)))
+
+    # === Habit Trackers ===
+    def list_habits(self, user_id):
+        rows = self._conn().execute("SELECT habit FROM trackers WHERE user_id = ? ORDER BY habit", (user_id,))
+        return [row[0] for row in rows]
+
+    def add_habit(self, user_id, habit):
+        cursor = self._conn().execute("INSERT OR IGNORE INTO trackers (user_id, habit, stats) VALUES (?, ?, '{}')",
+                                      (user_id, habit))
+        return cursor.rowcount == 1
+
+    def delete_habit(self, user_id, habit):
+        def write(conn):
+            conn.execute("DELETE FROM entries WHERE user_id = ? AND habit = ?", (user_id, habit))
+            conn.execute("DELETE FROM trackers WHERE user_id = ? AND habit = ?", (user_id, habit))
+        self._write(write)
+
+    def get_trackers(self, user_id):
+        rows = self._conn().execute("SELECT habit, stats FROM trackers WHERE user_id = ? ORDER BY habit", (user_id,))
+        return {habit: json.loads(stats) for habit, stats in rows}
+
+    def set_tracker_stats(self, user_id, habit, stats):
+        def write(conn):
+            row = conn.execute("SELECT stats FROM trackers WHERE user_id = ? AND habit = ?", (user_id, habit)).fetchone()
+            merged = {**(json.loads(row[0]) if row else {}), **stats}
+            conn.execute("INSERT OR REPLACE INTO trackers (user_id, habit, stats) VALUES (?, ?, ?)",
+                         (user_id, habit, json.dumps(merged)))
+        self._write(write)
+
+    ## One query per user (primary-key range scan on user_id + habit, filtered by date).
+    def get_entries(self, keys, date_str):
+        responses = {key: None for key in keys}
+        conn = self._conn()
+        for user_id in {user_id for user_id, _ in keys}:
+            rows = conn.execute("SELECT habit, response FROM entries WHERE user_id = ? AND date = ?", (user_id, date_str))
+            for habit, response in rows:
+                if (user_id, habit) in responses:
+                    responses[(user_id, habit)] = response
+        return responses
+
+    ## A single scan of the (user_id, date) index.
+    def get_entries_between(self, user_id, first_date, last_date):
+        entries = {habit: {} for habit in self.list_habits(user_id)}
+        rows = self._conn().execute(
+            "SELECT habit, date, response FROM entries WHERE user_id = ? AND date BETWEEN ? AND ?",
+            (user_id, first_date, last_date)
+        )
+        for habit, date_str, response in rows:
+            if habit in entries:
+                entries[habit][date_str] = response
+        return entries
+
+    def get_entry_history(self, user_id, habit):
+        rows = self._conn().execute("SELECT date, response FROM entries WHERE user_id = ? AND habit = ?", (user_id, habit))
+        return dict(rows.fetchall())
+
+    ## Entry and aggregates are updated in the same transaction; `conn` must already be inside one.
+    @staticmethod
+    def _record(conn, user_id, habit, date_str, response):
+        row = conn.execute("SELECT stats FROM trackers WHERE user_id = ? AND habit = ?", (user_id, habit)).fetchone()
+        previous = conn.execute("SELECT response FROM entries WHERE user_id = ? AND habit = ? AND date = ?",
+                                (user_id, habit, date_str)).fetchone()
+        stats = apply_entry(json.loads(row[0]) if row else {}, date_str, response, previous[0] if previous else None)
+        conn.execute("INSERT OR REPLACE INTO entries (user_id, habit, date, response) VALUES (?, ?, ?, ?)",
+                     (user_id, habit, date_str, response))
+        conn.execute("INSERT OR REPLACE INTO trackers (user_id, habit, stats) VALUES (?, ?, ?)",
+                     (user_id, habit, json.dumps(stats)))
+
+    def record_entries(self, user_id, date_str, responses):
+        def write(conn):
+            for habit, response in responses.items():
+                self._record(conn, user_id, habit, date_str, response)
+        self._write(write)
+
+    ## The whole batch runs in one write transaction, so there is no race with answers to handle here.
+    def fill_missing_entries(self, user_ids, date_str, response):
+        def write(conn):
+            filled = 0
+            for chunk in chunks(list(user_ids), _MAX_PARAMS - 1):
+                rows = conn.execute(
+                    f"SELECT t.user_id, t.habit, t.stats FROM trackers t "
+                    f"LEFT JOIN entries e ON e.user_id = t.user_id AND e.habit = t.habit AND e.date = ? "
+                    f"WHERE t.user_id IN ({','.join('?' * len(chunk))}) AND e.response IS NULL",
+                    [date_str, *chunk]
+                ).fetchall()
+                conn.executemany("INSERT INTO entries (user_id, habit, date, response) VALUES (?, ?, ?, ?)",
+                                 [(user_id, habit, date_str, response) for user_id, habit, _ in rows])
+                conn.executemany(
+                    "UPDATE trackers SET stats = ? WHERE user_id = ? AND habit = ?",
+                    [(json.dumps(apply_entry(json.loads(stats), date_str, response)), user_id, habit)
+                     for user_id, habit, stats in rows]
+                )
+                filled += len(rows)
+            return filled
+        return self._write(write)
+
+    def import_entries(self, user_id, habit, responses):
+        def write(conn):
+            conn.executemany("INSERT OR REPLACE INTO entries (user_id, habit, date, response) VALUES (?, ?, ?, ?)",
+                             [(user_id, habit, date_str, response) for date_str, response in responses.items()])
+            history = dict(conn.execute("SELECT date, response FROM entries WHERE user_id = ? AND habit = ?",
+                                        (user_id, habit)).fetchall())
+            conn.execute("INSERT OR REPLACE INTO trackers (user_id, habit, stats) VALUES (?, ?, ?)",
+                         (user_id, habit, json.dumps(compute_stats(history))))
+        self._write(write)
+
+    # === Job Ledger ===
+    def get_job_runs(self, run_ids):
+        runs = {run_id: None for run_id in run_ids}
+        for chunk in chunks(list(run_ids), _MAX_PARAMS):
+            rows = self._conn().execute(
+                f"SELECT run_id, data FROM job_runs WHERE run_id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            runs.update({run_id: json.loads(data) for run_id, data in rows})
+        return runs
+
+    def update_job_run(self, run_id, fields):
+        def write(conn):
+            row = conn.execute("SELECT data FROM job_runs WHERE run_id = ?", (run_id,)).fetchone()
+            merged = {**(json.loads(row[0]) if row else {}), **fields}
+            conn.execute("INSERT OR REPLACE INTO job_runs (run_id, data, updated_at) VALUES (?, ?, ?)",
+                         (run_id, json.dumps(merged), merged["updated_at"]))
+        self._write(write)
+
+    def get_job_states(self, run_id, user_ids):
+        states = {user_id: None for user_id in user_ids}
+        for chunk in chunks(list(user_ids), _MAX_PARAMS - 1):
+            rows = self._conn().execute(
+                f"SELECT user_id, data FROM job_states WHERE run_id = ? AND user_id IN ({','.join('?' * len(chunk))})",
+                [run_id, *chunk]
+            ).fetchall()
+            states.update({user_id: json.loads(data) for user_id, data in rows})
+        return states
+
+    def list_job_states(self, run_id, status):
+        rows = self._conn().execute("SELECT user_id, data FROM job_states WHERE run_id = ? AND status = ?",
+                                    (run_id, status))
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    def set_job_states(self, run_id, states):
+        self._write(lambda conn: conn.executemany(
+            "INSERT OR REPLACE INTO job_states (run_id, user_id, status, data) VALUES (?, ?, ?, ?)",
+            [(run_id, user_id, state["status"], json.dumps(state)) for user_id, state in states.items()]
+        ))
+
+    def delete_job_runs(self, before):
+        def write(conn):
+            run_ids = [row[0] for row in conn.execute("SELECT run_id FROM job_runs WHERE updated_at < ?", (before,))]
+            for chunk in chunks(run_ids, _MAX_PARAMS):
+                placeholders = ','.join('?' * len(chunk))
+                conn.execute(f"DELETE FROM job_states WHERE run_id IN ({placeholders})", chunk)
+                conn.execute(f"DELETE FROM job_runs WHERE run_id IN ({placeholders})", chunk)
+            return len(run_ids)
+        return self._write(write)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The bot's modules live at the repository root; the tests import them the way main.py does.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("SUMMARY_LEASE_BACKEND", "memory")
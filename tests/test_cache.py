@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import metrics
+import repository
+from cache import MISSING, UserCache
+from storage_memory import MemoryStorage
+
+
+def test_set_after_invalidation_is_discarded():
+    cache = UserCache()
+    generation = cache.generation("1")
+    cache.invalidate("1", "habits")
+    cache.set("1", "habits", ["stale"], generation)
+    assert cache.get("1", "habits") is MISSING and cache.discarded == 1
+    cache.set("1", "habits", ["fresh"], cache.generation("1"))
+    assert cache.get("1", "habits") == ["fresh"]
+
+
+def test_generations_stay_bounded():
+    cache = UserCache(max_users=2)
+    generation = cache.generation("1")
+    for user_id in ("1", "2", "3", "4"):
+        cache.invalidate(user_id)
+    assert len(cache._generations) == 2
+    cache.set("1", "habits", ["stale"], generation)
+    assert cache.get("1", "habits") is MISSING
+
+
+def test_read_overlapping_a_write_is_not_cached():
+    storage = MemoryStorage()
+    repository.set_storage(storage)
+    list_habits = storage.list_habits
+    read_done, release = threading.Event(), threading.Event()
+
+    def slow_list_habits(user_id):
+        habits = list_habits(user_id)   # read before the write below
+        read_done.set()
+        release.wait()
+        return habits
+
+    async def main():
+        storage.list_habits = slow_list_habits
+        read = asyncio.create_task(repository.list_habits("1"))
+        await asyncio.to_thread(read_done.wait)
+        storage.list_habits = list_habits
+        await repository.add_habit("1", "run")
+        release.set()
+        assert await read == []
+        return await repository.list_habits("1")
+
+    assert asyncio.run(main()) == ["run"]
+
+
+def test_cache_counters_are_exported():
+    repository.set_storage(MemoryStorage())
+    asyncio.run(repository.list_habits("1"))
+    asyncio.run(repository.list_habits("1"))
+    stats = repository.user_cache.stats()
+    text = metrics.render()
+    assert f'bot_user_cache_lookups_total{{result="hit"}} {stats["hits"]}' in text
+    assert f'bot_user_cache_lookups_total{{result="miss"}} {stats["misses"]}' in text
+    assert "bot_user_cache_evictions_total" in text and "bot_user_cache_users 1" in text
@@ -0,0 +1,56 @@
+from habit_stats import apply_entry, compute_stats, empty_stats, yes_percentage
+
+
+def test_first_answer_counts_the_day():
+    stats = apply_entry(empty_stats(), "2025-06-03", "yes")
+    assert stats["total"] == 1 and stats["yes_count"] == 1
+    assert stats["current_streak"] == 1 and stats["streak_before"] == 0
+    assert stats["last_date"] == "2025-06-03"
+    assert stats["months"] == {"2025-06": {"yes": 1, "total": 1}}
+    assert stats["history"] == {"2025-06": "..y"}
+
+
+def test_consecutive_yes_days_extend_the_streak():
+    stats = empty_stats()
+    for day in ("2025-06-01", "2025-06-02", "2025-06-03"):
+        stats = apply_entry(stats, day, "yes")
+    assert stats["current_streak"] == 3 and stats["streak_before"] == 2
+
+
+def test_gap_or_no_resets_the_streak():
+    stats = apply_entry(apply_entry(empty_stats(), "2025-06-01", "yes"), "2025-06-03", "yes")
+    assert stats["current_streak"] == 1
+    stats = apply_entry(stats, "2025-06-04", "no")
+    assert stats["current_streak"] == 0 and stats["history"]["2025-06"] == "y.yn"
+
+
+def test_re_answering_a_day_changes_counts_not_total():
+    stats = apply_entry(apply_entry(empty_stats(), "2025-06-01", "yes"), "2025-06-02", "yes")
+    stats = apply_entry(stats, "2025-06-02", "no", previous="yes")
+    assert stats["total"] == 2 and stats["yes_count"] == 1
+    assert stats["current_streak"] == 0 and stats["months"]["2025-06"] == {"yes": 1, "total": 2}
+    stats = apply_entry(stats, "2025-06-02", "yes", previous="no")
+    assert stats["current_streak"] == 2 and stats["yes_count"] == 2
+
+
+def test_answer_before_last_date_keeps_the_streak_anchor():
+    stats = apply_entry(empty_stats(), "2025-06-05", "yes")
+    stats = apply_entry(stats, "2025-06-04", "yes")
+    assert stats["last_date"] == "2025-06-05" and stats["current_streak"] == 1
+    assert stats["total"] == 2 and stats["history"]["2025-06"] == "...yy"
+
+
+def test_apply_entry_does_not_mutate_its_input():
+    stats = apply_entry(empty_stats(), "2025-06-01", "yes")
+    snapshot = {**stats, "months": dict(stats["months"]), "history": dict(stats["history"])}
+    apply_entry(stats, "2025-06-02", "no")
+    assert stats == snapshot
+
+
+def test_compute_stats_matches_incremental_updates():
+    responses = {"2025-05-31": "yes", "2025-06-01": "yes", "2025-06-02": "no", "2025-06-03": "YES", "2025-06-04": ""}
+    stats = compute_stats(responses)
+    assert stats["total"] == 4 and stats["yes_count"] == 3
+    assert stats["months"] == {"2025-05": {"yes": 1, "total": 1}, "2025-06": {"yes": 2, "total": 3}}
+    assert stats["current_streak"] == 1 and stats["last_date"] == "2025-06-03"
+    assert yes_percentage(stats) == 75
@@ -0,0 +1,50 @@
+import asyncio
+from http_server import HTTPServer, Response
+
+
+async def _exchange(raw: bytes) -> bytes:
+    server = HTTPServer("127.0.0.1", 0)
+
+    async def echo(request):
+        return Response(200, request.body)
+
+    server.route("POST", "/echo", echo)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(raw)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response
+    finally:
+        await server.stop()
+
+
+def _status(raw: bytes) -> int:
+    return int(asyncio.run(_exchange(raw)).split(b" ", 2)[1])
+
+
+def test_body_is_read_by_content_length():
+    response = asyncio.run(_exchange(b"POST /echo HTTP/1.1\r\nContent-Length: 5\r\nConnection: close\r\n\r\nhello"))
+    assert response.startswith(b"HTTP/1.1 200 ") and response.endswith(b"\r\n\r\nhello")
+
+
+def test_invalid_content_length_is_rejected():
+    for value in (b"-1", b"abc", b"+5", b"1_0"):
+        assert _status(b"POST /echo HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\n") == 400
+
+
+def test_oversized_body_is_rejected():
+    assert _status(b"POST /echo HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n") == 413
+
+
+def test_overlong_lines_are_rejected():
+    assert _status(b"POST /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n") == 414
+    assert _status(b"POST /echo HTTP/1.1\r\nX-Long: " + b"a" * 70000 + b"\r\n\r\n") == 431
+    assert _status(b"POST /echo HTTP/1.1\r\n" + b"X-A: b\r\n" * 101 + b"\r\n") == 431
+
+
+def test_unknown_route():
+    assert _status(b"GET /nope HTTP/1.1\r\nConnection: close\r\n\r\n") == 404
+    assert _status(b"GET /echo HTTP/1.1\r\nConnection: close\r\n\r\n") == 405
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+import job_ledger
+import repository
+from job_ledger import FAILED, FILLED, PENDING, SENT, JobLedger
+from storage_memory import MemoryStorage
+
+
+@pytest.fixture(autouse=True)
+def storage():
+    storage = MemoryStorage()
+    repository.set_storage(storage)
+    return storage
+
+
+def test_new_user_runs_and_needs_fill():
+    state = {"status": PENDING, "attempts": 0}
+    assert job_ledger.should_run(state) and job_ledger.needs_fill(state)
+    state = job_ledger.filled(state)
+    assert state["status"] == FILLED
+    assert job_ledger.should_run(state) and not job_ledger.needs_fill(state)
+
+
+def test_sent_user_is_skipped():
+    state = job_ledger.sent(job_ledger.filled({"status": PENDING, "attempts": 0}))
+    assert state == {"status": SENT, "attempts": 1}
+    assert not job_ledger.should_run(state)
+
+
+def test_failure_backs_off_and_runs_out_of_attempts(monkeypatch):
+    monkeypatch.setattr(job_ledger, "SUMMARY_MAX_ATTEMPTS", 2)
+    state = job_ledger.failed({"status": FILLED, "attempts": 0}, "send", RuntimeError("boom"))
+    assert state["status"] == FAILED and state["attempts"] == 1 and state["error"] == "RuntimeError: boom"
+    assert job_ledger.retryable(state) and job_ledger.should_run(state)
+    assert not job_ledger.needs_fill(state)  # failed after auto-fill succeeded
+
+    again = job_ledger.failed(state, "send", RuntimeError("boom"))
+    assert again["retry_at"] - state["retry_at"] >= job_ledger.SUMMARY_RETRY_DELAY * 0.99
+    assert not job_ledger.retryable(again) and not job_ledger.should_run(again)
+
+
+def test_permanent_and_autofill_failures():
+    blocked = job_ledger.failed({"status": FILLED, "attempts": 0}, "send", RuntimeError("blocked"), permanent=True)
+    assert not job_ledger.should_run(blocked)
+    unfilled = job_ledger.failed({"status": PENDING, "attempts": 0}, "autofill", RuntimeError("db"))
+    assert job_ledger.should_run(unfilled) and job_ledger.needs_fill(unfilled)
+
+
+def test_ledger_round_trip():
+    async def main():
+        ledger = JobLedger("daily-test")
+        await ledger.start(date="2025-06-01", users=3)
+        await ledger.record("1", {"status": SENT, "attempts": 1})
+        await ledger.record("2", job_ledger.failed({"status": FILLED, "attempts": 0}, "send", RuntimeError("x")))
+        await ledger.flush()
+        # A later attempt of the run reads it back from storage.
+        states = await JobLedger("daily-test").load(["1", "2", "3"])
+        failures = await ledger.failures()
+        await ledger.complete(failed=len(failures))
+        return states, failures, await ledger.get_run()
+
+    states, failures, run = asyncio.run(main())
+    assert states["1"]["status"] == SENT and states["2"]["status"] == FAILED
+    assert states["3"] == {"status": PENDING, "attempts": 0}
+    assert list(failures) == ["2"]
+    assert run["complete"] and run["users"] == 3 and run["failed"] == 1
+
+
+def test_failed_flush_keeps_states_for_the_next_one(storage, monkeypatch):
+    async def main():
+        ledger = JobLedger("daily-test")
+        ledger.stage("1", {"status": SENT, "attempts": 1})
+        monkeypatch.setattr(storage, "set_job_states", _raise)
+        with pytest.raises(ConnectionError):
+            await ledger.flush()
+        monkeypatch.undo()
+        repository.set_storage(storage)
+        await ledger.flush()
+        return await JobLedger("daily-test").load(["1"])
+
+    assert asyncio.run(main())["1"]["status"] == SENT
+
+
+def test_recorded_state_survives_a_crash():
+    async def main():
+        ledger = JobLedger("daily-test")
+        ledger.stage("1", job_ledger.filled({"status": PENDING, "attempts": 0}))
+        await ledger.record("2", {"status": SENT, "attempts": 1})
+        # No flush: the process dies here, and another one resumes the run.
+        return await JobLedger("daily-test").load(["1", "2"])
+
+    states = asyncio.run(main())
+    assert states["2"]["status"] == SENT and states["1"]["status"] == FILLED
+
+
+def test_concurrent_records_share_writes(storage, monkeypatch):
+    writes = []
+    set_job_states = storage.set_job_states
+
+    def counting(run_id, states):
+        writes.append(sorted(states))
+        set_job_states(run_id, states)
+
+    monkeypatch.setattr(storage, "set_job_states", counting)
+
+    async def main():
+        ledger = JobLedger("daily-test")
+        await asyncio.gather(*(ledger.record(str(i), {"status": SENT, "attempts": 1}) for i in range(20)))
+        return await JobLedger("daily-test").load([str(i) for i in range(20)])
+
+    states = asyncio.run(main())
+    assert all(state["status"] == SENT for state in states.values())
+    assert len(writes) == 2 and sum(map(len, writes)) == 20
+
+
+def _raise(*args, **kwargs):
+    raise ConnectionError("storage unavailable")
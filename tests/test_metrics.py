@@ -0,0 +1,34 @@
+import pytest
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def _registry():
+    saved = list(metrics._registry)
+    yield
+    metrics._registry[:] = saved
+
+
+def test_large_values_keep_every_digit():
+    counter = metrics.Counter("test_bytes_total", "Test counter.")
+    counter.inc(123456789)
+    gauge = metrics.Gauge("test_seconds", "Test gauge.")
+    gauge.set(1234567.891)
+    assert "test_bytes_total 123456789" in counter.render()
+    assert "test_seconds 1234567.891" in gauge.render()
+
+
+def test_histogram_sum_is_not_rounded():
+    histogram = metrics.Histogram("test_duration_seconds", "Test histogram.", buckets=(1,))
+    for value in (1000000.25, 2.5):
+        histogram.observe(value)
+    lines = histogram.render()
+    assert "test_duration_seconds_sum 1000002.75" in lines
+    assert "test_duration_seconds_count 2" in lines
+
+
+def test_special_floats_use_prometheus_spelling():
+    gauge = metrics.Gauge("test_gauge", "Test gauge.", ("kind",))
+    gauge.set(float("inf"), kind="inf")
+    gauge.set(float("nan"), kind="nan")
+    assert gauge.render()[2:] == ['test_gauge{kind="inf"} +Inf', 'test_gauge{kind="nan"} NaN']
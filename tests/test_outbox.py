@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from telegram.error import Forbidden, RetryAfter
+import outbox
+
+
+def _outbox(**kwargs) -> outbox.Outbox:
+    limits = {"global_rate": float("inf"), "chat_rate": float("inf"), "group_rate": float("inf"),
+              "chat_burst": float("inf")}
+    return outbox.Outbox(**{**limits, **kwargs})
+
+
+def _send(box: outbox.Outbox, callback, chat_id: int, text: str, bulk: bool = False):
+    async def call():
+        if bulk:
+            outbox.use_bulk_priority()
+        data = {"chat_id": chat_id, "text": text}
+        return await box.process_request(callback, ("sendMessage", data), {}, "sendMessage", data, None)
+    return asyncio.create_task(call())
+
+
+def test_interactive_messages_go_before_bulk():
+    async def main():
+        box = _outbox(concurrency=1)
+        sent = []
+        gate = asyncio.Event()
+
+        async def callback(endpoint, data):
+            await gate.wait()
+            sent.append(data["text"])
+            return data["text"]
+
+        first = _send(box, callback, 1, "first")
+        await asyncio.sleep(0.01)  # holds the only slot until the gate opens
+        tasks = [_send(box, callback, 2, "bulk", bulk=True), _send(box, callback, 3, "interactive")]
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(first, *tasks)
+        await box.shutdown()
+        return sent
+
+    assert asyncio.run(main()) == ["first", "interactive", "bulk"]
+
+
+def test_retry_after_is_retried_until_sent():
+    async def main():
+        box = _outbox()
+        calls = []
+
+        async def callback(endpoint, data):
+            calls.append(data["text"])
+            if len(calls) < 3:
+                raise RetryAfter(0.01)
+            return "ok"
+
+        result = await _send(box, callback, 1, "hi")
+        await box.shutdown()
+        return result, calls
+
+    assert asyncio.run(main()) == ("ok", ["hi", "hi", "hi"])
+
+
+def test_retries_stop_after_max_attempts():
+    async def main():
+        box = _outbox(max_attempts=2)
+        calls = []
+
+        async def callback(endpoint, data):
+            calls.append(data["text"])
+            raise RetryAfter(0.01)
+
+        try:
+            with pytest.raises(RetryAfter):
+                await _send(box, callback, 1, "hi")
+        finally:
+            await box.shutdown()
+        return calls
+
+    assert asyncio.run(main()) == ["hi", "hi"]
+
+
+def test_blocked_chat_fails_without_retry():
+    async def main():
+        box = _outbox()
+        calls = []
+
+        async def callback(endpoint, data):
+            calls.append(data["text"])
+            raise Forbidden("bot was blocked by the user")
+
+        try:
+            with pytest.raises(Forbidden):
+                await _send(box, callback, 1, "hi")
+        finally:
+            await box.shutdown()
+        return calls
+
+    assert asyncio.run(main()) == ["hi"]
+
+
+def test_waiting_texts_for_one_chat_are_coalesced():
+    async def main():
+        box = _outbox(concurrency=1)
+        sent = []
+        gate = asyncio.Event()
+
+        async def callback(endpoint, data):
+            await gate.wait()
+            sent.append(data["text"])
+            return data["text"]
+
+        first = _send(box, callback, 1, "one")
+        await asyncio.sleep(0.01)
+        rest = [_send(box, callback, 1, "two"), _send(box, callback, 1, "three")]
+        await asyncio.sleep(0.01)
+        gate.set()
+        results = await asyncio.gather(first, *rest)
+        await box.shutdown()
+        return sent, results
+
+    sent, results = asyncio.run(main())
+    assert sent == ["one", "two\n\nthree"]
+    assert results == ["one", "two\n\nthree", "two\n\nthree"]
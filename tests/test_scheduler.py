@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime
+import pytest
+from pytz import utc
+import repository
+import scheduler
+from partitions import InMemoryLeaseBackend
+from storage_memory import MemoryStorage
+
+
+class _Bot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append(chat_id)
+
+
+def _tick(hour: int, minute: int) -> datetime:
+    return utc.localize(datetime(2025, 6, 1, hour, minute))
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    storage = MemoryStorage()
+    repository.set_storage(storage)
+    monkeypatch.setattr(scheduler, "lease_backend", InMemoryLeaseBackend())
+    monkeypatch.setattr(scheduler, "_active_runs", {})
+
+    async def users():
+        await repository.set_user_timezone("1", "Etc/GMT-1")    # local 23:59 is 22:59 UTC
+        await repository.set_user_timezone("2", "UTC")          # ... 23:59 UTC
+    asyncio.run(users())
+    return storage
+
+
+def test_failed_run_is_logged_and_resumed_by_the_next_tick(storage, monkeypatch, capsys):
+    bot = _Bot()
+    list_users_in_buckets = storage.list_users_in_buckets
+
+    def unavailable(buckets):
+        raise ConnectionError("storage unavailable")
+
+    async def main():
+        monkeypatch.setattr(scheduler, "current_tick", lambda: _tick(22, 59))
+        await scheduler._daily_summary_tick(bot)
+        # The 23:59 run fails before it has written anything to the ledger.
+        monkeypatch.setattr(storage, "list_users_in_buckets", unavailable)
+        monkeypatch.setattr(scheduler, "current_tick", lambda: _tick(23, 59))
+        await scheduler._daily_summary_tick(bot)
+        assert bot.sent == [1]
+        monkeypatch.setattr(storage, "list_users_in_buckets", list_users_in_buckets)
+        monkeypatch.setattr(scheduler, "current_tick", lambda: utc.localize(datetime(2025, 6, 2, 0, 14)))
+        await scheduler._daily_summary_tick(bot)
+        return await repository.get_job_runs([scheduler.summary_run_id(_tick(23, 59))])
+
+    runs = asyncio.run(main())
+    assert "failed, will resume at the next tick: ConnectionError" in capsys.readouterr().out
+    assert bot.sent == [1, 2]
+    assert runs["daily-2025-06-01T2359Z"]["complete"]
+
+
+def test_resumed_run_skips_users_already_sent(storage, monkeypatch):
+    bot = _Bot()
+
+    async def main():
+        await repository.set_user_timezone("3", "UTC")
+        run_id = scheduler.summary_run_id(_tick(23, 59))
+        ledger = scheduler.job_ledger.JobLedger(run_id)
+        await ledger.start(date="2025-06-01", users=2)
+        await ledger.record("2", {"status": "sent", "attempts": 1})
+        monkeypatch.setattr(scheduler, "current_tick", lambda: utc.localize(datetime(2025, 6, 2, 0, 14)))
+        await scheduler._daily_summary_tick(bot)
+
+    asyncio.run(main())
+    assert bot.sent == [3]
+
+
+def test_user_with_a_bucket_from_before_a_half_hour_dst_change_is_due(storage):
+    # Stored on 2025-04-05, before Lord Howe Island left DST (UTC+11 -> UTC+10:30).
+    tick = utc.localize(datetime(2025, 4, 6, 13, 29))
+    stored = scheduler.delivery_bucket("Australia/Lord_Howe", utc.localize(datetime(2025, 4, 5, 10, 0)))
+    storage.update_users({"4": {"timezone": "Australia/Lord_Howe", "delivery_bucket": stored}})
+
+    due = asyncio.run(scheduler._users_due(tick))
+    assert due == {"4": "Australia/Lord_Howe"}
+    assert storage.get_users(["4"])["4"]["delivery_bucket"] == scheduler.bucket_of_tick(tick)
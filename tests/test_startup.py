@@ -0,0 +1,24 @@
+import asyncio
+import reports
+import startup
+
+
+def test_report_workers_start_once_the_bot_is_ready(monkeypatch):
+    readiness = startup.Readiness(("telegram", "storage"))
+    started = []
+
+    async def warm_reports():
+        started.append(readiness.ready)
+
+    monkeypatch.setattr(reports, "warm_up", warm_reports)
+
+    async def main():
+        task = asyncio.create_task(startup.warm_up(readiness))
+        await readiness.wait("storage")
+        await asyncio.sleep(0.01)
+        assert started == []
+        readiness.passed("telegram")
+        await task
+
+    asyncio.run(main())
+    assert started == [True]
@@ -0,0 +1,52 @@
+from datetime import datetime
+from pytz import utc
+from user_time import BUCKETS_PER_DAY, bucket_of_tick, candidate_buckets, current_tick, delivery_bucket
+
+
+def _utc(*args) -> datetime:
+    return utc.localize(datetime(*args))
+
+
+def test_delivery_bucket_holds_local_2359():
+    at = _utc(2025, 1, 15, 12, 0)
+    assert delivery_bucket("UTC", at) == bucket_of_tick(_utc(2025, 1, 15, 23, 59))
+    assert delivery_bucket("Asia/Kolkata", at) == bucket_of_tick(_utc(2025, 1, 15, 18, 29))
+    assert delivery_bucket("Asia/Kathmandu", at) == bucket_of_tick(_utc(2025, 1, 15, 18, 14))
+    # West of UTC, local 23:59 is on the next UTC day.
+    assert delivery_bucket("America/New_York", at) == bucket_of_tick(_utc(2025, 1, 16, 4, 59))
+
+
+def test_delivery_bucket_follows_dst():
+    winter = delivery_bucket("Europe/Berlin", _utc(2025, 1, 15, 12, 0))
+    summer = delivery_bucket("Europe/Berlin", _utc(2025, 7, 15, 12, 0))
+    assert (winter - summer) % BUCKETS_PER_DAY == 4
+
+
+def test_current_tick_rounds_back_to_the_tick():
+    assert current_tick(_utc(2025, 6, 1, 18, 29, 0)) == _utc(2025, 6, 1, 18, 29)
+    assert current_tick(_utc(2025, 6, 1, 18, 29, 42, 500)) == _utc(2025, 6, 1, 18, 29)
+    # A trigger that starts late still belongs to the tick it was meant for.
+    assert current_tick(_utc(2025, 6, 1, 18, 40, 5)) == _utc(2025, 6, 1, 18, 29)
+    assert current_tick(_utc(2025, 6, 1, 0, 13)) == _utc(2025, 5, 31, 23, 59)
+
+
+def test_ticks_map_to_distinct_buckets():
+    ticks = [_utc(2025, 6, 1, hour, minute) for hour in range(24) for minute in (14, 29, 44, 59)]
+    assert sorted(bucket_of_tick(tick) for tick in ticks) == list(range(BUCKETS_PER_DAY))
+
+
+def test_candidates_cover_half_hour_dst_shifts():
+    # Lord Howe Island leaves DST on 2025-04-06 (UTC+11 -> UTC+10:30): a bucket stored the day before is
+    # two buckets (30 minutes) away from the one due now.
+    tick = _utc(2025, 4, 6, 13, 29)
+    stored = delivery_bucket("Australia/Lord_Howe", _utc(2025, 4, 5, 10, 0))
+    assert delivery_bucket("Australia/Lord_Howe", tick) == bucket_of_tick(tick)
+    assert (bucket_of_tick(tick) - stored) % BUCKETS_PER_DAY == 2
+    assert stored in candidate_buckets(tick)
+
+
+def test_candidates_cover_hour_dst_shifts():
+    # Berlin enters DST on 2025-03-30; a bucket stored in winter is an hour (4 buckets) later.
+    tick = _utc(2025, 3, 30, 21, 59)
+    assert delivery_bucket("Europe/Berlin", _utc(2025, 3, 29, 12, 0)) in candidate_buckets(tick)
+    assert bucket_of_tick(tick) in candidate_buckets(tick)
@@ -0,0 +1,51 @@
+import asyncio
+import json
+from http_server import Response
+from webhook import WebhookServer
+
+
+class _Application:
+    bot = None
+
+    def __init__(self):
+        self.updates = []
+
+    async def process_update(self, update):
+        self.updates.append(update.update_id)
+
+
+async def _request(port: int, raw: bytes) -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+def _post(update_id: int) -> bytes:
+    body = json.dumps({"update_id": update_id}).encode()
+    return (b"POST /telegram HTTP/1.1\r\nX-Telegram-Bot-Api-Secret-Token: s\r\nConnection: close\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+
+def test_listening_answers_probes_and_defers_updates_until_started():
+    async def main():
+        application = _Application()
+        server = WebhookServer(application, host="127.0.0.1", port=0, path="/telegram", secret="s", workers=2)
+
+        async def ready(request):
+            return Response(200)
+
+        server.http.route("GET", "/ready", ready)
+        await server.listen()
+        try:
+            probe = await _request(server.port, b"GET /ready HTTP/1.1\r\nConnection: close\r\n\r\n")
+            early = await _request(server.port, _post(1))
+            await server.start()
+            accepted = await _request(server.port, _post(2))
+        finally:
+            await server.stop()
+        return probe, early, accepted, application.updates
+
+    assert asyncio.run(main()) == (200, 503, 200, [2])
@@ -0,0 +1,46 @@
+import asyncio
+import os
+from telegram.ext import BaseUpdateProcessor
+
+## Update processor for polling mode. PTB's default handles polled updates one at a time, so one slow
+## handler (e.g. a slow storage call) stalls every other chat. Here up to POLLING_CONCURRENCY updates run at
+## once, while each chat's updates still run one after another in arrival order: a numbered reply is never
+## handled before the /markcompleted that asked for it. Updates waiting for their chat don't take a slot.
+## Webhook mode doesn't use it (WebhookServer has its own per-chat workers, see webhook.py).
+
+POLLING_CONCURRENCY = int(os.getenv("POLLING_CONCURRENCY", "32"))  # polled updates handled at once
+_MAX_ADMITTED = 1024  # updates admitted at once (running or waiting for their chat); the rest wait in PTB's queue
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, concurrency: int = POLLING_CONCURRENCY):
+        super().__init__(max(_MAX_ADMITTED, concurrency))
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._chats = {}    # chat id -> [lock, updates holding or waiting for it]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_process_update(self, update, coroutine):
+        chat = getattr(update, "effective_chat", None)
+        user = getattr(update, "effective_user", None)
+        key = chat.id if chat else user.id if user else None
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        entry = self._chats.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, so the chat's updates keep their order.
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[key]
@@ -0,0 +1,69 @@
+from datetime import datetime, time, timedelta
+from pytz import timezone, utc, all_timezones
+
+## Per-user time zones. Every user has an IANA zone name (default Asia/Kolkata, the bot's original
+## zone). Their "day" and their nightly summary follow it.
+##
+## Delivery buckets: the UTC day is split into 96 slots of 15 minutes. A user's bucket is the
+## slot holding their local 23:59. Every real-world UTC offset is a multiple of 15 minutes, so
+## local 23:59 always falls on UTC minute 14, 29, 44 or 59, which is when the scheduler ticks.
+
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+BUCKET_MINUTES = 15
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+
+_ZONES_BY_LOWER_NAME = {name.lower(): name for name in all_timezones}
+
+
+## Returns the canonical zone name for user input (case-insensitive), or None if unknown.
+def normalize_timezone(name: str):
+    return _ZONES_BY_LOWER_NAME.get(name.strip().lower())
+
+
+def get_zone(name: str = None):
+    return timezone(name or DEFAULT_TIMEZONE)
+
+
+def local_now(tz_name: str = None) -> datetime:
+    return datetime.now(get_zone(tz_name))
+
+
+## Aware [start, end) datetimes covering `day` in the given zone (DST-safe).
+def day_bounds(tz_name: str, day):
+    zone = get_zone(tz_name)
+    start = zone.localize(datetime.combine(day, time(0, 0)))
+    end = zone.localize(datetime.combine(day + timedelta(days=1), time(0, 0)))
+    return start, end
+
+
+## The bucket holding the user's local 23:59 for the offset in effect at `at_utc`.
+def delivery_bucket(tz_name: str, at_utc: datetime = None) -> int:
+    at_utc = at_utc or datetime.now(utc)
+    offset = at_utc.astimezone(get_zone(tz_name)).utcoffset()
+    minute_of_day = (23 * 60 + 59 - int(offset.total_seconds() // 60)) % (24 * 60)
+    return minute_of_day // BUCKET_MINUTES
+
+
+## The scheduler tick (UTC minute 14/29/44/59) that `now_utc` belongs to; tolerant of late starts.
+def current_tick(now_utc: datetime = None) -> datetime:
+    now_utc = now_utc or datetime.now(utc)
+    late_by = (now_utc.minute + 1) % BUCKET_MINUTES
+    return (now_utc - timedelta(minutes=late_by)).replace(second=0, microsecond=0)
+
+
+def bucket_of_tick(tick: datetime) -> int:
+    return (tick.hour * 60 + tick.minute) // BUCKET_MINUTES
+
+
+## Stored buckets that can hold the users due at `tick`. A user's bucket is stored ahead of time (by
+## /timezone, and by each night's run for the next night), so right after a DST change it can still follow
+## the offset from before the change: an hour off in most zones, but 30 minutes in Australia/Lord_Howe. So
+## for every zone whose local 23:59 falls at `tick`, its buckets a day before and a day after count too.
+## Checks every zone (a few tens of milliseconds); the scheduler runs it off the event loop.
+def candidate_buckets(tick: datetime) -> list:
+    bucket = bucket_of_tick(tick)
+    candidates = {bucket}
+    for name in all_timezones:
+        if delivery_bucket(name, tick) == bucket:
+            candidates.update(delivery_bucket(name, tick + timedelta(days=days)) for days in (-1, 1))
+    return sorted(candidates)
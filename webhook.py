@@ -0,0 +1,119 @@
+import asyncio
+import hmac
+import json
+import os
+from telegram import Update
+from http_server import HTTPServer, Request, Response
+
+## Webhook mode: Telegram POSTs updates to a local asyncio HTTP endpoint instead of the bot
+## long-polling for them (e.g. on platforms that only allow inbound HTTP).
+##
+## Updates are not spread across processes. Per-chat ordering (below), pending prompts
+## (conversation_state.py) and the per-user cache (cache.py) all hold within one process only; nothing
+## orders or locks a chat across processes. So every update of a chat must reach the same process: run one
+## replica, or put a proxy in front that routes by chat id. A plain round-robin load balancer handles a
+## chat's updates out of order, loses numbered replies and checklist taps and serves goals and habits that
+## another replica changed, until USER_CACHE_TTL runs out.
+##
+## Accepted updates go into bounded per-worker queues. Updates from the same chat always land in
+## the same queue, so one chat's messages are handled in order while different chats run
+## concurrently. When a queue is full the endpoint answers 503 and Telegram redelivers later
+## (backpressure instead of unbounded memory growth).
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")                       # public HTTPS URL registered with Telegram
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")                 # X-Telegram-Bot-Api-Secret-Token; random if unset (main.py)
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "32"))    # updates processed concurrently
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1024"))  # updates buffered across all workers
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+
+
+class WebhookServer:
+    def __init__(self, application, host: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                 path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET,
+                 workers: int = WEBHOOK_WORKERS, queue_size: int = WEBHOOK_QUEUE_SIZE):
+        self.application = application
+        self.path = path
+        self.secret = secret
+        self.http = HTTPServer(host, port)
+        self.http.route("POST", path, self._handle_update)
+        per_worker = max(1, queue_size // workers)
+        self.queues = [asyncio.Queue(maxsize=per_worker) for _ in range(workers)]
+        self._workers = []
+        self._listening = False
+        self._accepting = False
+        self.received = 0
+        self.processed = 0
+        self.rejected = 0
+
+    @property
+    def port(self) -> int:
+        return self.http.port
+
+    @property
+    def pending(self) -> int:
+        return sum(queue.qsize() for queue in self.queues)
+
+    ## Opens the port without taking updates yet: other routes (e.g. /ready) answer, update POSTs get 503
+    ## until start(). main.py listens before initializing the application, so probes never find the port closed.
+    async def listen(self):
+        await self.http.start()
+        self._listening = True
+        print(f"🌐 Webhook listening on {self.http.host}:{self.http.port}{self.path}")
+
+    ## Starts the workers and takes updates (listening first if listen() wasn't called).
+    async def start(self):
+        if not self._listening:
+            await self.listen()
+        self._workers = [asyncio.create_task(self._worker(queue)) for queue in self.queues]
+        self._accepting = True
+
+    ## Graceful shutdown: stop taking new updates, let queued ones finish (up to `timeout`), then stop workers.
+    async def stop(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        self._accepting = False
+        self._listening = False
+        await self.http.stop()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues)), timeout)
+        except asyncio.TimeoutError:
+            print(f"[⚠️] Webhook drain timed out with {self.pending} updates still queued")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        print(f"🌐 Webhook stopped: {self.processed} updates processed, {self.rejected} rejected")
+
+    async def _handle_update(self, request: Request) -> Response:
+        if self.secret is not None:
+            token = request.headers.get("x-telegram-bot-api-secret-token", "")
+            if not hmac.compare_digest(token, self.secret):
+                return Response(403)
+        if not self._accepting:
+            return Response(503, headers={"Retry-After": "1"})
+
+        try:
+            update = Update.de_json(json.loads(request.body), self.application.bot)
+        except (ValueError, KeyError, TypeError):
+            return Response(400)
+
+        chat = update.effective_chat
+        key = chat.id if chat else update.update_id
+        try:
+            self.queues[hash(key) % len(self.queues)].put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return Response(503, headers={"Retry-After": "1"})
+        self.received += 1
+        return Response(200)
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self.application.process_update(update)
+            except Exception as e:
+                print(f"[❌] Update {update.update_id} failed: {type(e).__name__}: {e}")
+            finally:
+                self.processed += 1
+                queue.task_done()